@@ -1,16 +1,21 @@
 import argparse
+import json
+import multiprocessing
 import random
-import re
 import string
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
 
+from normalization import load_cached_profile, normalize_with_profile
 from state_manager import load_state
 
 BASE_DIR = Path(__file__).resolve().parent
 ROOT_DIR = BASE_DIR.parent
 STATE_PATH = BASE_DIR / "state.json"
 GUESS_PATH = BASE_DIR / "plaintexts_guess.txt"
+JOURNAL_PATH = BASE_DIR / "plaintexts_guess.journal"
+CRIB_HITS_PATH = BASE_DIR / "crib_hits.txt"
 OT_PATH = ROOT_DIR / "Oliver Twist (1).txt"
 PP_PATH = ROOT_DIR / "Dickens Charles. The Pickwick Papers - royallib.ru.txt"
 
@@ -18,6 +23,7 @@ GOOD_CHARS = set(string.ascii_letters + string.digits + " .,;:!?'-\"()[]_")
 PRINTABLE_MIN = 32
 PRINTABLE_MAX = 126
 UNKNOWN_RUN_MIN = 8
+ISLAND_MIN_LEN = 12
 
 
 @dataclass
@@ -42,25 +48,19 @@ class ReferenceBridge:
     ref_pos: int
 
 
-def normalize_text(text):
-    text = text.replace("\r\n", "\n").replace("\r", "\n")
-    text = re.sub(r"\n\n+", " ", text)
-    text = text.replace("\n", " ")
-    text = text.replace("\u2018", "'").replace("\u2019", "'")
-    text = text.replace("\u201c", '"').replace("\u201d", '"')
-    text = text.replace("\u2013", "-").replace("\u2014", "--")
-    text = text.replace("\u2026", "...")
-    text = text.replace(
-        "the dreadful occurrences that so recently taken place.",
-        "the dreadful occurrences that had so recently taken place.",
-    )
-    text = text.replace("_", "")
-    return text
+@dataclass
+class Island:
+    start: int
+    end: int
+
+
+def normalize_text(text, profile=None):
+    return normalize_with_profile(text, profile)
 
 
 def load_reference_texts():
-    ot_text = normalize_text(OT_PATH.read_text(encoding="utf-8"))
-    pp_text = normalize_text(PP_PATH.read_text(encoding="cp1251"))
+    ot_text = normalize_text(OT_PATH.read_text(encoding="utf-8"), load_cached_profile(OT_PATH))
+    pp_text = normalize_text(PP_PATH.read_text(encoding="cp1251"), load_cached_profile(PP_PATH))
     return [ot_text, pp_text]
 
 
@@ -72,39 +72,36 @@ def fit_text_length(chars, expected_len):
     return chars
 
 
-def find_unknown_start(text):
+def find_unknown_start(text, start=0):
     limit = len(text) - UNKNOWN_RUN_MIN + 1
     if limit < 1:
         return -1
-    for idx in range(limit):
+    for idx in range(max(0, start), limit):
         if all(text[idx + offset] == "_" for offset in range(UNKNOWN_RUN_MIN)):
             return idx
     return -1
 
 
-def split_known_prefix(raw_text):
-    unknown_start = find_unknown_start(raw_text)
-    if unknown_start < 0:
-        return raw_text
-    return raw_text[:unknown_start]
-
-
-def trim_bad_tail(raw_text):
-    for idx, char in enumerate(raw_text):
-        if not is_good_char(char):
-            return raw_text[:idx]
-    return raw_text
+def sanitize_guess_line(raw_text):
+    # Bad characters become unknown in place, so islands after them keep their positions.
+    return [char if is_good_char(char) else "_" for char in raw_text]
 
 
 def read_guess_file(path, expected_len):
+    """Both plaintext lines, padded or cut to expected_len, and whether that changed them.
+
+    Whole lines are kept in both modes: islands written by an --islands run
+    must survive a later sequential run. Bad characters become '_' in place
+    instead of cutting the line there.
+    """
     lines = path.read_text(encoding="utf-8").splitlines()
     if len(lines) < 5 or lines[0] != "P1:" or lines[3] != "P2:":
         raise ValueError(f"Unexpected guess file format: {path}")
-    texts = [
-        list(trim_bad_tail(split_known_prefix(lines[1]))),
-        list(trim_bad_tail(split_known_prefix(lines[4]))),
-    ]
-    normalized = any(len(text) != expected_len for text in texts)
+    texts = [sanitize_guess_line(lines[1]), sanitize_guess_line(lines[4])]
+    normalized = any(
+        len(text) != expected_len or "".join(text) != raw
+        for text, raw in zip(texts, (lines[1], lines[4]))
+    )
     texts = [fit_text_length(text, expected_len) for text in texts]
     return texts, normalized
 
@@ -294,7 +291,7 @@ def rollback_frontier(texts, backtrack):
     return truncate_from_index(texts, rollback_to)
 
 
-def find_recovery_backtrack(texts, refs, xor12, chunk_size, max_suffix, min_suffix, max_hits, max_backtrack=16):
+def find_recovery_backtrack(texts, refs, xor12, chunk_size, max_suffix, min_suffix, max_hits, max_backtrack=16, pool=None):
     for backtrack in range(1, max_backtrack + 1):
         trial_texts = [list(texts[0]), list(texts[1])]
         changed = rollback_frontier(trial_texts, backtrack)
@@ -311,6 +308,7 @@ def find_recovery_backtrack(texts, refs, xor12, chunk_size, max_suffix, min_suff
                 max_suffix,
                 min_suffix,
                 max_hits,
+                pool=pool,
             )
             if candidate is not None and len(candidate.chunk) > backtrack:
                 return backtrack
@@ -323,6 +321,7 @@ def find_recovery_backtrack(texts, refs, xor12, chunk_size, max_suffix, min_suff
                 chunk_size,
                 max(max_suffix, 200),
                 max(min_suffix, 20),
+                pool=pool,
             )
             if bridge is not None and len(bridge.chunk) > backtrack:
                 return backtrack
@@ -330,58 +329,46 @@ def find_recovery_backtrack(texts, refs, xor12, chunk_size, max_suffix, min_suff
     return 0
 
 
-def fill_other_from_known(texts, xor12, refs):
-    filled = 0
-
-    left_frontier = find_unknown_start(texts[0])
-    right_frontier = find_unknown_start(texts[1])
-    if left_frontier < 0:
-        left_frontier = len(texts[0])
-    if right_frontier < 0:
-        right_frontier = len(texts[1])
-
-    if left_frontier < right_frontier:
-        derived_chars = []
-        for pos in range(left_frontier, right_frontier):
-            right = texts[1][pos]
-            if not is_known_char(right):
-                break
-            derived = xor12[pos] ^ ord(right)
-            if not (is_printable_ascii(derived) and is_good_char(chr(derived))):
-                break
-            derived_chars.append(chr(derived))
+def derive_backfill(texts, xor12, refs, frontiers=None):
+    if frontiers is None:
+        frontiers = summarize_frontiers(texts)
+    left_frontier, right_frontier = frontiers
+    if left_frontier == right_frontier:
+        return None
 
-        confirmed = reference_confirmed_prefix_len(
-            texts[0],
-            refs[0],
-            left_frontier,
-            "".join(derived_chars),
-        )
-        for rel_idx in range(confirmed):
-            texts[0][left_frontier + rel_idx] = derived_chars[rel_idx]
-        filled += confirmed
-    elif right_frontier < left_frontier:
-        derived_chars = []
-        for pos in range(right_frontier, left_frontier):
-            left = texts[0][pos]
-            if not is_known_char(left):
-                break
-            derived = xor12[pos] ^ ord(left)
-            if not (is_printable_ascii(derived) and is_good_char(chr(derived))):
-                break
-            derived_chars.append(chr(derived))
+    side_idx = 0 if left_frontier < right_frontier else 1
+    other_idx = 1 - side_idx
+    start, stop = sorted((left_frontier, right_frontier))
 
-        confirmed = reference_confirmed_prefix_len(
-            texts[1],
-            refs[1],
-            right_frontier,
-            "".join(derived_chars),
-        )
-        for rel_idx in range(confirmed):
-            texts[1][right_frontier + rel_idx] = derived_chars[rel_idx]
-        filled += confirmed
+    derived_chars = []
+    for pos in range(start, stop):
+        known = texts[other_idx][pos]
+        if not is_known_char(known):
+            break
+        derived = xor12[pos] ^ ord(known)
+        if not (is_printable_ascii(derived) and is_good_char(chr(derived))):
+            break
+        derived_chars.append(chr(derived))
+
+    confirmed = reference_confirmed_prefix_len(
+        texts[side_idx],
+        refs[side_idx],
+        start,
+        "".join(derived_chars),
+    )
+    if confirmed <= 0:
+        return None
+    return side_idx, start, "".join(derived_chars[:confirmed])
+
+
+def fill_other_from_known(texts, xor12, refs):
+    backfill = derive_backfill(texts, xor12, refs)
+    if backfill is None:
+        return 0
 
-    return filled
+    side_idx, start, chars = backfill
+    texts[side_idx][start:start + len(chars)] = list(chars)
+    return len(chars)
 
 
 def find_frontier(text):
@@ -474,12 +461,46 @@ def derive_other_chunk(texts, side_idx, gap_idx, chunk, xor12):
     return "".join(other_chars), usable
 
 
-def choose_candidate(texts, refs, xor12, side_idx, chunk_size, max_suffix, min_suffix, max_hits):
-    text = texts[side_idx]
+def evaluate_candidate_hypothesis(texts, refs, xor12, side_idx, gap_idx, suffix, hypothesis, chunk_size, max_suffix, min_suffix):
+    _, insert_start, adjust = hypothesis
     other_text = texts[1 - side_idx]
     ref_text = refs[side_idx]
     other_ref = refs[1 - side_idx]
-    gap_idx = find_frontier(text)
+
+    chunk = find_good_chunk_to_insert(ref_text, insert_start, chunk_size)
+    if not chunk:
+        return None
+    other_chunk, usable = derive_other_chunk(texts, side_idx, gap_idx, chunk, xor12)
+    if usable <= 0:
+        return None
+    confirmed = reference_confirmed_prefix_len(
+        other_text,
+        other_ref,
+        gap_idx,
+        other_chunk,
+        max(max_suffix, 200),
+        max(min_suffix, 20),
+    )
+    if confirmed <= 0 and allow_relaxed_confirmation(suffix, other_chunk):
+        confirmed = usable
+    usable = min(usable, confirmed)
+    if usable <= 0:
+        return None
+    chunk = chunk[:usable]
+    other_chunk = other_chunk[:usable]
+    if not is_good_text(chunk) or not is_good_text(other_chunk):
+        return None
+    score = usable * 100
+    score -= adjust
+    score += compatibility_bonus(other_text, other_ref, gap_idx, other_chunk, max_suffix)
+    return score, chunk, other_chunk
+
+
+def choose_candidate(texts, refs, xor12, side_idx, chunk_size, max_suffix, min_suffix, max_hits, gap_idx=None, pool=None):
+    text = texts[side_idx]
+    ref_text = refs[side_idx]
+    if gap_idx is None:
+        gap_idx = find_frontier(text)
     if gap_idx <= 0:
         return None
 
@@ -491,47 +512,39 @@ def choose_candidate(texts, refs, xor12, side_idx, chunk_size, max_suffix, min_s
     if not match_positions:
         return None
 
-    best = None
+    hypotheses = []
     for ref_pos in match_positions:
         base_insert_start = ref_pos + len(suffix.replace("_", ""))
         for insert_start, adjust in iter_insert_starts(base_insert_start, len(ref_text)):
-            chunk = find_good_chunk_to_insert(ref_text, insert_start, chunk_size)
-            if not chunk:
-                continue
-            other_chunk, usable = derive_other_chunk(texts, side_idx, gap_idx, chunk, xor12)
-            if usable <= 0:
-                continue
-            confirmed = reference_confirmed_prefix_len(
-                other_text,
-                other_ref,
-                gap_idx,
-                other_chunk,
-                max(max_suffix, 200),
-                max(min_suffix, 20),
+            hypotheses.append((ref_pos, insert_start, adjust))
+
+    params = (chunk_size, max_suffix, min_suffix)
+    if pool is not None:
+        results = pool.evaluate("candidate", texts, side_idx, gap_idx, suffix, hypotheses, params)
+    else:
+        results = [
+            evaluate_candidate_hypothesis(texts, refs, xor12, side_idx, gap_idx, suffix, hypothesis, *params)
+            for hypothesis in hypotheses
+        ]
+
+    # Highest score wins; on ties the earliest hypothesis wins, so the outcome
+    # does not depend on how the work was split between processes.
+    best = None
+    for hypothesis, result in zip(hypotheses, results):
+        if result is None:
+            continue
+        score, chunk, other_chunk = result
+        if best is None or score > best.score:
+            best = Candidate(
+                side_idx=side_idx,
+                gap_idx=gap_idx,
+                suffix=suffix,
+                chunk=chunk,
+                other_chunk=other_chunk,
+                ref_pos=hypothesis[0],
+                score=score,
+                match_count=len(match_positions),
             )
-            if confirmed <= 0 and allow_relaxed_confirmation(suffix, other_chunk):
-                confirmed = usable
-            usable = min(usable, confirmed)
-            if usable <= 0:
-                continue
-            chunk = chunk[:usable]
-            other_chunk = other_chunk[:usable]
-            if not is_good_text(chunk) or not is_good_text(other_chunk):
-                continue
-            score = usable * 100
-            score -= adjust
-            score += compatibility_bonus(other_text, other_ref, gap_idx, other_chunk, max_suffix)
-            if best is None or score > best.score:
-                best = Candidate(
-                    side_idx=side_idx,
-                    gap_idx=gap_idx,
-                    suffix=suffix,
-                    chunk=chunk,
-                    other_chunk=other_chunk,
-                    ref_pos=ref_pos,
-                    score=score,
-                    match_count=len(match_positions),
-                )
     return best
 
 
@@ -544,13 +557,49 @@ def apply_candidate(texts, candidate):
         texts[other_idx][pos] = candidate.other_chunk[rel_idx]
 
 
-def choose_reference_bridge(texts, refs, xor12, side_idx, chunk_size, max_suffix, min_suffix):
-    text = texts[side_idx]
+def evaluate_bridge_hypothesis(texts, refs, xor12, side_idx, gap_idx, suffix, hypothesis, chunk_size, max_suffix, min_suffix):
+    _, adjusted_start, _ = hypothesis
     other_text = texts[1 - side_idx]
     ref_text = refs[side_idx]
     other_ref = refs[1 - side_idx]
+    remaining = len(texts[side_idx]) - gap_idx
+
+    chunk = find_good_chunk_to_insert(ref_text, adjusted_start, chunk_size)
+    chunk = chunk[:remaining]
+    if not chunk or not is_good_text(chunk):
+        return None
+
+    other_chunk, usable = derive_other_chunk(texts, side_idx, gap_idx, chunk, xor12)
+    if usable <= 0:
+        return None
+
+    confirmed = reference_confirmed_prefix_len(
+        other_text,
+        other_ref,
+        gap_idx,
+        other_chunk,
+        max_suffix,
+        min_suffix,
+    )
+    if confirmed <= 0 and allow_relaxed_confirmation(suffix, other_chunk):
+        confirmed = usable
+    usable = min(usable, confirmed)
+    if usable <= 0:
+        return None
+
+    chunk = chunk[:usable]
+    other_chunk = other_chunk[:usable]
+    if not is_good_text(chunk) or not is_good_text(other_chunk):
+        return None
+    return chunk, other_chunk
+
+
+def choose_reference_bridge(texts, refs, xor12, side_idx, chunk_size, max_suffix, min_suffix, gap_idx=None, pool=None):
+    text = texts[side_idx]
+    ref_text = refs[side_idx]
     text_len = len(text)
-    gap_idx = find_frontier(text)
+    if gap_idx is None:
+        gap_idx = find_frontier(text)
     if gap_idx <= 0:
         return None
 
@@ -559,41 +608,29 @@ def choose_reference_bridge(texts, refs, xor12, side_idx, chunk_size, max_suffix
         return None
 
     suffix, insert_start, ref_pos = match
-    remaining = text_len - gap_idx
-    if remaining <= 0:
+    if text_len - gap_idx <= 0:
         return None
 
-    best = None
-    for adjusted_start, _ in iter_insert_starts(insert_start, len(ref_text)):
-        chunk = find_good_chunk_to_insert(ref_text, adjusted_start, chunk_size)
-        chunk = chunk[:remaining]
-        if not chunk or not is_good_text(chunk):
-            continue
-
-        other_chunk, usable = derive_other_chunk(texts, side_idx, gap_idx, chunk, xor12)
-        if usable <= 0:
-            continue
-
-        confirmed = reference_confirmed_prefix_len(
-            other_text,
-            other_ref,
-            gap_idx,
-            other_chunk,
-            max_suffix,
-            min_suffix,
-        )
-        if confirmed <= 0 and allow_relaxed_confirmation(suffix, other_chunk):
-            confirmed = usable
-        usable = min(usable, confirmed)
-        if usable <= 0:
-            continue
+    hypotheses = [
+        (ref_pos, adjusted_start, adjust)
+        for adjusted_start, adjust in iter_insert_starts(insert_start, len(ref_text))
+    ]
+    params = (chunk_size, max_suffix, min_suffix)
+    if pool is not None:
+        results = pool.evaluate("bridge", texts, side_idx, gap_idx, suffix, hypotheses, params)
+    else:
+        results = []
+        for hypothesis in hypotheses:
+            result = evaluate_bridge_hypothesis(texts, refs, xor12, side_idx, gap_idx, suffix, hypothesis, *params)
+            results.append(result)
+            if result is not None:
+                break
 
-        chunk = chunk[:usable]
-        other_chunk = other_chunk[:usable]
-        if not is_good_text(chunk) or not is_good_text(other_chunk):
+    for result in results:
+        if result is None:
             continue
-
-        best = ReferenceBridge(
+        chunk, other_chunk = result
+        return ReferenceBridge(
             side_idx=side_idx,
             gap_idx=gap_idx,
             suffix=suffix,
@@ -601,9 +638,7 @@ def choose_reference_bridge(texts, refs, xor12, side_idx, chunk_size, max_suffix
             other_chunk=other_chunk,
             ref_pos=ref_pos,
         )
-        break
-
-    return best
+    return None
 
 
 def apply_reference_bridge(texts, bridge):
@@ -622,6 +657,269 @@ def summarize_frontiers(texts):
     return frontiers
 
 
+_WORKER_INPUTS = {}
+HYPOTHESIS_EVALUATORS = {
+    "candidate": evaluate_candidate_hypothesis,
+    "bridge": evaluate_bridge_hypothesis,
+}
+
+
+def mirror_inputs(refs, xor12):
+    """Books and xor12 reversed: growing left is growing right in this orientation."""
+    return [ref[::-1] for ref in refs], xor12[::-1]
+
+
+def _init_pool_worker(inputs):
+    global _WORKER_INPUTS
+    _WORKER_INPUTS = inputs
+
+
+def _evaluate_hypothesis_batch(kind, orientation, texts, side_idx, gap_idx, suffix, hypotheses, params):
+    evaluate = HYPOTHESIS_EVALUATORS[kind]
+    refs, xor12 = _WORKER_INPUTS[orientation]
+    return [
+        evaluate(texts, refs, xor12, side_idx, gap_idx, suffix, hypothesis, *params)
+        for hypothesis in hypotheses
+    ]
+
+
+class CandidatePool:
+    """Process pool that scores extension hypotheses in parallel.
+
+    The reference books and xor12 are handed to the workers once, at start-up
+    (inherited without copying where the fork start method exists), in the
+    "forward" orientation and, when `mirror` is given, the "reverse" one, so
+    one pool serves both island directions. Each call ships only the current
+    plaintext pair and contiguous slices of the hypothesis list, and results
+    come back in hypothesis order.
+    """
+
+    def __init__(self, refs, xor12, workers, mirror=None):
+        start_methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in start_methods else None)
+        inputs = {"forward": (refs, xor12)}
+        if mirror is not None:
+            inputs["reverse"] = mirror
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_pool_worker,
+            initargs=(inputs,),
+        )
+
+    def oriented(self, orientation):
+        return OrientedPool(self, orientation)
+
+    def evaluate(self, kind, texts, side_idx, gap_idx, suffix, hypotheses, params, orientation="forward"):
+        if not hypotheses:
+            return []
+        frozen_texts = ("".join(texts[0]), "".join(texts[1]))
+        batch_size = max(1, -(-len(hypotheses) // (self.workers * 4)))
+        futures = [
+            self.executor.submit(
+                _evaluate_hypothesis_batch,
+                kind,
+                orientation,
+                frozen_texts,
+                side_idx,
+                gap_idx,
+                suffix,
+                hypotheses[start:start + batch_size],
+                params,
+            )
+            for start in range(0, len(hypotheses), batch_size)
+        ]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def close(self):
+        self.executor.shutdown()
+
+
+class OrientedPool:
+    """A CandidatePool whose evaluate() calls all use one orientation."""
+
+    def __init__(self, pool, orientation):
+        self.pool = pool
+        self.orientation = orientation
+
+    def evaluate(self, kind, texts, side_idx, gap_idx, suffix, hypotheses, params):
+        return self.pool.evaluate(kind, texts, side_idx, gap_idx, suffix, hypotheses, params, self.orientation)
+
+
+def replay_journal(texts, path):
+    if not path.exists():
+        return 0
+
+    replayed = 0
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            # A torn last line after a crash; everything before it is intact.
+            break
+        if "truncate" in record:
+            truncate_from_index(texts, record["truncate"])
+        else:
+            side_idx, pos, chars = record["side"], record["pos"], record["chars"]
+            texts[side_idx][pos:pos + len(chars)] = list(chars)
+        replayed += 1
+    return replayed
+
+
+class GuessState:
+    """Plaintext pair kept in memory between checkpoints.
+
+    Frontiers and XOR conflicts are updated only around the positions touched
+    by each write, so a step costs O(chunk) instead of O(text length). Every
+    write is appended to a journal; the full guess file is rewritten only on
+    checkpoint(), after which the journal is dropped.
+    """
+
+    def __init__(self, texts, xor12, guess_path, journal_path=None, checkpoint_every=0):
+        self.texts = texts
+        self.xor12 = xor12
+        self.guess_path = guess_path
+        self.journal_path = journal_path
+        self.checkpoint_every = checkpoint_every
+        self.frontiers = [find_frontier(text) for text in texts]
+        self.conflicts = set()
+        for pos in range(min(len(texts[0]), len(texts[1]), len(xor12))):
+            self._update_conflict(pos)
+        self.pending = 0
+        self._journal = None
+
+    def frontier(self, side_idx):
+        return self.frontiers[side_idx]
+
+    def summarize_frontiers(self):
+        return [
+            frontier if frontier >= 0 else len(text)
+            for frontier, text in zip(self.frontiers, self.texts)
+        ]
+
+    def first_conflict(self):
+        return min(self.conflicts) if self.conflicts else -1
+
+    def _update_conflict(self, pos):
+        left, right = self.texts[0][pos], self.texts[1][pos]
+        if is_known_char(left) and is_known_char(right) and (ord(left) ^ ord(right)) != self.xor12[pos]:
+            self.conflicts.add(pos)
+        else:
+            self.conflicts.discard(pos)
+
+    def _refresh_frontier_after_fill(self, side_idx, start, end):
+        frontier = self.frontiers[side_idx]
+        if frontier < 0 or end <= frontier or start >= frontier + UNKNOWN_RUN_MIN:
+            return
+        # Only valid for chars without '_' (see _apply): then no run can appear before the old frontier.
+        self.frontiers[side_idx] = find_unknown_start(self.texts[side_idx], frontier)
+
+    def _refresh_frontier_after_clear(self, side_idx, start):
+        frontier = self.frontiers[side_idx]
+        scan_from = max(0, start - UNKNOWN_RUN_MIN + 1)
+        if 0 <= frontier < scan_from:
+            return
+        self.frontiers[side_idx] = find_unknown_start(self.texts[side_idx], scan_from)
+
+    def _log(self, record):
+        if self.journal_path is None:
+            return
+        if self._journal is None:
+            self._journal = self.journal_path.open("a", encoding="utf-8")
+        self._journal.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._journal.flush()
+        self.pending += 1
+        if self.checkpoint_every and self.pending >= self.checkpoint_every:
+            self.checkpoint()
+
+    def _apply(self, side_idx, pos, chars):
+        end = pos + len(chars)
+        self.texts[side_idx][pos:end] = list(chars)
+        for idx in range(pos, min(end, len(self.xor12))):
+            self._update_conflict(idx)
+        if "_" in chars:
+            # '_' is a good char, so a write may also clear positions and open a run anywhere in it.
+            self._refresh_frontier_after_clear(side_idx, pos)
+        else:
+            self._refresh_frontier_after_fill(side_idx, pos, end)
+
+    def write(self, side_idx, pos, chars):
+        if not chars:
+            return 0
+        self._apply(side_idx, pos, chars)
+        self._log({"side": side_idx, "pos": pos, "chars": chars})
+        return len(chars)
+
+    def write_pair(self, side_idx, pos, chunk, other_chunk):
+        # Apply both sides before journaling so a checkpoint never sees half a step.
+        self._apply(side_idx, pos, chunk)
+        self._apply(1 - side_idx, pos, other_chunk)
+        self._log({"side": side_idx, "pos": pos, "chars": chunk})
+        self._log({"side": 1 - side_idx, "pos": pos, "chars": other_chunk})
+
+    def truncate(self, start_idx):
+        if start_idx < 0:
+            return 0
+        truncated = truncate_from_index(self.texts, start_idx)
+        if not truncated:
+            return 0
+        self.conflicts = {pos for pos in self.conflicts if pos < start_idx}
+        for side_idx in range(len(self.texts)):
+            self._refresh_frontier_after_clear(side_idx, start_idx)
+        self._log({"truncate": start_idx})
+        return truncated
+
+    def clear_known_run(self, pos):
+        """Reset the run around `pos` where both plaintexts are known; other islands stay."""
+        text_len = min(len(text) for text in self.texts)
+        if not 0 <= pos < text_len:
+            return 0
+        start, end = pos, pos + 1
+        while start > 0 and all(is_known_char(text[start - 1]) for text in self.texts):
+            start -= 1
+        while end < text_len and all(is_known_char(text[end]) for text in self.texts):
+            end += 1
+        blank = "_" * (end - start)
+        for side_idx in range(len(self.texts)):
+            self.write(side_idx, start, blank)
+        return end - start
+
+    def rollback(self, backtrack):
+        frontiers = self.summarize_frontiers()
+        if any(frontier <= 0 for frontier in frontiers):
+            return 0
+        rollback_to = min(frontiers) - backtrack
+        if rollback_to < 0:
+            return 0
+        return self.truncate(rollback_to)
+
+    def fill_other_from_known(self, refs):
+        backfill = derive_backfill(self.texts, self.xor12, refs, self.summarize_frontiers())
+        if backfill is None:
+            return 0
+        side_idx, start, chars = backfill
+        return self.write(side_idx, start, chars)
+
+    def checkpoint(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        write_guess_file(self.guess_path, self.texts)
+        if self.journal_path is not None and self.journal_path.exists():
+            self.journal_path.unlink()
+        self.pending = 0
+
+    def close(self):
+        if self.pending or (self.journal_path is not None and self.journal_path.exists()):
+            self.checkpoint()
+
+
 def parse_args():
     parser = argparse.ArgumentParser(description="Iterative K2 plaintext extension via book matching and XOR propagation.")
     parser.add_argument("--max-steps", type=int, default=100)
@@ -629,47 +927,187 @@ def parse_args():
     parser.add_argument("--max-suffix", type=int, default=20)
     parser.add_argument("--min-suffix", type=int, default=5)
     parser.add_argument("--max-hits", type=int, default=500)
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=200,
+        help="rewrite plaintexts_guess.txt after this many journaled writes (0: only at the end)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="processes used to score extension hypotheses (1: evaluate serially)",
+    )
+    parser.add_argument(
+        "--islands",
+        action="store_true",
+        help="grow every confirmed island left and right instead of only the left frontier",
+    )
+    parser.add_argument(
+        "--seed",
+        action="append",
+        default=[],
+        metavar="POS:P#:TEXT",
+        help="confirmed crib to start an island from, e.g. 18027:P2:'Mr. Brownlow' (repeatable)",
+    )
+    parser.add_argument(
+        "--crib-hits",
+        type=Path,
+        default=CRIB_HITS_PATH,
+        help="POS:P#:TEXT lines (as written by crib_drag.py) to seed islands from in --islands mode",
+    )
+    parser.add_argument("--island-min", type=int, default=ISLAND_MIN_LEN)
     parser.add_argument("--dry-run", action="store_true")
     return parser.parse_args()
 
 
-def main():
-    args = parse_args()
+def find_islands(texts, min_len=ISLAND_MIN_LEN):
+    islands = []
+    start = None
+    text_len = min(len(text) for text in texts)
+    for pos in range(text_len + 1):
+        known = pos < text_len and all(is_known_char(text[pos]) for text in texts)
+        if known and start is None:
+            start = pos
+        elif not known and start is not None:
+            if pos - start >= min_len:
+                islands.append(Island(start, pos))
+            start = None
+    return islands
 
-    ct, _ = load_state(str(STATE_PATH))
-    xor12 = bytes(left ^ right for left, right in zip(ct[0], ct[1]))
-    texts, normalized = read_guess_file(GUESS_PATH, len(xor12))
-    refs = load_reference_texts()
 
-    initial_conflict_idx = find_first_conflict(texts, xor12)
+def parse_seed(spec):
+    pos_text, side_text, crib = spec.split(":", 2)
+    side_idx = int(side_text.upper().lstrip("P")) - 1
+    if side_idx not in (0, 1):
+        raise ValueError(f"Unknown plaintext side in seed: {spec!r}")
+    return int(pos_text), side_idx, crib
 
-    healed = []
-    if initial_conflict_idx >= 0:
-        healed = heal_texts_from_references(texts, refs)
-    if healed:
-        details = ", ".join(f"P{side_idx}:{healed_len}" for side_idx, healed_len in healed)
-        print(f"healed corrupted tails from reference ({details})")
-        if not args.dry_run:
-            write_guess_file(GUESS_PATH, texts)
 
-    if normalized:
-        print("normalized plaintexts_guess.txt line lengths")
-        if not args.dry_run:
-            write_guess_file(GUESS_PATH, texts)
+def seed_island(state, pos, side_idx, crib):
+    if pos < 0 or pos + len(crib) > len(state.xor12):
+        return 0
+    other_chunk, usable = derive_other_chunk(state.texts, side_idx, pos, crib, state.xor12)
+    if usable < len(crib) or not is_good_text(crib) or not is_good_text(other_chunk):
+        return 0
+    state.write_pair(side_idx, pos, crib, other_chunk)
+    return len(crib)
 
-    conflict_idx = find_first_conflict(texts, xor12)
-    if conflict_idx >= 0:
-        truncated = truncate_from_index(texts, conflict_idx)
-        print(f"truncated from first XOR conflict at {conflict_idx} ({truncated} chars reset)")
-        if not args.dry_run:
-            write_guess_file(GUESS_PATH, texts)
 
-    filled = fill_other_from_known(texts, xor12, refs)
-    if filled:
-        print(f"backfilled {filled} chars from known plaintext")
-        if not args.dry_run:
-            write_guess_file(GUESS_PATH, texts)
+def read_crib_hits(path):
+    """Seed specs (POS:P#:TEXT) from a crib-hit file; blank lines and '#' comments are skipped."""
+    if not path.exists():
+        return []
+    return [
+        line for line in path.read_text(encoding="utf-8").splitlines()
+        if line.strip() and not line.startswith("#")
+    ]
+
+
+def reverse_texts(texts):
+    return [text[::-1] for text in texts]
+
+
+def choose_island_extension(state, refs, xor12, island, direction, args, pool=None, mirror=None):
+    """Best candidate that grows `island` to the right or to the left.
+
+    Growing left is growing right in the mirrored problem (texts, books and
+    xor12 reversed), so both directions share choose_candidate. The result is
+    always expressed in forward coordinates.
+    """
+    text_len = len(xor12)
+    if direction == "right":
+        if island.end >= text_len:
+            return None
+        texts, side_refs, side_xor, gap_idx = state.texts, refs, xor12, island.end
+    else:
+        if island.start <= 0:
+            return None
+        rev_refs, rev_xor = mirror
+        texts, side_refs, side_xor, gap_idx = reverse_texts(state.texts), rev_refs, rev_xor, text_len - island.start
+
+    best = None
+    for side_idx in (0, 1):
+        candidate = choose_candidate(
+            texts,
+            side_refs,
+            side_xor,
+            side_idx,
+            args.chunk_size,
+            args.max_suffix,
+            args.min_suffix,
+            args.max_hits,
+            gap_idx=gap_idx,
+            pool=pool,
+        )
+        if candidate is not None and (best is None or candidate.score > best.score):
+            best = candidate
+
+    if best is None or direction == "right":
+        return best
+
+    chunk_len = len(best.chunk)
+    best.gap_idx = island.start - chunk_len
+    best.chunk = best.chunk[::-1]
+    best.other_chunk = best.other_chunk[::-1]
+    best.suffix = best.suffix[::-1]
+    return best
+
+
+def run_island_loop(args, state, refs, xor12, pool=None, mirror=None):
+    """Grow every confirmed island in both directions until nothing moves.
 
+    Islands are the runs where both plaintexts are known; seeds from --seed
+    become islands of their own. Islands are recomputed after every round,
+    so two islands that grow into each other merge automatically.
+    """
+    if mirror is None:
+        mirror = mirror_inputs(refs, xor12)
+    mirror_pool = pool.oriented("reverse") if pool is not None else None
+    completed_steps = 0
+    while completed_steps < args.max_steps:
+        islands = find_islands(state.texts, args.island_min)
+        progressed = False
+        for island in islands:
+            for direction in ("right", "left"):
+                if completed_steps >= args.max_steps:
+                    break
+                side_pool = pool if direction == "right" else mirror_pool
+                candidate = choose_island_extension(
+                    state, refs, xor12, island, direction, args, side_pool, mirror
+                )
+                if candidate is None:
+                    continue
+                span = state.texts[candidate.side_idx][candidate.gap_idx:candidate.gap_idx + len(candidate.chunk)]
+                if all(is_known_char(char) for char in span):
+                    # Already merged into a neighbouring island this round.
+                    continue
+                state.write_pair(candidate.side_idx, candidate.gap_idx, candidate.chunk, candidate.other_chunk)
+                completed_steps += 1
+                progressed = True
+                if direction == "right":
+                    island.end += len(candidate.chunk)
+                else:
+                    island.start -= len(candidate.chunk)
+                print(
+                    f"step {completed_steps}: grew island {island.start}..{island.end} {direction} "
+                    f"via P{candidate.side_idx + 1} by {len(candidate.chunk)} chars "
+                    f"using {candidate.match_count} ref hits"
+                )
+                print(f"  inserted={candidate.chunk!r}")
+                print(f"  xor->P{2 - candidate.side_idx}={candidate.other_chunk!r}")
+        if not progressed:
+            break
+
+    islands = find_islands(state.texts, args.island_min)
+    covered = sum(island.end - island.start for island in islands)
+    print(f"islands: {len(islands)} covering {covered} of {len(xor12)} positions")
+    return completed_steps
+
+
+def run_extension_loop(args, state, refs, xor12, pool=None):
+    texts = state.texts
     next_side = random.randrange(2)
     print(f"starting side: P{next_side + 1}")
     completed_steps = 0
@@ -685,6 +1123,8 @@ def main():
                 args.max_suffix,
                 args.min_suffix,
                 args.max_hits,
+                gap_idx=state.frontier(side_idx),
+                pool=pool,
             )
             if candidate is not None:
                 candidates.append(candidate)
@@ -700,6 +1140,8 @@ def main():
                     args.chunk_size,
                     max(args.max_suffix, 200),
                     max(args.min_suffix, 20),
+                    gap_idx=state.frontier(side_idx),
+                    pool=pool,
                 )
                 if bridge is not None:
                     break
@@ -713,17 +1155,16 @@ def main():
                     args.max_suffix,
                     args.min_suffix,
                     args.max_hits,
+                    pool=pool,
                 )
                 if not backtrack:
                     break
 
-                rolled_back = rollback_frontier(texts, backtrack)
+                rolled_back = state.rollback(backtrack)
                 print(f"rolled back frontier by {backtrack} chars ({rolled_back} chars reset)")
-                if not args.dry_run:
-                    write_guess_file(GUESS_PATH, texts)
                 continue
 
-            apply_reference_bridge(texts, bridge)
+            state.write_pair(bridge.side_idx, bridge.gap_idx, bridge.chunk, bridge.other_chunk)
             completed_steps += 1
             next_side = 1 - bridge.side_idx
 
@@ -734,13 +1175,10 @@ def main():
             print(f"  suffix={bridge.suffix!r}")
             print(f"  inserted={bridge.chunk!r}")
             print(f"  xor->P{2 - bridge.side_idx}={bridge.other_chunk!r}")
-
-            if not args.dry_run:
-                write_guess_file(GUESS_PATH, texts)
             continue
 
         candidate = max(candidates, key=lambda item: item.score)
-        apply_candidate(texts, candidate)
+        state.write_pair(candidate.side_idx, candidate.gap_idx, candidate.chunk, candidate.other_chunk)
         completed_steps += 1
         next_side = 1 - candidate.side_idx
 
@@ -752,17 +1190,94 @@ def main():
         print(f"  inserted={candidate.chunk!r}")
         print(f"  xor->P{2 - candidate.side_idx}={candidate.other_chunk!r}")
 
-        filled = fill_other_from_known(texts, xor12, refs)
+        filled = state.fill_other_from_known(refs)
         if filled:
             print(f"  backfilled extra {filled} chars from XOR")
 
-        if not args.dry_run:
-            write_guess_file(GUESS_PATH, texts)
+    return completed_steps
 
-    frontiers = summarize_frontiers(texts)
-    print(f"frontiers: P1={frontiers[0]}, P2={frontiers[1]}")
+
+def main():
+    args = parse_args()
+
+    ct, _ = load_state(str(STATE_PATH))
+    xor12 = bytes(left ^ right for left, right in zip(ct[0], ct[1]))
+    texts, normalized = read_guess_file(GUESS_PATH, len(xor12))
+    refs = load_reference_texts()
+
+    replayed = replay_journal(texts, JOURNAL_PATH)
+    if replayed:
+        print(f"replayed {replayed} journaled writes from {JOURNAL_PATH.name}")
+
+    initial_conflict_idx = find_first_conflict(texts, xor12)
+
+    healed = []
+    if initial_conflict_idx >= 0:
+        healed = heal_texts_from_references(texts, refs)
+    if healed:
+        details = ", ".join(f"P{side_idx}:{healed_len}" for side_idx, healed_len in healed)
+        print(f"healed corrupted tails from reference ({details})")
+
+    if normalized:
+        print("normalized plaintexts_guess.txt line lengths")
+
+    state = GuessState(
+        texts,
+        xor12,
+        GUESS_PATH,
+        journal_path=None if args.dry_run else JOURNAL_PATH,
+        checkpoint_every=args.checkpoint_every,
+    )
+    if (healed or normalized or replayed) and not args.dry_run:
+        state.checkpoint()
+
+    conflict_idx = state.first_conflict()
+    if conflict_idx >= 0 and args.islands:
+        # Only the island holding a conflict is wrong; the ones after it are kept.
+        while conflict_idx >= 0:
+            cleared = state.clear_known_run(conflict_idx)
+            print(f"cleared the island around the XOR conflict at {conflict_idx} ({cleared} positions)")
+            conflict_idx = state.first_conflict()
+    elif conflict_idx >= 0:
+        truncated = state.truncate(conflict_idx)
+        print(f"truncated from first XOR conflict at {conflict_idx} ({truncated} chars reset)")
+
+    filled = state.fill_other_from_known(refs)
+    if filled:
+        print(f"backfilled {filled} chars from known plaintext")
+
+    crib_hits = read_crib_hits(args.crib_hits) if args.islands else []
+    seeded = 0
+    for spec in crib_hits + args.seed:
+        pos, side_idx, crib = parse_seed(spec)
+        if len(crib) < args.island_min and spec in crib_hits:
+            # Too short to count as an island; such hits only add noise.
+            continue
+        if seed_island(state, pos, side_idx, crib):
+            seeded += 1
+            print(f"seeded island at {pos} from P{side_idx + 1}={crib!r}")
+        else:
+            print(f"seed {spec!r} does not fit the XOR stream or the current guess, skipped")
+    if crib_hits:
+        print(f"crib hits from {args.crib_hits.name}: {len(crib_hits)}, islands seeded: {seeded}")
+
+    mirror = mirror_inputs(refs, xor12) if args.islands else None
+    pool = CandidatePool(refs, xor12, args.workers, mirror=mirror) if args.workers > 1 else None
+    try:
+        if args.islands:
+            completed_steps = run_island_loop(args, state, refs, xor12, pool, mirror)
+        else:
+            completed_steps = run_extension_loop(args, state, refs, xor12, pool)
+    finally:
+        if pool is not None:
+            pool.close()
+
+    frontiers = state.summarize_frontiers()
+    print(f"frontiers: P1={frontiers[0]}, P2={frontiers[1]} after {completed_steps} steps")
     if args.dry_run:
         print("dry-run: plaintexts_guess.txt not modified")
+    else:
+        state.close()
 
 
 if __name__ == "__main__":
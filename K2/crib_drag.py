@@ -2,25 +2,16 @@
 K2 - Crib-drag analysis: try known English phrases to locate text fragments.
 Uses K3 reference books (Pickwick Papers, Oliver Twist) for matching.
 """
-import json, base64, re
+import json, re, sys
 from pathlib import Path
 from collections import Counter
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from task_loader import load_ciphertexts
+
 TASK_PATH = r"K3\K2\2026_02_24_10_26_59_Анна_Казакевич_task.txt"
 
-def read_task(path):
-    with open(path, encoding='utf-8') as f:
-        lines = [l.strip() for l in f if l.strip()]
-    ciphers = []
-    for i in range(0, len(lines), 2):
-        if i+1 >= len(lines): break
-        if re.match(r"^Шифр \d+ \(base64\):$", lines[i]):
-            raw = lines[i+1]
-            if raw.startswith("b'") and raw.endswith("'"):
-                ciphers.append(base64.b64decode(raw[2:-1]))
-    return ciphers
-
-ct1, ct2 = read_task(TASK_PATH)
+ct1, ct2 = load_ciphertexts(TASK_PATH, expected_count=2)
 N = len(ct1)
 xor12 = bytes(a^b for a,b in zip(ct1, ct2))
 
@@ -99,6 +90,14 @@ print(f"\nBest crib hits (score >= 70% letters/spaces):")
 for score, pos, crib, other in all_results[:30]:
     print(f"  pos={pos:5d} score={score:3d}/{len(crib):2d} | crib='{crib}' -> other='{other}'")
 
+# Seeds for build_texts.py --islands (POS:P#:TEXT, the --seed format); edit the file to drop bad hits.
+crib_hits_path = Path(__file__).resolve().parent / "crib_hits.txt"
+crib_hits_path.write_text(
+    "".join(f"{pos}:P1:{crib}\n" for score, pos, crib, other in all_results[:30]),
+    encoding="utf-8",
+)
+print(f"crib hits saved to {crib_hits_path.name}")
+
 # Also try automatic: for each position, assume p1[i]=' ' and see what p2[i] is
 # Chain spaces: find runs where assuming P1 has spaces gives P2 as readable English
 print("\n\n=== Space-XOR analysis (assuming P1 has spaces) ===")
@@ -1,5 +1,9 @@
-import base64
-import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from task_loader import load_ciphertexts  # noqa: E402
 
 
 COMMON_BYTE_SCORES = {
@@ -95,35 +99,8 @@ RUSSIAN_BYTE_SCORES = _build_russian_byte_scores()
 
 
 def read_vernam_ciphers(task_path, expected_count=2):
-    with open(task_path, "r", encoding="utf-8") as file:
-        lines = [line.strip() for line in file.readlines() if line.strip()]
-
-    ciphers = []
-    for index in range(0, len(lines), 2):
-        if index + 1 >= len(lines):
-            break
-
-        header = lines[index]
-        data_line = lines[index + 1]
-
-        if not re.match(r"^Шифр \d+ \(base64\):$", header):
-            continue
-
-        if not (data_line.startswith("b'") and data_line.endswith("'")):
-            raise ValueError(f"Некорректный формат данных после заголовка: {header}")
-
-        ciphers.append(data_line[2:-1])
-
-    if len(ciphers) < expected_count:
-        raise ValueError(
-            f"В task-файле найдено {len(ciphers)} base64-блоков, ожидалось минимум {expected_count}"
-        )
-
-    return ciphers[:expected_count]
-
-
-def decode_base64_cipher(base64_cipher):
-    return base64.b64decode(base64_cipher)
+    """Decoded ciphertexts of the task file (shared loader with the .task_cache cache)."""
+    return load_ciphertexts(task_path, expected_count=expected_count)
 
 
 def _byte_score(byte_value):
@@ -1,6 +1,5 @@
 from help_methods import (
     read_vernam_ciphers,
-    decode_base64_cipher,
     break_vernam_two_ciphertexts,
     decode_best_effort,
 )
@@ -12,9 +11,7 @@ if __name__ == "__main__":
     default_path = "K2\\2026_02_24_10_26_59_Анна_Казакевич_task.txt"
     task_path = input(f"Введите путь к task-файлу (по умолчанию: {default_path}): ") or default_path
 
-    cipher_1_b64, cipher_2_b64 = read_vernam_ciphers(task_path, expected_count=2)
-    ciphertext_1 = decode_base64_cipher(cipher_1_b64)
-    ciphertext_2 = decode_base64_cipher(cipher_2_b64)
+    ciphertext_1, ciphertext_2 = read_vernam_ciphers(task_path, expected_count=2)
 
     guessed_plain_1_bytes, guessed_plain_2_bytes, score_sum = break_vernam_two_ciphertexts(
         ciphertext_1,
@@ -0,0 +1,175 @@
+"""
+Automatic search for the reference-book normalization that best explains xor12.
+
+Every combination of the rules in normalization.NORMALIZATION_RULES is applied to
+both books; the books are aligned at known anchor offsets and the XOR match rate
+is computed with vectorized comparisons. The best profile per book is stored in
+norm_profiles.json, which build_texts.load_reference_texts() picks up.
+Replaces the hand-made dd/sd checks in norm_test.py.
+"""
+import argparse
+
+import numpy as np
+
+from build_texts import OT_PATH, PP_PATH, STATE_PATH
+from normalization import (
+    PROFILE_CACHE_PATH,
+    book_fingerprint,
+    iter_profiles,
+    load_profile_cache,
+    normalize_with_profile,
+    profile_label,
+    store_cached_profile,
+)
+from state_manager import load_state
+
+# xor12[0] lines up with book.find(probe) + shift in the normalized text.
+DEFAULT_ANCHORS = {
+    "pp": ("progress. Mr. Pickwick", 0),
+    "ot": ("tually threw himself", -10),
+}
+
+
+def as_codes(text):
+    return np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+
+
+def normalized_variants(raw_text, probe, shift):
+    """Normalize one book with every profile; keep the ones where the anchor is found."""
+    variants = []
+    seen = {}
+    for profile in iter_profiles():
+        text = normalize_with_profile(raw_text, profile)
+        offset = text.find(probe)
+        if offset < 0 or offset + shift < 0:
+            continue
+        # Several profiles often produce the same text; compare it only once.
+        codes = seen.get(text)
+        if codes is None:
+            codes = seen[text] = as_codes(text)
+        variants.append((profile, text, codes, offset + shift))
+    return variants
+
+
+def compare_aligned(xor_codes, left_codes, left_off, right_codes, right_off):
+    total = min(len(xor_codes), len(left_codes) - left_off, len(right_codes) - right_off)
+    left = left_codes[left_off:left_off + total]
+    right = right_codes[right_off:right_off + total]
+    ascii_mask = (left < 128) & (right < 128)
+    match_mask = ascii_mask & ((left ^ right) == xor_codes[:total])
+    return match_mask, ascii_mask
+
+
+def mismatch_regions(match_mask, ascii_mask, join_gap=4):
+    bad = np.flatnonzero(ascii_mask & ~match_mask)
+    if not len(bad):
+        return []
+    breaks = np.flatnonzero(np.diff(bad) > join_gap)
+    starts = np.concatenate(([bad[0]], bad[breaks + 1]))
+    ends = np.concatenate((bad[breaks], [bad[-1]])) + 1
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def search_profiles(xor12, pp_raw, ot_raw, anchors=DEFAULT_ANCHORS):
+    xor_codes = np.frombuffer(xor12, dtype=np.uint8).astype(np.uint32)
+    pp_variants = normalized_variants(pp_raw, *anchors["pp"])
+    ot_variants = normalized_variants(ot_raw, *anchors["ot"])
+
+    results = []
+    scored = {}
+    for pp_profile, pp_text, pp_codes, pp_off in pp_variants:
+        for ot_profile, ot_text, ot_codes, ot_off in ot_variants:
+            pair_key = (id(pp_codes), pp_off, id(ot_codes), ot_off)
+            if pair_key not in scored:
+                match_mask, ascii_mask = compare_aligned(xor_codes, pp_codes, pp_off, ot_codes, ot_off)
+                scored[pair_key] = (int(match_mask.sum()), int(ascii_mask.sum()), match_mask, ascii_mask)
+            matches, ascii_total, match_mask, ascii_mask = scored[pair_key]
+            results.append(
+                {
+                    "pp_profile": pp_profile,
+                    "ot_profile": ot_profile,
+                    "pp_text": pp_text,
+                    "ot_text": ot_text,
+                    "pp_off": pp_off,
+                    "ot_off": ot_off,
+                    "matches": matches,
+                    "ascii_total": ascii_total,
+                    "rate": matches / ascii_total if ascii_total else 0.0,
+                    "match_mask": match_mask,
+                    "ascii_mask": ascii_mask,
+                }
+            )
+    # Stable sort: among equal rates the earlier (closer to default) profile wins.
+    results.sort(key=lambda item: (-item["rate"], -item["matches"]))
+    return results
+
+
+def print_mismatch_diff(best, xor12, max_regions, context=12):
+    regions = mismatch_regions(best["match_mask"], best["ascii_mask"])
+    print(f"\nMismatching regions: {len(regions)} (showing up to {max_regions})")
+    pp, ot = best["pp_text"], best["ot_text"]
+    pp_off, ot_off = best["pp_off"], best["ot_off"]
+    for start, end in regions[:max_regions]:
+        lo, hi = max(0, start - context), end + context
+        implied = "".join(
+            chr(xor12[i] ^ ord(pp[pp_off + i])) if ord(pp[pp_off + i]) < 128 and 32 <= (xor12[i] ^ ord(pp[pp_off + i])) < 127 else "."
+            for i in range(lo, min(hi, len(xor12), len(pp) - pp_off))
+        )
+        print(f"  xor[{start}:{end}]")
+        print(f"    PP      : {pp[pp_off + lo:pp_off + hi]!r}")
+        print(f"    OT      : {ot[ot_off + lo:ot_off + hi]!r}")
+        print(f"    PP^xor  : {implied!r}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Find the reference-book normalization that best matches xor12.")
+    parser.add_argument("--top", type=int, default=5, help="how many best profile pairs to print")
+    parser.add_argument("--max-regions", type=int, default=10, help="mismatch regions to print for the best pair")
+    parser.add_argument("--force", action="store_true", help="search again even if norm_profiles.json is current")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    cache = load_profile_cache()
+    pp_entry = cache.get(PP_PATH.name)
+    ot_entry = cache.get(OT_PATH.name)
+    if (
+        not args.force
+        and pp_entry and pp_entry.get("fingerprint") == book_fingerprint(PP_PATH)
+        and ot_entry and ot_entry.get("fingerprint") == book_fingerprint(OT_PATH)
+    ):
+        print(f"cached in {PROFILE_CACHE_PATH.name} (use --force to search again):")
+        print(f"  PP: {profile_label(pp_entry['profile'])} rate={pp_entry['stats']['rate']:.4f}")
+        print(f"  OT: {profile_label(ot_entry['profile'])} rate={ot_entry['stats']['rate']:.4f}")
+        return
+
+    ct, _ = load_state(str(STATE_PATH))
+    xor12 = bytes(left ^ right for left, right in zip(ct[0], ct[1]))
+    pp_raw = PP_PATH.read_text(encoding="cp1251")
+    ot_raw = OT_PATH.read_text(encoding="utf-8")
+
+    results = search_profiles(xor12, pp_raw, ot_raw)
+    if not results:
+        print("anchors not found in any normalization; nothing to compare")
+        return
+
+    print(f"evaluated {len(results)} profile pairs")
+    for item in results[:args.top]:
+        print(
+            f"  rate={item['rate']:.4f} ({item['matches']}/{item['ascii_total']})"
+            f" PP[{profile_label(item['pp_profile'])}] OT[{profile_label(item['ot_profile'])}]"
+        )
+
+    best = results[0]
+    print_mismatch_diff(best, xor12, args.max_regions)
+
+    stats = {"rate": best["rate"], "matches": best["matches"], "ascii_total": best["ascii_total"]}
+    store_cached_profile(PP_PATH, best["pp_profile"], dict(stats, offset=best["pp_off"]))
+    store_cached_profile(OT_PATH, best["ot_profile"], dict(stats, offset=best["ot_off"]))
+    print(f"\nsaved best profiles to {PROFILE_CACHE_PATH.name}")
+
+
+if __name__ == "__main__":
+    main()
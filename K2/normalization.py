@@ -0,0 +1,103 @@
+"""Text normalization profiles for the K2 reference books.
+
+A profile is a dict that picks one option per rule in NORMALIZATION_RULES,
+plus a list of literal [old, new] patches. DEFAULT_PROFILE reproduces the
+hand-written normalization build_texts.py has always used; norm_search.py
+looks for a better one per book and stores it in norm_profiles.json.
+"""
+import hashlib
+import itertools
+import json
+import re
+from pathlib import Path
+
+PROFILE_CACHE_PATH = Path(__file__).resolve().parent / "norm_profiles.json"
+
+NORMALIZATION_RULES = {
+    "quotes": ("fold", "keep"),
+    "dashes": ("double", "single", "keep"),
+    "ellipsis": ("dots", "keep"),
+    "underscores": ("remove", "keep"),
+    "whitespace": ("keep", "collapse"),
+}
+
+DEFAULT_PROFILE = {
+    "quotes": "fold",
+    "dashes": "double",
+    "ellipsis": "dots",
+    "underscores": "remove",
+    "whitespace": "keep",
+    "patches": [
+        [
+            "the dreadful occurrences that so recently taken place.",
+            "the dreadful occurrences that had so recently taken place.",
+        ],
+    ],
+}
+
+DASH_REPLACEMENTS = {
+    "double": {"\u2013": "-", "\u2014": "--"},
+    "single": {"\u2013": "-", "\u2014": "-"},
+    "keep": {},
+}
+
+
+def normalize_with_profile(text, profile=None):
+    profile = profile or DEFAULT_PROFILE
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = re.sub(r"\n\n+", " ", text)
+    text = text.replace("\n", " ")
+    if profile["quotes"] == "fold":
+        text = text.replace("\u2018", "'").replace("\u2019", "'")
+        text = text.replace("\u201c", '"').replace("\u201d", '"')
+    for old, new in DASH_REPLACEMENTS[profile["dashes"]].items():
+        text = text.replace(old, new)
+    if profile["ellipsis"] == "dots":
+        text = text.replace("\u2026", "...")
+    for old, new in profile.get("patches", []):
+        text = text.replace(old, new)
+    if profile["underscores"] == "remove":
+        text = text.replace("_", "")
+    if profile["whitespace"] == "collapse":
+        text = re.sub(r" {2,}", " ", text)
+    return text
+
+
+def iter_profiles(base=None):
+    base = base or DEFAULT_PROFILE
+    names = list(NORMALIZATION_RULES)
+    for options in itertools.product(*(NORMALIZATION_RULES[name] for name in names)):
+        profile = dict(zip(names, options))
+        profile["patches"] = base.get("patches", [])
+        yield profile
+
+
+def profile_label(profile):
+    return ",".join(f"{name}={profile[name]}" for name in NORMALIZATION_RULES)
+
+
+def book_fingerprint(path):
+    return hashlib.sha1(Path(path).read_bytes()).hexdigest()
+
+
+def load_profile_cache(cache_path=PROFILE_CACHE_PATH):
+    if not cache_path.exists():
+        return {}
+    return json.loads(cache_path.read_text(encoding="utf-8"))
+
+
+def load_cached_profile(book_path, cache_path=PROFILE_CACHE_PATH):
+    entry = load_profile_cache(cache_path).get(Path(book_path).name)
+    if not entry or entry.get("fingerprint") != book_fingerprint(book_path):
+        return None
+    return entry["profile"]
+
+
+def store_cached_profile(book_path, profile, stats, cache_path=PROFILE_CACHE_PATH):
+    cache = load_profile_cache(cache_path)
+    cache[Path(book_path).name] = {
+        "fingerprint": book_fingerprint(book_path),
+        "profile": profile,
+        "stats": stats,
+    }
+    cache_path.write_text(json.dumps(cache, ensure_ascii=False, indent=2), encoding="utf-8")
@@ -0,0 +1,29 @@
+"""
+K2 access to the shared binary state store (state_store.py in the repo root).
+
+load_state() keeps the (ciphertexts, key) tuple the K2 scripts expect and accepts
+either state.json or state.bin: when state.bin exists next to the given path it
+is used, otherwise the JSON export is read.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from state_store import key_to_list, load_any, save_store  # noqa: E402
+
+
+def load_state(path):
+    state = load_any(path, mmap=False)
+    ciphertexts = [bytes(ct) for ct in state["ciphertexts"]]
+    return ciphertexts, key_to_list(state["key"])
+
+
+def load_state_arrays(path):
+    """Memory-mapped uint8 ciphertext arrays and the int16 key (-1 = unknown)."""
+    state = load_any(path)
+    return state["ciphertexts"], state["key"]
+
+
+def save_state(path, ciphertexts, key):
+    return save_store(path, ciphertexts=ciphertexts, key=key)
@@ -0,0 +1,92 @@
+import argparse
+from pathlib import Path
+
+import build_texts as bt
+
+
+P1 = "It was the best of times, it was the worst of times, it was the age of wisdom. " * 3
+P2 = "Mr. Pickwick said that the gentleman in the green coat had gone to Dingley Dell" * 3
+XOR12 = bytes(ord(a) ^ ord(b) for a, b in zip(P1, P2))
+ANSWER_PATH = Path(__file__).resolve().parent / "K2_answer.txt"
+
+
+def make_state(tmp_path, known_prefix=20):
+    texts = [
+        list(P1[:known_prefix]) + ["_"] * (len(P1) - known_prefix),
+        list(P2[:known_prefix]) + ["_"] * (len(P2) - known_prefix),
+    ]
+    return bt.GuessState(texts, XOR12, tmp_path / "plaintexts_guess.txt")
+
+
+def test_seeded_island_survives_reload(tmp_path):
+    state = make_state(tmp_path)
+    crib = P2[120:140]
+    assert bt.seed_island(state, 120, 1, crib) == len(crib)
+    state.checkpoint()
+
+    texts, normalized = bt.read_guess_file(state.guess_path, len(XOR12))
+    assert not normalized
+    assert "".join(texts[1][120:140]) == crib
+    assert "".join(texts[0][120:140]) == P1[120:140]
+    assert "".join(texts[0][:20]) == P1[:20]
+
+
+def test_bad_chars_become_unknown_in_place(tmp_path):
+    path = tmp_path / "plaintexts_guess.txt"
+    line = "ab\x07cd" + "_" * 10 + "island"
+    path.write_text(f"P1:\n{line}\n\nP2:\n{line}\n", encoding="utf-8")
+
+    texts, normalized = bt.read_guess_file(path, 30)
+    assert normalized
+    assert "".join(texts[0]) == "ab_cd" + "_" * 10 + "island" + "_" * 9
+
+
+def test_clear_known_run_keeps_other_islands(tmp_path):
+    state = make_state(tmp_path)
+    bt.seed_island(state, 120, 1, P2[120:140])
+    state.texts[0][5] = "#"
+    state._update_conflict(5)
+    assert state.first_conflict() == 5
+
+    assert state.clear_known_run(5) == 20
+    assert state.first_conflict() == -1
+    assert all(char == "_" for char in state.texts[0][:20])
+    assert "".join(state.texts[1][120:140]) == P2[120:140]
+
+
+def test_writing_unknowns_moves_the_frontier_back(tmp_path):
+    state = make_state(tmp_path)
+    assert state.frontier(0) == 20
+    state.write(0, 4, "_" * bt.UNKNOWN_RUN_MIN)
+    assert state.frontier(0) == 4 == bt.find_frontier(state.texts[0])
+
+
+def test_read_crib_hits_skips_comments(tmp_path):
+    path = tmp_path / "crib_hits.txt"
+    path.write_text("# pos:side:crib\n\n18027:P2:Mr. Brownlow\n", encoding="utf-8")
+    assert bt.read_crib_hits(path) == ["18027:P2:Mr. Brownlow"]
+    assert bt.parse_seed("18027:P2:Mr. Brownlow") == (18027, 1, "Mr. Brownlow")
+    assert bt.read_crib_hits(tmp_path / "missing.txt") == []
+
+
+def test_one_pool_serves_both_directions(tmp_path):
+    lines = ANSWER_PATH.read_text(encoding="utf-8").splitlines()
+    refs = [lines[1], lines[4]]
+    xor12 = bytes(ord(a) ^ ord(b) for a, b in zip(*refs))
+    texts = [["_"] * len(xor12), ["_"] * len(xor12)]
+    state = bt.GuessState(texts, xor12, tmp_path / "plaintexts_guess.txt")
+    bt.seed_island(state, 18027, 1, refs[1][18027:18061])
+    island = bt.Island(18027, 18061)
+    args = argparse.Namespace(chunk_size=24, max_suffix=20, min_suffix=5, max_hits=500)
+    mirror = bt.mirror_inputs(refs, xor12)
+
+    pool = bt.CandidatePool(refs, xor12, 2, mirror=mirror)
+    try:
+        for direction, side_pool in (("right", pool), ("left", pool.oriented("reverse"))):
+            serial = bt.choose_island_extension(state, refs, xor12, island, direction, args, None, mirror)
+            pooled = bt.choose_island_extension(state, refs, xor12, island, direction, args, side_pool, mirror)
+            assert serial is not None and serial == pooled
+            chunk = refs[serial.side_idx][serial.gap_idx:serial.gap_idx + len(serial.chunk)]
+            assert serial.chunk == chunk
+    finally:
+        pool.close()
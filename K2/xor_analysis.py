@@ -1,25 +1,16 @@
 """
 K2 - Initial XOR analysis to identify language and structure of plaintexts.
 """
-import sys, base64, re
+import sys
 from pathlib import Path
 from collections import Counter
 
-TASK_PATH = r"K3\K2\2026_02_24_10_26_59_Анна_Казакевич_task.txt"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from task_loader import load_ciphertexts
 
-def read_task(path):
-    with open(path, encoding='utf-8') as f:
-        lines = [l.strip() for l in f if l.strip()]
-    ciphers = []
-    for i in range(0, len(lines), 2):
-        if i+1 >= len(lines): break
-        if re.match(r"^Шифр \d+ \(base64\):$", lines[i]):
-            raw = lines[i+1]
-            if raw.startswith("b'") and raw.endswith("'"):
-                ciphers.append(base64.b64decode(raw[2:-1]))
-    return ciphers
+TASK_PATH = r"K3\K2\2026_02_24_10_26_59_Анна_Казакевич_task.txt"
 
-ct1, ct2 = read_task(TASK_PATH)
+ct1, ct2 = load_ciphertexts(TASK_PATH, expected_count=2)
 print(f"CT1 length: {len(ct1)}")
 print(f"CT2 length: {len(ct2)}")
 print(f"Min length: {min(len(ct1), len(ct2))}")
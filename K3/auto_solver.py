@@ -0,0 +1,294 @@
+"""Automatic key recovery for K3: domain pruning plus beam search over a byte n-gram model.
+
+Every key byte is a variable with the domain 0..255. A value survives when each
+ciphertext decrypts to a plausible byte whose class the masks allow at that
+position (xor_index.PLAIN_CLASSES, classes from mask_bits); key bytes
+already known in the state are fixed. The surviving columns are scored with a
+byte n-gram model summed over all texts, and a beam search fills the key from
+left to right. Beams whose last (order - 1) plaintext bytes agree in every text
+have the same future, so only the best of them is kept.
+
+The model is trained on the --corpus files and on the plaintext that the known
+key bytes already give.
+
+	python auto_solver.py --corpus ../K2/K2_answer.txt
+	python auto_solver.py --apply                    # fill unknown key bytes in state.bin
+"""
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+from help_methods import (
+	commit_key,
+	load_ciphertexts,
+	load_state,
+	parse_masks_two,
+)
+from key_map import SOURCES, KeyMap
+from key_view import decrypted_views
+from mask_bits import CLASS_BITS, allowed_classes, encode_mask
+from pad_engine import stack_ciphertexts
+from state_store import resolve_state_path
+from xor_index import PLAIN_CLASSES
+
+
+DEFAULT_TASK_PATH = "2026_02_24_10_27_04_Анна_Казакевич_task.txt"
+# Interpolation weights of ByteNgramModel up to order 3 (the table size allows no more).
+DEFAULT_WEIGHTS = (0.6, 0.3, 0.09, 0.01)
+
+
+class ByteNgramModel:
+	"""Interpolated byte n-gram model over the plausible bytes (one extra id for all others)."""
+
+	def __init__(self, order: int = 3, weights: Optional[Sequence[float]] = None) -> None:
+		if order < 2:
+			raise ValueError("order must be >= 2")
+		self.order = order
+		symbols = np.flatnonzero(PLAIN_CLASSES)
+		self.vocab = len(symbols) + 1
+		self.ids = np.full(256, len(symbols), dtype=np.int64)
+		self.ids[symbols] = np.arange(len(symbols))
+		if self.vocab ** order > 1 << 26:
+			raise ValueError(f"order {order} needs a table of {self.vocab ** order} entries")
+		# Highest order first, then lower orders, then the uniform floor.
+		if weights is None:
+			if order + 1 > len(DEFAULT_WEIGHTS):
+				raise ValueError(f"No default interpolation weights for order {order}, pass {order + 1} weights")
+			weights = DEFAULT_WEIGHTS[-(order + 1):]
+		self.weights = list(weights)
+		if len(self.weights) != order + 1:
+			raise ValueError(f"Expected {order + 1} interpolation weights, got {len(self.weights)}")
+		total = sum(self.weights)
+		self.weights = [w / total for w in self.weights]
+		self.pad_id = int(self.ids[ord(" ")])
+		self.table = np.full(self.vocab ** order, np.log(1.0 / self.vocab), dtype=np.float32)
+
+	def fit(self, texts: Sequence[bytes]) -> "ByteNgramModel":
+		"""Estimate log P(byte | previous order-1 bytes) from the given texts."""
+		pad = bytes([ord(" ")]) * (self.order - 1)
+		ids = self.ids[np.frombuffer(b"".join(pad + t for t in texts) + pad, dtype=np.uint8)]
+		v = self.vocab
+		prob = np.full(v ** self.order, self.weights[-1] / v, dtype=np.float64)
+		for n in range(1, self.order + 1):
+			# n-gram index = the n most recent ids in base v.
+			index = np.zeros(len(ids) - n + 1, dtype=np.int64)
+			for j in range(n):
+				index = index * v + ids[j:len(ids) - n + 1 + j]
+			counts = np.bincount(index, minlength=v ** n).astype(np.float64).reshape(-1, v)
+			totals = counts.sum(axis=1, keepdims=True)
+			cond = np.divide(counts, totals, out=np.zeros_like(counts), where=totals > 0)
+			# Broadcast to full order: the (order - n) oldest context ids are ignored.
+			cond = np.broadcast_to(cond.reshape(1, -1), (v ** (self.order - n), v ** n)).reshape(-1)
+			prob += self.weights[self.order - n] * cond
+		self.table = np.log(prob).astype(np.float32)
+		return self
+
+	def start_context(self, count: int) -> np.ndarray:
+		"""Context index for `count` texts that have not started yet (space padding)."""
+		ctx = 0
+		for _ in range(self.order - 1):
+			ctx = ctx * self.vocab + self.pad_id
+		return np.full(count, ctx, dtype=np.int64)
+
+
+def key_domains(
+	columns: np.ndarray,
+	allowed: np.ndarray,
+	known: np.ndarray,
+) -> np.ndarray:
+	"""(L, 256) bool: key values that decrypt every text to a plausible byte of an allowed class.
+
+	columns is (L, N) ciphertext bytes, allowed (L, N) class bits from the masks,
+	known (L,) key bytes with -1 for unknown. Known bytes are the only value of
+	their domain; a position whose masks leave nothing drops the masks, and one
+	with no plausible byte at all keeps every value.
+	"""
+	keys = np.arange(256, dtype=np.uint8)
+	classes = PLAIN_CLASSES[columns[:, :, None] ^ keys]  # (L, N, 256)
+	valid = ((classes & allowed[:, :, None]) != 0).all(axis=1)
+	empty = ~valid.any(axis=1)
+	if empty.any():
+		valid[empty] = (classes[empty] != 0).all(axis=1)
+		empty = ~valid.any(axis=1)
+		valid[empty] = True
+	fixed = known >= 0
+	valid[fixed] = False
+	valid[np.flatnonzero(fixed), known[fixed]] = True
+	return valid
+
+
+def beam_search(
+	columns: np.ndarray,
+	domains: np.ndarray,
+	model: ByteNgramModel,
+	*,
+	beam_width: int = 32,
+) -> tuple[np.ndarray, float]:
+	"""Best-scoring key (L,) over the domains and its total log probability."""
+	length, n = columns.shape
+	v = model.vocab
+	shift = v ** (model.order - 2)
+	scores = np.zeros(1)
+	contexts = model.start_context(n)[None, :]  # (B, N)
+	# Contexts of all texts packed into one int64 when they fit, for a cheap 1-D unique.
+	radix = v ** (model.order - 1)
+	packed = radix ** n < 1 << 63
+	shortlist = beam_width * 8
+	place = np.array([radix ** i for i in range(n)], dtype=np.int64) if packed else None
+	parents = np.zeros((length, beam_width), dtype=np.int32)
+	choices = np.zeros((length, beam_width), dtype=np.uint8)
+	for pos in range(length):
+		keys = np.flatnonzero(domains[pos]).astype(np.uint8)
+		ids = model.ids[columns[pos][None, :] ^ keys[:, None]]  # (D, N)
+		cells = contexts[:, None, :] * v + ids[None, :, :]  # (B, D, N)
+		total = (scores[:, None] + model.table[cells].sum(axis=2)).reshape(-1)
+		next_ctx = ((contexts[:, None, :] % shift) * v + ids[None, :, :]).reshape(-1, n)
+
+		# Only the best few candidates can survive recombination; sort just those.
+		order = np.arange(len(total))
+		if len(total) > shortlist:
+			order = np.argpartition(-total, shortlist)[:shortlist]
+		order = order[np.argsort(-total[order], kind="stable")]
+		# Keep the best beam per next context, then the best beam_width of those.
+		if packed:
+			_, first = np.unique(next_ctx[order] @ place, return_index=True)
+		else:
+			_, first = np.unique(next_ctx[order], axis=0, return_index=True)
+		order = order[np.sort(first)]
+		order = order[:beam_width]
+		parent, choice = np.divmod(order, len(keys))
+		parents[pos, :len(order)] = parent
+		choices[pos, :len(order)] = keys[choice]
+		scores = total[order]
+		contexts = next_ctx[order]
+
+	key = np.zeros(length, dtype=np.uint8)
+	beam = 0
+	for pos in range(length - 1, -1, -1):
+		key[pos] = choices[pos, beam]
+		beam = parents[pos, beam]
+	return key, float(scores[0])
+
+
+def mask_class_bits(mask3_lines: Sequence[str], mask4_lines: Sequence[str], count: int, length: int) -> np.ndarray:
+	"""(length, count) allowed class bits; all classes where no mask line is given."""
+	allowed = np.full((length, count), CLASS_BITS, dtype=np.uint8)
+	for i in range(count):
+		m3 = mask3_lines[i] if i < len(mask3_lines) else ""
+		m4 = mask4_lines[i] if i < len(mask4_lines) else ""
+		allowed[:, i] = allowed_classes(encode_mask(m3), encode_mask(m4), length)
+	return allowed
+
+
+def known_plaintext_segments(ciphertexts: Sequence[bytes], key: np.ndarray) -> list[bytes]:
+	"""Runs of plaintext under known key bytes, for training the model."""
+	segments: list[bytes] = []
+	known = key >= 0
+	edges = np.flatnonzero(np.diff(np.concatenate([[0], known.astype(np.int8), [0]])))
+	for start, stop in zip(edges[::2], edges[1::2]):
+		for c in ciphertexts:
+			segments.append(bytes(np.frombuffer(c[start:stop], dtype=np.uint8) ^ key[start:stop].astype(np.uint8)))
+	return segments
+
+
+def solve_key(
+	ciphertexts: Sequence[bytes],
+	*,
+	known_key: np.ndarray,
+	mask3_lines: Sequence[str] = (),
+	mask4_lines: Sequence[str] = (),
+	corpus: Sequence[bytes] = (),
+	order: int = 3,
+	beam_width: int = 32,
+) -> tuple[np.ndarray, dict]:
+	"""Fill the key over common_len; returns (key, stats). known_key uses -1 for unknown bytes."""
+	length = min(len(c) for c in ciphertexts)
+	rows, _present = stack_ciphertexts(ciphertexts)
+	columns = np.ascontiguousarray(rows[:, :length].T)
+	known = np.full(length, -1, dtype=np.int16)
+	known[:min(length, len(known_key))] = known_key[:length]
+
+	allowed = mask_class_bits(mask3_lines, mask4_lines, len(ciphertexts), length)
+	domains = key_domains(columns, allowed, known)
+	model = ByteNgramModel(order).fit([*corpus, *known_plaintext_segments(ciphertexts, known)])
+	key, score = beam_search(columns, domains, model, beam_width=beam_width)
+	sizes = domains.sum(axis=1)
+	stats = {
+		"length": length,
+		"known": int((known >= 0).sum()),
+		"mean_domain": float(sizes[known < 0].mean()) if (known < 0).any() else 1.0,
+		"log_prob": score,
+	}
+	return key, stats
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Fill the K3 key automatically (masks + byte n-gram beam search).")
+	parser.add_argument("--task", default=DEFAULT_TASK_PATH)
+	parser.add_argument("--state", default="state.json")
+	parser.add_argument("--masks-from", default="plaintexts_guess.txt", help="file with mask3/mask4 lines (written by main.py)")
+	parser.add_argument("--corpus", nargs="*", default=[], help="text files (utf-8) to train the n-gram model on")
+	parser.add_argument("--order", type=int, choices=(2, 3), default=3)
+	parser.add_argument("--beam", type=int, default=32)
+	parser.add_argument("--from-scratch", action="store_true", help="ignore the key bytes already in the state")
+	parser.add_argument("--apply", action="store_true", help="write the solved key bytes into the state")
+	parser.add_argument("--journal", default="key_journal.bin", help="key journal to record --apply in (see key_journal.py)")
+	parser.add_argument("--preview", type=int, default=120, help="characters of each plaintext to print")
+	args = parser.parse_args()
+
+	ciphertexts = load_ciphertexts(args.task)
+	state = load_state(args.state) if resolve_state_path(args.state).exists() else None
+	key_list = (state or {}).get("key") or []
+	known_key = np.array([-1 if b is None or args.from_scratch else b for b in key_list], dtype=np.int16)
+
+	mask3_lines: list[str] = []
+	mask4_lines: list[str] = []
+	if Path(args.masks_from).exists():
+		mask3_lines, mask4_lines = parse_masks_two(args.masks_from, expected_count=len(ciphertexts))
+	corpus = [Path(p).read_text(encoding="utf-8").encode("cp1251", errors="replace") for p in args.corpus]
+
+	key, stats = solve_key(
+		ciphertexts,
+		known_key=known_key,
+		mask3_lines=mask3_lines,
+		mask4_lines=mask4_lines,
+		corpus=corpus,
+		order=args.order,
+		beam_width=args.beam,
+	)
+	print(
+		f"length={stats['length']} known={stats['known']} "
+		f"mean domain={stats['mean_domain']:.1f} log P={stats['log_prob']:.1f}"
+	)
+	solved = [int(b) for b in key]
+	for i, view in enumerate(decrypted_views(ciphertexts, solved), start=1):
+		print(f"Plaintext {i}: {view[:args.preview].decode('cp1251', errors='replace')}")
+
+	if args.apply:
+		if state is None:
+			raise SystemExit(f"{args.state}: no state to update, run main.py first")
+		key_map = KeyMap.from_state(state, length=max(len(key_list), len(solved)))
+		old_key = key_map.to_list()
+		conflicts = key_map.conflicts(solved)
+		if conflicts.size:
+			by_source = np.bincount(key_map.source[conflicts], minlength=len(SOURCES))
+			print(
+				f"Расходится с известным ключом: {conflicts.size} байт ("
+				+ ", ".join(f"{SOURCES[code]}={n}" for code, n in enumerate(by_source.tolist()) if n)
+				+ ")"
+			)
+		if args.from_scratch:
+			key_map.sync(solved, source="auto_solver", positions=np.arange(len(solved)))
+		else:
+			# Only unknown (or less confident) bytes are filled; the rest of the key stays as it is.
+			key_map.propose(solved, source="auto_solver")
+		saved = commit_key(args.state, state, ciphertexts, key_map, old_key, source="auto_solver", journal_path=args.journal)
+		print(f"Ключ записан в {saved}; запустите main.py, чтобы обновить plaintexts_guess*.txt")
+
+
+if __name__ == "__main__":
+	main()
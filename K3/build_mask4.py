@@ -1,24 +1,11 @@
-import ast
-import base64
-import json
 from pathlib import Path
-from typing import Any
 
-
-HEX_ID_ALPHABET = "0123456789ABCDEF"
+from help_methods import load_ciphertexts
+from pad_engine import class_mask_lines
+from xor_index import load_xor_maps4
 
 
-def _parse_id(value: object) -> int:
-    if isinstance(value, int):
-        return value
-    if isinstance(value, str):
-        text = value.strip()
-        if not text:
-            raise ValueError("Empty id")
-        if text.isdigit():
-            return int(text, 10)
-        return int(text, 16)
-    raise TypeError(f"Unsupported id type: {type(value)!r}")
+HEX_ID_ALPHABET = "0123456789ABCDEF"
 
 
 def _encode_id_to_hex_digit(value: int) -> str:
@@ -31,59 +18,6 @@ def _bin_prefix(value: int, prefix_len: int) -> str:
     return format(value, "08b")[:prefix_len]
 
 
-def _extract_three_base64_ciphertexts(task_path: Path) -> list[bytes]:
-    text = task_path.read_text(encoding="utf-8", errors="replace")
-
-    # The file contains Python bytes literals like: b'....'
-    # We parse them with ast.literal_eval for correctness.
-    blobs: list[bytes] = []
-    start = 0
-    while True:
-        b_index = text.find("b'", start)
-        if b_index == -1:
-            break
-        end_index = text.find("'", b_index + 2)
-        if end_index == -1:
-            break
-
-        # Since base64 doesn't contain single quotes, the first one after b' is the closing quote.
-        token = text[b_index : end_index + 1]
-        try:
-            literal = ast.literal_eval(token)
-        except Exception:
-            start = end_index + 1
-            continue
-
-        if isinstance(literal, (bytes, bytearray)):
-            blobs.append(bytes(literal))
-            if len(blobs) == 3:
-                return blobs
-        start = end_index + 1
-
-    raise ValueError(f"Expected 3 base64 ciphertexts in {task_path}, found {len(blobs)}")
-
-
-def _load_xor_maps(xor_maps_path: Path) -> tuple[int, dict[str, int]]:
-    data: dict[str, Any] = json.loads(xor_maps_path.read_text(encoding="utf-8"))
-    prefix_len = int(data.get("bin_prefix_len", 2))
-
-    mapping = data.get("xor_triplet_to_triples")
-    if not isinstance(mapping, dict):
-        raise ValueError("xor_triplet_to_triples must be a dict")
-
-    key_to_id: dict[str, int] = {}
-
-    # Expected format for this lab: key -> {id: int, triples: list[triple]}
-    for key, value in mapping.items():
-        if not (isinstance(value, dict) and "id" in value):
-            raise ValueError(
-                "xor_maps4.json must contain numbered xor_triplet_to_triples entries (key -> {id, triples})"
-            )
-        key_to_id[key] = _parse_id(value["id"])
-
-    return prefix_len, key_to_id
-
-
 def build_masks(
     ciphertexts: list[bytes],
     prefix_len: int,
@@ -135,16 +69,20 @@ def build_masks(
 def main() -> None:
     k3_dir = Path(__file__).resolve().parent
     task_path = k3_dir / "2026_02_24_10_27_04_Анна_Казакевич_task.txt"
-    xor_maps_path = k3_dir / "xor_maps4.json"
-
-    base64_ciphertexts = _extract_three_base64_ciphertexts(task_path)
-    ciphertexts = [base64.b64decode(blob) for blob in base64_ciphertexts]
 
-    prefix_len, key_to_id = _load_xor_maps(xor_maps_path)
+    ciphertexts = load_ciphertexts(task_path)
+    if len(ciphertexts) < 2:
+        raise ValueError(f"Expected at least 2 base64 ciphertexts in {task_path}, found {len(ciphertexts)}")
 
-    masks = build_masks(ciphertexts, prefix_len, key_to_id)
+    if len(ciphertexts) == 3:
+        xor_maps = load_xor_maps4()
+        masks = build_masks(ciphertexts, xor_maps.prefix_len, xor_maps.key_to_id)
+    else:
+        # Xor-triplet ids only exist for 3 texts; for any other count derive the
+        # class symbols directly from pairwise constraints (see pad_engine).
+        masks = class_mask_lines(ciphertexts, variant="mask4", equal_marks="pairs")
 
-    out_path = k3_dir / "mask4_final_3.txt"
+    out_path = k3_dir / f"mask4_final_{len(ciphertexts)}.txt"
     out_path.write_text("\n".join(masks), encoding="utf-8")
 
     print(f"loaded ciphertext bytes: {[len(c) for c in ciphertexts]}")
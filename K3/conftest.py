@@ -0,0 +1,2 @@
+# Analysis scripts whose names match the pytest patterns; they run on import.
+collect_ignore = ["test_decline.py"]
@@ -0,0 +1,238 @@
+"""Batched crib dragging: many cribs against one xored ciphertext pair in a single sweep.
+
+For a pair xored = m1 ^ m2 and a crib of length m, every offset o gives the
+fragment xored[o:o+m] ^ crib. Cribs are grouped by length; a group is scored
+against all offsets at once by walking the m window columns (a sliding-window
+view of xored) and adding up a 256-entry printable table, so the cost is one
+(cribs x offsets) array operation per crib byte instead of a Python loop per
+offset. Only the best max_hits offsets per crib are kept (an argpartition on a
+packed rank, not a sort of every hit), and fragments are built for those only.
+
+Hits are the dicts crib_drag() returns: offset, fragment_bytes, fragment_ascii
+and printable_ratio, best ratio first, then by offset.
+
+drag_cribs_keyed() uses everything known instead of one xored pair: a crib in
+text i at offset p implies the key bytes c_i ^ crib, which must agree with the
+known key bytes and decrypt every text to a plausible byte of a class its
+masks allow. Survivors are ranked by the summed byte log-frequencies of the
+implied text in the other ciphertexts.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from xor_index import PLAIN_CLASSES
+
+
+# Printable ASCII plus tab, newline and carriage return (help_methods._is_ascii_printable).
+PRINTABLE = np.zeros(256, dtype=bool)
+PRINTABLE[32:127] = True
+PRINTABLE[[9, 10, 13]] = True
+
+
+def crib_bytes(crib: str | bytes, *, encoding: str = "ascii") -> bytes:
+	if isinstance(crib, str):
+		return crib.encode(encoding, errors="strict")
+	return bytes(crib)
+
+
+def load_cribs(path: str | Path, *, encoding: str = "ascii") -> list[str]:
+	"""Cribs from a dictionary file, one per line (spaces kept, empty lines skipped).
+
+	Lines that do not fit the crib encoding are skipped, so a general word list
+	can be used as is.
+	"""
+	cribs: list[str] = []
+	for line in Path(path).read_text(encoding="utf-8", errors="replace").splitlines():
+		if not line:
+			continue
+		try:
+			line.encode(encoding, errors="strict")
+		except UnicodeEncodeError:
+			continue
+		cribs.append(line)
+	return cribs
+
+
+def _hit(xored: np.ndarray, crib: np.ndarray, offset: int, printable: int) -> dict:
+	fragment = (xored[offset:offset + len(crib)] ^ crib).tobytes()
+	return {
+		"offset": offset,
+		"fragment_bytes": fragment,
+		"fragment_ascii": fragment.decode("ascii", errors="replace"),
+		"printable_ratio": printable / len(crib),
+	}
+
+
+def _drag_group(
+	xored: np.ndarray,
+	group: np.ndarray,
+	*,
+	min_printable_ratio: float,
+	max_hits: int,
+) -> list[list[dict]]:
+	"""Hits for cribs of one length: group is (C, m)."""
+	count, m = group.shape
+	windows = sliding_window_view(xored, m)  # (W, m)
+	offsets = len(windows)
+	printable = np.zeros((count, offsets), dtype=np.int32)
+	for t in range(m):
+		printable += PRINTABLE[windows[:, t] ^ group[:, t, None]]
+	# The same float division crib_drag() compares with.
+	ok = printable / m >= min_printable_ratio
+
+	# Best first: most printable bytes, then the lowest offset.
+	rank = np.where(ok, (m - printable).astype(np.int64) * offsets + np.arange(offsets), np.iinfo(np.int64).max)
+	if 0 < max_hits < offsets:
+		rank = np.take_along_axis(rank, np.argpartition(rank, max_hits - 1, axis=1)[:, :max_hits], axis=1)
+	rank.sort(axis=1)
+
+	results: list[list[dict]] = []
+	for c in range(count):
+		row = rank[c]
+		row = row[row != np.iinfo(np.int64).max]
+		missing, found = np.divmod(row, offsets)
+		results.append([_hit(xored, group[c], int(o), m - int(x)) for o, x in zip(found, missing)])
+	return results
+
+
+def drag_cribs(
+	xored: bytes,
+	cribs: Sequence[str | bytes],
+	*,
+	encoding: str = "ascii",
+	min_printable_ratio: float = 0.85,
+	max_hits: int = 0,
+	batch_cells: int = 1 << 22,
+) -> list[list[dict]]:
+	"""Hits for every crib (in input order) against xored; max_hits <= 0 keeps all of them.
+
+	Cribs of one length are scored together in batches of about batch_cells
+	(crib, offset) cells, which bounds memory for large dictionaries.
+	"""
+	data = np.frombuffer(bytes(xored), dtype=np.uint8)
+	encoded = [crib_bytes(crib, encoding=encoding) for crib in cribs]
+	results: list[list[dict]] = [[] for _ in encoded]
+
+	by_length: dict[int, list[int]] = {}
+	for index, crib in enumerate(encoded):
+		if crib and len(crib) <= len(data):
+			by_length.setdefault(len(crib), []).append(index)
+
+	for m, indices in by_length.items():
+		batch = max(1, batch_cells // (len(data) - m + 1))
+		for start in range(0, len(indices), batch):
+			chunk = indices[start:start + batch]
+			group = np.frombuffer(b"".join(encoded[i] for i in chunk), dtype=np.uint8).reshape(len(chunk), m)
+			hits = _drag_group(data, group, min_printable_ratio=min_printable_ratio, max_hits=max_hits)
+			for index, crib_hits in zip(chunk, hits):
+				results[index] = crib_hits
+	return results
+
+
+def byte_log_frequencies(samples: Sequence[bytes]) -> np.ndarray:
+	"""(256,) log frequency of each byte in the samples, add-one smoothed."""
+	counts = np.ones(256, dtype=np.float64)
+	for sample in samples:
+		counts += np.bincount(np.frombuffer(bytes(sample), dtype=np.uint8), minlength=256)
+	return np.log(counts / counts.sum())
+
+
+def _keyed_group(
+	rows: np.ndarray,
+	known: np.ndarray,
+	allowed: np.ndarray,
+	byte_scores: np.ndarray,
+	group: np.ndarray,
+	texts: Sequence[int],
+) -> tuple[np.ndarray, np.ndarray]:
+	"""Scores (T, C, W) of cribs (C, m) in each text of `texts` at every offset, -inf where rejected,
+	and the number of unknown key bytes (W,) under each window."""
+	count, m = group.shape
+	windows = sliding_window_view(rows, m, axis=1)  # (N, W, m)
+	known_windows = sliding_window_view(known, m)  # (W, m)
+	allowed_windows = sliding_window_view(allowed, m, axis=1)  # (N, W, m)
+	scores = np.full((len(texts), count, windows.shape[1]), -np.inf)
+	for slot, text in enumerate(texts):
+		implied = windows[text][None, :, :] ^ group[:, None, :]  # (C, W, m) key bytes
+		ok = ~((known_windows >= 0) & (known_windows != implied)).any(axis=2)
+		ok &= ((PLAIN_CLASSES[group][:, None, :] & allowed_windows[text]) != 0).all(axis=2)
+		score = np.zeros(ok.shape)
+		for other in range(len(rows)):
+			if other == text:
+				continue
+			plain = windows[other][None, :, :] ^ implied
+			ok &= ((PLAIN_CLASSES[plain] & allowed_windows[other]) != 0).all(axis=2)
+			score += byte_scores[plain].sum(axis=2)
+		scores[slot][ok] = score[ok]
+	return scores, (known_windows < 0).sum(axis=1)
+
+
+def drag_cribs_keyed(
+	ciphertexts: Sequence[bytes],
+	cribs: Sequence[str | bytes],
+	*,
+	key: np.ndarray,
+	allowed: np.ndarray,
+	byte_scores: np.ndarray,
+	texts: Sequence[int] | None = None,
+	encoding: str = "ascii",
+	max_hits: int = 5,
+	min_new_key_bytes: int = 1,
+	batch_cells: int = 1 << 22,
+) -> list[list[dict]]:
+	"""Key-consistent hits for every crib (in input order), best score first.
+
+	key is (L,) int with -1 for unknown bytes over the common length L, allowed
+	(N, L) the class bits the masks allow (mask_bits.allowed_classes), byte_scores
+	(256,) log-frequencies. The crib is tried in each of `texts` (default: all) at
+	every offset; hits that add fewer than min_new_key_bytes unknown key bytes are
+	dropped. A hit has text, offset, key_bytes, new_key_bytes, fragments (bytes per
+	text) and score; max_hits <= 0 keeps all of them.
+	"""
+	length = len(key)
+	rows = np.stack([np.frombuffer(bytes(c[:length]), dtype=np.uint8) for c in ciphertexts])
+	texts = list(range(len(ciphertexts))) if texts is None else list(texts)
+	encoded = [crib_bytes(crib, encoding=encoding) for crib in cribs]
+	results: list[list[dict]] = [[] for _ in encoded]
+
+	by_length: dict[int, list[int]] = {}
+	for index, crib in enumerate(encoded):
+		if crib and len(crib) <= length:
+			by_length.setdefault(len(crib), []).append(index)
+
+	for m, indices in by_length.items():
+		offsets = length - m + 1
+		batch = max(1, batch_cells // (offsets * m))
+		for start in range(0, len(indices), batch):
+			chunk = indices[start:start + batch]
+			group = np.frombuffer(b"".join(encoded[i] for i in chunk), dtype=np.uint8).reshape(len(chunk), m)
+			scores, new_bytes = _keyed_group(rows, key, allowed, byte_scores, group, texts)
+			scores[:, :, new_bytes < min_new_key_bytes] = -np.inf
+			# (C, T * W): rank the texts and offsets of one crib together.
+			flat = scores.transpose(1, 0, 2).reshape(len(chunk), -1)
+			for c, index in enumerate(chunk):
+				found = np.flatnonzero(np.isfinite(flat[c]))
+				if 0 < max_hits < len(found):
+					found = found[np.argpartition(-flat[c, found], max_hits - 1)[:max_hits]]
+				# Best score first, then text and offset.
+				found = found[np.lexsort((found, -flat[c, found]))]
+				slots, positions = np.divmod(found, offsets)
+				crib = group[c]
+				for slot, offset, value in zip(slots.tolist(), positions.tolist(), flat[c, found].tolist()):
+					key_bytes = rows[texts[slot], offset:offset + m] ^ crib
+					results[index].append(
+						{
+							"text": texts[slot],
+							"offset": offset,
+							"key_bytes": key_bytes.tobytes(),
+							"new_key_bytes": int(new_bytes[offset]),
+							"fragments": [(row[offset:offset + m] ^ key_bytes).tobytes() for row in rows],
+							"score": value,
+						}
+					)
+	return results
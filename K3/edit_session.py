@@ -0,0 +1,294 @@
+"""Incremental K3 runs: recompute only the columns touched by manual edits.
+
+Everything main.py derives from `plaintexts_guess copy.txt` is position-local:
+a key byte depends on the manual characters of its column only, and a refined
+mask cell on the base/manual mask cells and ciphertext bytes of its column.
+EditSession keeps the last written snapshot (key, key-derived guesses, editable
+texts and display masks), diffs the re-parsed editable file against it column
+by column and reruns the key update and mask refinement on the changed columns
+only, so one edited character costs milliseconds instead of a full pass.
+
+The mask functions of help_methods are reused as is on the changed columns:
+taking the same sorted columns from every line keeps ragged texts aligned,
+because each text covers a prefix of the positions.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from help_methods import (
+	apply_manual_mask_overrides,
+	apply_manual_plaintexts_to_key,
+	load_state,
+	manual_char_to_byte,
+	merge_manual_mask_constraints,
+	overlay_manual_edits,
+	parse_masks_two,
+	refine_mask_lines_with_manual_constraints,
+	resolve_state_path,
+	save_state,
+	write_manual_mismatch_report,
+	write_plaintexts_file,
+)
+from key_map import KeyMap
+
+
+def input_fingerprint(paths: Sequence[str | Path]) -> dict[str, list[int] | None]:
+	"""Size and mtime of each input file (None if missing), stored in the state meta."""
+	out: dict[str, list[int] | None] = {}
+	for path in paths:
+		try:
+			st = Path(path).stat()
+		except OSError:
+			out[str(path)] = None
+			continue
+		out[str(path)] = [st.st_size, st.st_mtime_ns]
+	return out
+
+
+def _codes(line: str) -> np.ndarray:
+	return np.frombuffer(line.encode("utf-32-le"), dtype="<u4")
+
+
+def changed_columns(old_lines: Sequence[str], new_lines: Sequence[str]) -> np.ndarray:
+	"""Sorted positions where any line differs (length changes count from the shorter end).
+
+	Equal lines are skipped with one string compare; differing ones are compared
+	column by column as code point arrays.
+	"""
+	found: list[np.ndarray] = []
+	for i in range(max(len(old_lines), len(new_lines))):
+		old = old_lines[i] if i < len(old_lines) else ""
+		new = new_lines[i] if i < len(new_lines) else ""
+		if old == new:
+			continue
+		a, b = _codes(old), _codes(new)
+		common = min(len(a), len(b))
+		found.append(np.flatnonzero(a[:common] != b[:common]))
+		found.append(np.arange(common, max(len(a), len(b))))
+	if not found:
+		return np.zeros(0, dtype=np.int64)
+	return np.unique(np.concatenate(found))
+
+
+def _take(line: str | bytes, columns: Sequence[int]) -> str | bytes:
+	"""Characters (or bytes) of `line` at the sorted `columns` that it covers."""
+	if isinstance(line, str):
+		return "".join(line[p] for p in columns if p < len(line))
+	return bytes(line[p] for p in columns if p < len(line))
+
+
+def _put(line: str, columns: Sequence[int], values: str) -> str:
+	"""Inverse of _take(): write `values` back at the first len(values) columns."""
+	if not values:
+		return line
+	buf = list(line)
+	for p, ch in zip(columns, values):
+		buf[p] = ch
+	return "".join(buf)
+
+
+class EditSession:
+	"""Last written K3 snapshot plus the column-wise update from a new manual edit."""
+
+	def __init__(
+		self,
+		*,
+		ciphertexts: Sequence[bytes],
+		base_mask3: Sequence[str],
+		base_mask4: Sequence[str],
+		key: list[int | None],
+		guesses: Sequence[bytes],
+		snapshot: Sequence[str],
+		display3: Sequence[str],
+		display4: Sequence[str],
+		reference_texts: Sequence[str],
+		char_to_byte: Callable[[str], int | None] = manual_char_to_byte,
+		key_map: Optional[KeyMap] = None,
+	) -> None:
+		self.ciphertexts = list(ciphertexts)
+		self.common_len = min(len(c) for c in self.ciphertexts)
+		self.base_mask3 = list(base_mask3)
+		self.base_mask4 = list(base_mask4)
+		self.key = key
+		self.key_map = key_map if key_map is not None else KeyMap.from_key(key, length=self.common_len)
+		self.guesses = [bytearray(g) for g in guesses]
+		self.snapshot = list(snapshot)
+		self.display3 = list(display3)
+		self.display4 = list(display4)
+		self.reference_texts = list(reference_texts)
+		self.char_to_byte = char_to_byte
+		self.editable: list[bytearray] = [bytearray(g) for g in self.guesses]
+
+	@classmethod
+	def from_state(
+		cls,
+		state_path: str | Path,
+		*,
+		ciphertexts: Sequence[bytes],
+		base_mask3: Sequence[str],
+		base_mask4: Sequence[str],
+		reference_texts: Sequence[str],
+		display_path: str | Path,
+		inputs: dict,
+		char_to_byte: Callable[[str], int | None] = manual_char_to_byte,
+	) -> Optional["EditSession"]:
+		"""Resume from the state and display masks of the last run, or None if a full run is needed.
+
+		A full run is needed when there is no snapshot yet or when the task, mask
+		or reference files changed since it was written (see input_fingerprint()).
+		"""
+		if not resolve_state_path(state_path).exists() or not Path(display_path).exists():
+			return None
+		try:
+			state = load_state(state_path)
+		except Exception:
+			return None
+		n = len(ciphertexts)
+		common_len = min(len(c) for c in ciphertexts)
+		if (
+			state["meta"].get("inputs") != inputs
+			or state["ciphertexts"] != [bytes(c) for c in ciphertexts]
+			or len(state["key"]) != common_len
+			or len(state["plaintexts"]) != n
+			or len(state["manual_plaintexts"]) != n
+		):
+			return None
+		display3, display4 = parse_masks_two(display_path, expected_count=n)
+		if not all(display3) or not all(display4):
+			return None
+		return cls(
+			ciphertexts=ciphertexts,
+			base_mask3=base_mask3,
+			base_mask4=base_mask4,
+			key=state["key"],
+			guesses=state["plaintexts"],
+			snapshot=state["manual_plaintexts"],
+			display3=display3,
+			display4=display4,
+			reference_texts=reference_texts,
+			char_to_byte=char_to_byte,
+			key_map=KeyMap.from_state(state, length=common_len),
+		)
+
+	def apply(
+		self,
+		edited_plaintexts: Sequence[str],
+		edited_masks3: Sequence[str],
+		edited_masks4: Sequence[str],
+	) -> dict:
+		"""Update key, guesses, editable texts and display masks from a parsed edit.
+
+		Returns the apply_manual_plaintexts_to_key() stats plus the changed
+		columns: text_positions (manual plaintext), key_positions (with the
+		previous bytes in key_old) and mask_positions.
+		"""
+		text_pos = changed_columns(self.snapshot, edited_plaintexts)
+		text_pos = text_pos[text_pos < self.common_len].tolist()
+		old_key = [self.key[p] for p in text_pos]
+		stats = apply_manual_plaintexts_to_key(
+			ciphertexts=self.ciphertexts,
+			manual_plaintexts=edited_plaintexts,
+			key=self.key,
+			common_len=self.common_len,
+			prev_plaintexts=self.snapshot,
+			char_to_byte=self.char_to_byte,
+			positions=text_pos,
+		)
+		key_changes = [(p, old) for p, old in zip(text_pos, old_key) if self.key[p] != old]
+		key_pos = [p for p, _old in key_changes]
+		self.key_map.sync(self.key, source="manual", positions=key_pos)
+		for guess, cipher in zip(self.guesses, self.ciphertexts):
+			for p in key_pos:
+				k = self.key[p]
+				guess[p] = ord("_") if k is None else cipher[p] ^ k
+
+		self.editable = [bytearray(g) for g in self.guesses]
+		overlay_manual_edits(
+			self.editable,
+			manual_plaintexts=edited_plaintexts,
+			prev_plaintexts=self.snapshot,
+			positions=text_pos,
+			char_to_byte=self.char_to_byte,
+		)
+		self.snapshot = [bytes(b).decode("cp1251", errors="replace") for b in self.editable]
+
+		maxlen = max(len(c) for c in self.ciphertexts)
+		mask_pos = np.union1d(
+			changed_columns(self.display3, edited_masks3),
+			changed_columns(self.display4, edited_masks4),
+		)
+		mask_pos = mask_pos[mask_pos < maxlen].tolist()
+		if mask_pos:
+			self._refine_columns(mask_pos, edited_masks3, edited_masks4)
+
+		stats.update(
+			text_positions=text_pos,
+			key_positions=key_pos,
+			key_old=[old for _p, old in key_changes],
+			mask_positions=mask_pos,
+		)
+		return stats
+
+	def _refine_columns(self, columns: list[int], edited_masks3: Sequence[str], edited_masks4: Sequence[str]) -> None:
+		ciphertexts = [_take(c, columns) for c in self.ciphertexts]
+		base3 = [_take(m, columns) for m in self.base_mask3]
+		base4 = [_take(m, columns) for m in self.base_mask4]
+		overrides3 = apply_manual_mask_overrides(base_masks=base3, manual_masks=[_take(m, columns) for m in edited_masks3])
+		overrides4 = apply_manual_mask_overrides(base_masks=base4, manual_masks=[_take(m, columns) for m in edited_masks4])
+		constraint_masks = merge_manual_mask_constraints(overrides3, overrides4)
+		for variant, base, overrides, display in (
+			("mask3", base3, overrides3, self.display3),
+			("mask4", base4, overrides4, self.display4),
+		):
+			refined = refine_mask_lines_with_manual_constraints(
+				ciphertexts=ciphertexts,
+				base_masks=base,
+				manual_masks=overrides,
+				constraint_masks=constraint_masks,
+				mask_variant=variant,
+			)
+			for i, line in enumerate(refined):
+				display[i] = _put(display[i], columns, line)
+
+	def write_outputs(
+		self,
+		*,
+		plaintexts_path: str | Path,
+		edited_path: str | Path,
+		report_path: str | Path,
+	) -> int:
+		"""Write the guess file, the editable copy and the mismatch report; returns the mismatch count."""
+		_path, mismatch_count = write_manual_mismatch_report(
+			ciphertexts=self.ciphertexts,
+			manual_plaintexts=self.snapshot,
+			key=self.key,
+			common_len=self.common_len,
+			out_path=report_path,
+			char_to_byte=self.char_to_byte,
+			key_map=self.key_map,
+		)
+		for path, plaintexts in ((plaintexts_path, self.guesses), (edited_path, self.editable)):
+			write_plaintexts_file(
+				path,
+				plaintexts,
+				encoding="cp1251",
+				masks=self.display3,
+				masks2=self.display4,
+				reference_texts=self.reference_texts,
+			)
+		return mismatch_count
+
+	def save(self, state_path: str | Path, *, meta: dict) -> Path:
+		return save_state(
+			state_path,
+			ciphertexts=self.ciphertexts,
+			key=self.key,
+			plaintexts=self.guesses,
+			manual_plaintexts=self.snapshot,
+			meta=meta,
+			key_map=self.key_map,
+		)
@@ -1,96 +1,46 @@
 from __future__ import annotations
 
-import base64
+import codecs
 import json
 import itertools
 import re
 import string
+import sys
 
 from collections import defaultdict, deque
 from datetime import datetime
+from functools import lru_cache
 from itertools import combinations
 from pathlib import Path
 from typing import Callable, Iterable, Literal, Optional, Sequence
 
-
-_HEADER_RE = re.compile(r"^\s*Шифр\s+(\d+)\s*(?:\(base64\))?\s*:\s*(.*)\s*$")
-_HEADER_ONLY_RE = re.compile(r"^\s*Шифр\s+(\d+)\s*\(base64\)\s*:\s*$")
-_BYTES_LITERAL_RE = re.compile(r"^\s*b([\"'])(.*)\1\s*$")
-
-
-def load_ciphertexts(task_path: str | Path) -> list[bytes]:
-	"""Load ciphertexts from a task text file.
-
-	Supported formats:
-	- Two-line blocks:
-		Шифр 1 (base64):
-		b'...'
-	- One-line blocks:
-		Шифр 1: b'...'
-		Шифр 1: ...
-
-	Returns ciphertexts as decoded bytes in the order they appear.
-	"""
-	path = Path(task_path)
-	if not path.exists():
-		raise FileNotFoundError(f"Task file not found: {path}")
-
-	with path.open("r", encoding="utf-8") as file:
-		raw_lines = [line.rstrip("\n") for line in file]
-
-	ciphertexts: list[tuple[int, bytes]] = []
-
-	index = 0
-	while index < len(raw_lines):
-		line = raw_lines[index].strip()
-		index += 1
-		if not line:
-			continue
-
-		match_inline = _HEADER_RE.match(line)
-		if match_inline:
-			number = int(match_inline.group(1))
-			remainder = (match_inline.group(2) or "").strip()
-			if remainder:
-				b64_text = _extract_base64_payload(remainder)
-				ciphertexts.append((number, base64.b64decode(b64_text)))
-				continue
-
-		match_header_only = _HEADER_ONLY_RE.match(line)
-		if not match_header_only:
-			continue
-
-		number = int(match_header_only.group(1))
-
-		# Next non-empty line should contain b'...'
-		while index < len(raw_lines) and not raw_lines[index].strip():
-			index += 1
-		if index >= len(raw_lines):
-			break
-
-		data_line = raw_lines[index].strip()
-		index += 1
-		b64_text = _extract_base64_payload(data_line)
-		ciphertexts.append((number, base64.b64decode(b64_text)))
-
-	if not ciphertexts:
-		raise ValueError("No ciphertext blocks found in the task file")
-
-	# Keep stable order by appearance; numbering is useful but not enforced.
-	ciphertexts.sort(key=lambda item: item[0])
-	return [cipher for _, cipher in ciphertexts]
-
-
-def _extract_base64_payload(text: str) -> str:
-	text = text.strip()
-	literal_match = _BYTES_LITERAL_RE.match(text)
-	if literal_match:
-		return literal_match.group(2)
-	if text.startswith("b'") and text.endswith("'"):
-		return text[2:-1]
-	if text.startswith('b"') and text.endswith('"'):
-		return text[2:-1]
-	return text
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from state_store import export_json, key_to_array, key_to_list, load_any, resolve_state_path, save_store  # noqa: E402
+from task_loader import load_ciphertexts  # noqa: E402,F401
+from pad_engine import (  # noqa: E402
+	all_equal_positions,
+	class_mask_lines,
+	forced_classes,
+	iter_consistent_columns,
+	stack_ciphertexts,
+)
+from xor_index import load_xor_maps4  # noqa: E402
+from key_view import DecryptedView, decrypted_views  # noqa: E402
+from key_map import KeyMap  # noqa: E402
+# Module import: key_journal imports help_methods back for its CLI.
+import key_journal  # noqa: E402
+from crib_engine import byte_log_frequencies, drag_cribs, drag_cribs_keyed  # noqa: E402
+from mask_bits import (  # noqa: E402
+	CLASS_BITS,
+	allowed_classes,
+	encode_mask,
+	merge_constraints,
+	override_classes,
+	render_mask,
+)
 
 
 def xor_bytes(left: bytes, right: bytes, *, truncate_to_min: bool = True) -> bytes:
@@ -101,21 +51,24 @@ def xor_bytes(left: bytes, right: bytes, *, truncate_to_min: bool = True) -> byt
 	"""
 	if not truncate_to_min and len(left) != len(right):
 		raise ValueError("xor_bytes requires equal-length inputs when truncate_to_min=False")
-	return bytes(a ^ b for a, b in zip(left, right))
+	length = min(len(left), len(right))
+	return (
+		np.frombuffer(bytes(left[:length]), dtype=np.uint8) ^ np.frombuffer(bytes(right[:length]), dtype=np.uint8)
+	).tobytes()
 
 
 
 def try_restore_plaintexts_from_state(state_path: str | Path) -> list[str]:
-	"""Best-effort load of previous *manual plaintexts* from state.json.
+	"""Best-effort load of previous *manual plaintexts* from the saved state (state.bin or state.json).
 
 	We use this only to detect what the user changed between runs, to resolve
 	manual conflicts by preferring the most recently changed symbol.
 	"""
-	path = Path(state_path)
+	path = resolve_state_path(state_path)
 	if not path.exists():
 		return []
 	try:
-		state = load_state(path)
+		state = load_state(state_path)
 	except Exception:
 		return []
 	manual_plaintexts = state.get("manual_plaintexts") or []
@@ -280,19 +233,72 @@ def merge_manual_mask_constraints(mask3_lines: Sequence[str], mask4_lines: Seque
 	for i in range(count):
 		m3 = mask3_lines[i] if i < len(mask3_lines) else ""
 		m4 = mask4_lines[i] if i < len(mask4_lines) else ""
-		length = max(len(m3), len(m4))
-		buf: list[str] = ["_"] * length
-		for pos in range(length):
-			s4 = m4[pos] if pos < len(m4) else "_"
-			s3 = m3[pos] if pos < len(m3) else "_"
-			if s4 in CLASS_SYMBOL_INV:
-				buf[pos] = s4
-			elif s3 in {"#", "<", ">"}:
-				buf[pos] = s3
-		out.append("".join(buf))
+		out.append(render_mask(merge_constraints(encode_mask(m3), encode_mask(m4))))
 	return out
 
 
+_REFINE_ALLOWED = {
+	"mask3": frozenset({0, 1}),
+	"mask4": frozenset(ALLOWED),
+}
+
+
+@lru_cache(maxsize=4096)
+def _solve_refine_signature(
+	mask_variant: str,
+	present: tuple[int, ...],
+	deltas: tuple[int, ...],
+	fixed: tuple[int, ...],
+) -> tuple[int | None, ...]:
+	"""Forced class per present node for one position of mask refinement.
+
+	The signature is canonical: deltas follow combinations(present, 2) order with
+	-1 for pairs that give no constraint, fixed follows present with -1 for free
+	nodes. Positions repeat the same few signatures, so this is memoized and
+	shared between the mask3 and mask4 passes.
+	"""
+	edges = [
+		(i, j, d)
+		for (i, j), d in zip(combinations(present, 2), deltas)
+		if d >= 0
+	]
+	if not edges:
+		return tuple(None for _ in present)
+
+	graph: dict[int, set[int]] = defaultdict(set)
+	for i, j, _d in edges:
+		graph[i].add(j)
+		graph[j].add(i)
+
+	fixed_map = {i: cls for i, cls in zip(present, fixed) if cls >= 0}
+	forced: dict[int, int] = {}
+	visited: set[int] = set()
+	for root in present:
+		if root in visited:
+			continue
+		stack = [root]
+		comp: list[int] = []
+		visited.add(root)
+		while stack:
+			u = stack.pop()
+			comp.append(u)
+			for v in graph[u]:
+				if v not in visited:
+					visited.add(v)
+					stack.append(v)
+
+		comp_edges = [(i, j, d) for (i, j, d) in edges if i in comp and j in comp]
+		fixed_comp = {i: fixed_map[i] for i in comp if i in fixed_map}
+		solutions = solve_component_generic(comp, comp_edges, allowed=set(_REFINE_ALLOWED[mask_variant]), fixed=fixed_comp)
+		# Unsatisfiable constraints force nothing; callers keep base/manual characters.
+		for i in comp:
+			possible = {sol[i] for sol in solutions}
+			if len(possible) == 1:
+				forced[i] = next(iter(possible))
+
+	return tuple(forced.get(i) for i in present)
+
+
 def refine_mask_lines_with_manual_constraints(
 	*,
 	ciphertexts: Sequence[bytes],
@@ -318,30 +324,21 @@ def refine_mask_lines_with_manual_constraints(
 
 	# Start from manual masks so user edits are visible.
 	out_masks: list[list[str]] = []
-	manual_constraint_syms = set(CLASS_SYMBOL_INV.keys()) | {"#", "<", ">"}
 	for i in range(n):
 		base = base_masks[i] if i < len(base_masks) else ""  # may contain hex digits
 		manual = manual_masks[i] if i < len(manual_masks) else ""
-		length = len(ciphertexts[i])
-		buf = list(base[:length])
 		# Apply ONLY manual class constraints on top of base.
 		# This keeps the editable file free to contain display helpers like '|' and '_'
 		# without them being treated as persistent overrides.
-		limit = min(len(buf), len(manual))
-		for pos in range(limit):
-			s = manual[pos]
-			if s in manual_constraint_syms and s != buf[pos]:
-				buf[pos] = s
-		out_masks.append(buf)
+		codes = override_classes(encode_mask(base[:len(ciphertexts[i])]), encode_mask(manual))
+		out_masks.append(list(render_mask(codes)))
 
 	if mask_variant == "mask3":
-		allowed = {0, 1}
 		class_to_sym = {0: "#", 1: "<"}
 		sym_to_class = _mask_char_to_class_mask3
 		delta = top2bits
 		valid_deltas = {0, 1}
 	elif mask_variant == "mask4":
-		allowed = set(ALLOWED)
 		class_to_sym = dict(CLASS_SYMBOL)
 		sym_to_class = _mask_char_to_class_mask4
 		delta = top3bits
@@ -349,8 +346,11 @@ def refine_mask_lines_with_manual_constraints(
 	else:
 		raise ValueError(f"Unknown mask_variant: {mask_variant!r}")
 
+	if n > _MASK_TABLE_MAX_N:
+		return _refine_mask_lines_bitwise(ciphertexts, out_masks, constraint_masks, mask_variant, sym_to_class, class_to_sym)
+
 	for pos in range(maxlen):
-		present = [i for i, c in enumerate(ciphertexts) if pos < len(c)]
+		present = tuple(i for i, c in enumerate(ciphertexts) if pos < len(c))
 		if not present:
 			continue
 
@@ -360,73 +360,57 @@ def refine_mask_lines_with_manual_constraints(
 				out_masks[i][pos] = "&"
 			continue
 
-		fixed: dict[int, int] = {}
+		fixed: list[int] = []
 		for i in present:
-			if i >= len(constraint_masks):
-				continue
-			cm = constraint_masks[i]
-			if pos >= len(cm):
-				continue
-			cls = sym_to_class(cm[pos])
-			if cls is not None:
-				fixed[i] = cls
+			cls = None
+			if i < len(constraint_masks) and pos < len(constraint_masks[i]):
+				cls = sym_to_class(constraint_masks[i][pos])
+			fixed.append(-1 if cls is None else cls)
 
-		edges: list[tuple[int, int, int]] = []
+		deltas: list[int] = []
 		for i, j in combinations(present, 2):
-			x = ciphertexts[i][pos] ^ ciphertexts[j][pos]
-			if x == 0:
-				edges.append((i, j, 0))
-			else:
-				d = delta(x)
-				if d in valid_deltas:
-					edges.append((i, j, d))
+			d = delta(ciphertexts[i][pos] ^ ciphertexts[j][pos])
+			deltas.append(d if d in valid_deltas else -1)
 
-		if not edges:
-			continue
-
-		graph: dict[int, set[int]] = defaultdict(set)
-		for i, j, _d in edges:
-			graph[i].add(j)
-			graph[j].add(i)
-
-		visited: set[int] = set()
-		components: list[list[int]] = []
-		for i in present:
-			if i in visited:
+		forced = _solve_refine_signature(mask_variant, present, tuple(deltas), tuple(fixed))
+		for i, cls in zip(present, forced):
+			# Do not override concrete user class symbols.
+			if cls is None or out_masks[i][pos] in {"#", "<", ">"}:
 				continue
-			stack = [i]
-			comp: list[int] = []
-			visited.add(i)
-			while stack:
-				u = stack.pop()
-				comp.append(u)
-				for v in graph[u]:
-					if v not in visited:
-						visited.add(v)
-						stack.append(v)
-			components.append(comp)
+			out_masks[i][pos] = class_to_sym[cls]
 
-		for comp in components:
-			comp_edges = [(i, j, d) for (i, j, d) in edges if i in comp and j in comp]
-			fixed_comp = {i: fixed[i] for i in comp if i in fixed}
-			solutions = solve_component_generic(comp, comp_edges, allowed=allowed, fixed=fixed_comp)
-			if not solutions:
-				# Keep existing output characters (base/manual) if constraints are unsatisfiable.
-				continue
+	return ["".join(m) for m in out_masks]
 
-			possible: dict[int, set[int]] = {i: set() for i in comp}
-			for sol in solutions:
-				for i in comp:
-					possible[i].add(sol[i])
-
-			for i in comp:
-				# Do not override concrete user class symbols.
-				if out_masks[i][pos] in {"#", "<", ">"}:
-					continue
-				if len(possible[i]) == 1:
-					cls = next(iter(possible[i]))
-					out_masks[i][pos] = class_to_sym[cls]
 
+def _refine_mask_lines_bitwise(
+	ciphertexts: Sequence[bytes],
+	out_masks: list[list[str]],
+	constraint_masks: Sequence[str],
+	mask_variant: str,
+	sym_to_class: Callable[[str], int | None],
+	class_to_sym: dict[int, str],
+) -> list[str]:
+	"""Whole-array variant of the refinement loop for many ciphertexts (see pad_engine)."""
+	rows, present = stack_ciphertexts(ciphertexts)
+	# Mask code -> manual class of this variant (-1 = free).
+	class_of_code = np.full(256, -1, dtype=np.int8)
+	for sym in "#<>":
+		class_of_code[encode_mask(sym)[0]] = sym_to_class(sym)
+	fixed = np.full(rows.shape, -1, dtype=np.int8)
+	for i in range(min(len(ciphertexts), len(constraint_masks))):
+		codes = encode_mask(constraint_masks[i][:len(ciphertexts[i])])
+		fixed[i, :len(codes)] = class_of_code[codes]
+
+	forced = forced_classes(ciphertexts, variant=mask_variant, fixed=fixed)
+	equal = all_equal_positions(rows, present)
+	for i, buf in enumerate(out_masks):
+		length = len(ciphertexts[i])
+		for pos in np.flatnonzero(equal[:length]).tolist():
+			buf[pos] = "&"
+		for pos in np.flatnonzero((forced[i, :length] >= 0) & ~equal[:length]).tolist():
+			# Do not override concrete user class symbols.
+			if buf[pos] not in {"#", "<", ">"}:
+				buf[pos] = class_to_sym[int(forced[i, pos])]
 	return ["".join(m) for m in out_masks]
 
 
@@ -728,61 +712,8 @@ def parse_masks_two(
 
 	Returns (mask3_lines, mask4_lines). Missing lines become "".
 	"""
-	path = Path(file_path)
-	content = path.read_text(encoding="utf-8")
-	lines = content.splitlines()
-
-	plaintext_header_re = re.compile(r"^\s*Plaintext\s+(\d+)\s*:\s*$", re.IGNORECASE)
-
-	results3: dict[int, str] = {}
-	results4: dict[int, str] = {}
-
-	current_num: Optional[int] = None
-	current_lines: list[str] = []
-
-	def flush_block() -> None:
-		nonlocal current_num, current_lines
-		if current_num is None:
-			return
-		candidates = [ln.strip() for ln in current_lines if _MASK_LINE_RE_ANY.fullmatch(ln.strip())]
-		if len(candidates) >= 2:
-			results3[current_num - 1] = candidates[-2]
-			results4[current_num - 1] = candidates[-1]
-		elif len(candidates) == 1:
-			# Backward compatibility: single mask line.
-			only = candidates[-1]
-			if re.search(r"[A-F4-9]", only, flags=re.IGNORECASE):
-				results4[current_num - 1] = only
-			else:
-				results3[current_num - 1] = only
-		current_num = None
-		current_lines = []
-
-	for line in lines:
-		m = plaintext_header_re.match(line)
-		if m:
-			flush_block()
-			current_num = int(m.group(1))
-			current_lines = []
-			continue
-		if current_num is not None:
-			current_lines.append(line)
-	flush_block()
-
-	if expected_count is None:
-		if not (results3 or results4):
-			return ([], [])
-		max_index = max([*results3.keys(), *results4.keys()])
-		count = max_index + 1
-	else:
-		count = expected_count
-
-	out3: list[str] = []
-	out4: list[str] = []
-	for i in range(count):
-		out3.append(results3.get(i, ""))
-		out4.append(results4.get(i, ""))
-	return out3, out4
+	scan = _scan_plaintexts_file(file_path, expected_count=expected_count)
+	return _masks_from_scan(scan, expected_count)
 
 
 def refine_class_masks_with_manual_masks(
@@ -930,30 +861,157 @@ def apply_manual_mask_overrides(
 	  (Display helpers like '_' and '|' are ignored to avoid them becoming persistent overrides.)
 	- A manual character is applied only if it differs from the base at that position.
 	"""
-	allowed = {"#", "<", ">"}
 	out: list[str] = []
 	count = max(len(base_masks), len(manual_masks))
 	for i in range(count):
 		base = base_masks[i] if i < len(base_masks) else ""
 		manual = manual_masks[i] if i < len(manual_masks) else ""
-		buf = list(base)
-		limit = min(len(buf), len(manual))
-		for pos in range(limit):
-			sym = manual[pos]
-			if sym not in allowed:
-				continue
-			if sym != buf[pos]:
-				buf[pos] = sym
-		out.append("".join(buf))
+		out.append(render_mask(override_classes(encode_mask(base), encode_mask(manual))))
 	return out
 
 
+# Largest ciphertext count for which compute_mask() uses the full lookup table
+# (8 ** (n choose 2) entries: 512 for n=3, 262144 for n=4). Larger sets go
+# through pad_engine, which stays linear in the number of ciphertexts.
+_MASK_TABLE_MAX_N = 3
+
+
+def _classify_position(present: list[int], deltas: dict[tuple[int, int], int]) -> dict[int, str]:
+	"""Mask symbols at one position from the top-3-bit XOR of each present pair.
+
+	deltas maps (i, j) (i < j, both in present) to top3bits(c_i ^ c_j).
+	The all-bytes-equal case ('&') is handled by the caller.
+	"""
+	symbols = {i: "_" for i in present}
+
+	# Build constraints
+	edges: list[tuple[int, int, int]] = []
+	invalid_nodes: set[int] = set()
+	for i, j in combinations(present, 2):
+		d = deltas[(i, j)]
+		if d in {0, 1, 2, 3}:
+			edges.append((i, j, d))
+		else:
+			# This pair cannot be explained if BOTH symbols are in our 3 classes.
+			# Mark both nodes as unsafe to classify at this position.
+			invalid_nodes.add(i)
+			invalid_nodes.add(j)
+
+	# No constraints
+	if not edges:
+		return symbols
+
+	# Determine connected components
+	graph: dict[int, set[int]] = defaultdict(set)
+	for i, j, d in edges:
+		graph[i].add(j)
+		graph[j].add(i)
+
+	visited: set[int] = set()
+	components: list[list[int]] = []
+
+	for i in present:
+		if i in visited:
+			continue
+		stack = [i]
+		comp: list[int] = []
+		visited.add(i)
+		while stack:
+			u = stack.pop()
+			comp.append(u)
+			for v in graph[u]:
+				if v not in visited:
+					visited.add(v)
+					stack.append(v)
+		components.append(comp)
+
+	# Process each component
+	for comp in components:
+		comp_edges = [(i, j, d) for (i, j, d) in edges if i in comp and j in comp]
+		solutions = solve_component(comp, comp_edges)
+
+		if not solutions:
+			continue
+
+		possible: dict[int, set[int]] = {i: set() for i in comp}
+		for sol in solutions:
+			for i in comp:
+				possible[i].add(sol[i])
+
+		# Determine which nodes are forced to be equal-by-class with someone else.
+		# We mark '|' only when equality (xor=0) holds across ALL solutions.
+		forced_equal: set[int] = set()
+		if len(comp) > 1:
+			for i, j in combinations(comp, 2):
+				diffs = {sol[i] ^ sol[j] for sol in solutions}
+				if diffs == {0}:
+					forced_equal.add(i)
+					forced_equal.add(j)
+
+		for i in comp:
+			if len(possible[i]) == 1:
+				cls = next(iter(possible[i]))
+				symbols[i] = CLASS_SYMBOL[cls]
+			elif i in forced_equal:
+				symbols[i] = "|"
+
+	# Any node participating in an invalid pair is not reliably classifiable here.
+	for i in invalid_nodes:
+		symbols[i] = "_"
+
+	return symbols
+
+
+@lru_cache(maxsize=None)
+def _class_mask_table(n: int) -> np.ndarray:
+	"""Lookup table: packed pair deltas -> mask symbol (as byte) for each of n texts.
+
+	The index packs top3bits(c_i ^ c_j) for the pairs in combinations(range(n), 2)
+	order, 3 bits per pair, first pair in the lowest bits.
+	"""
+	pairs = list(combinations(range(n), 2))
+	nodes = list(range(n))
+	table = np.empty((8 ** len(pairs), n), dtype=np.uint8)
+	for code, values in enumerate(itertools.product(range(8), repeat=len(pairs))):
+		# product() varies the last pair fastest; the index puts the first pair lowest.
+		deltas = dict(zip(pairs, reversed(values)))
+		symbols = _classify_position(nodes, deltas)
+		table[code] = [ord(symbols[i]) for i in nodes]
+	return table
+
+
+def _compute_mask_table_prefix(ciphertexts: Sequence[bytes], length: int) -> list[str]:
+	"""Mask lines for positions [0, length) where every ciphertext is present."""
+	n = len(ciphertexts)
+	rows = np.stack([np.frombuffer(bytes(c[:length]), dtype=np.uint8) for c in ciphertexts])
+	codes = np.zeros(length, dtype=np.int64)
+	full_match = np.ones(length, dtype=bool)
+	for k, (i, j) in enumerate(combinations(range(n), 2)):
+		x = rows[i] ^ rows[j]
+		codes |= (x >> 5).astype(np.int64) << (3 * k)
+		full_match &= x == 0
+
+	symbols = _class_mask_table(n)[codes]
+	symbols[full_match] = ord("&")
+	return [symbols[:, i].tobytes().decode("ascii") for i in range(n)]
+
+
 def compute_mask(ciphertexts: Sequence[bytes]) -> list[str]:
 	n = len(ciphertexts)
+	if n > _MASK_TABLE_MAX_N:
+		return class_mask_lines(ciphertexts)
 	maxlen = max((len(c) for c in ciphertexts), default=0)
 	masks: list[list[str]] = [list("_" * len(c)) for c in ciphertexts]
 
-	for pos in range(maxlen):
+	# Where all ciphertexts overlap the outcome depends only on the pair deltas:
+	# look it up for all positions at once, then finish ragged tails one by one.
+	start = 0
+	if 0 < n <= _MASK_TABLE_MAX_N:
+		start = min(len(c) for c in ciphertexts)
+		for i, line in enumerate(_compute_mask_table_prefix(ciphertexts, start)):
+			masks[i][:start] = line
+
+	for pos in range(start, maxlen):
 		present = [i for i, c in enumerate(ciphertexts) if pos < len(c)]
 		if not present:
 			continue
@@ -965,90 +1023,12 @@ def compute_mask(ciphertexts: Sequence[bytes]) -> list[str]:
 				masks[i][pos] = "&"
 			continue
 
-		# Build constraints
-		edges: list[tuple[int, int, int]] = []
-		invalid_nodes: set[int] = set()
-		for i, j in combinations(present, 2):
-			x = ciphertexts[i][pos] ^ ciphertexts[j][pos]
-			if x == 0:
-				edges.append((i, j, 0))
-			else:
-				d = top3bits(x)
-				if d in {0, 1, 2, 3}:
-					edges.append((i, j, d))
-				else:
-					# This pair cannot be explained if BOTH symbols are in our 3 classes.
-					# Mark both nodes as unsafe to classify at this position.
-					invalid_nodes.add(i)
-					invalid_nodes.add(j)
-
-		# No constraints
-		if not edges:
-			for i in present:
-				masks[i][pos] = "_"
-			continue
-
-		# Determine connected components
-		graph: dict[int, set[int]] = defaultdict(set)
-		for i, j, d in edges:
-			graph[i].add(j)
-			graph[j].add(i)
-
-		visited: set[int] = set()
-		components: list[list[int]] = []
-
-		for i in present:
-			if i in visited:
-				continue
-			stack = [i]
-			comp: list[int] = []
-			visited.add(i)
-			while stack:
-				u = stack.pop()
-				comp.append(u)
-				for v in graph[u]:
-					if v not in visited:
-						visited.add(v)
-						stack.append(v)
-			components.append(comp)
-
-		# Process each component
-		for comp in components:
-			comp_edges = [(i, j, d) for (i, j, d) in edges if i in comp and j in comp]
-			solutions = solve_component(comp, comp_edges)
-
-			if not solutions:
-				for i in comp:
-					masks[i][pos] = "_"
-				continue
-
-			possible: dict[int, set[int]] = {i: set() for i in comp}
-			for sol in solutions:
-				for i in comp:
-					possible[i].add(sol[i])
-
-			# Determine which nodes are forced to be equal-by-class with someone else.
-			# We mark '|' only when equality (xor=0) holds across ALL solutions.
-			forced_equal: set[int] = set()
-			if len(comp) > 1:
-				for i, j in combinations(comp, 2):
-					diffs = {sol[i] ^ sol[j] for sol in solutions}
-					if diffs == {0}:
-						forced_equal.add(i)
-						forced_equal.add(j)
-
-			for i in comp:
-				if len(possible[i]) == 1:
-					cls = next(iter(possible[i]))
-					masks[i][pos] = CLASS_SYMBOL[cls]
-				elif i in forced_equal:
-					masks[i][pos] = "|"
-				else:
-					masks[i][pos] = "_"
-
-		# Any node participating in an invalid pair is not reliably classifiable here.
-		for i in invalid_nodes:
-			masks[i][pos] = "_"
+		deltas = {
+			(i, j): top3bits(ciphertexts[i][pos] ^ ciphertexts[j][pos])
+			for i, j in combinations(present, 2)
+		}
+		for i, sym in _classify_position(present, deltas).items():
+			masks[i][pos] = sym
 
 	return ["".join(m) for m in masks]
 
@@ -1125,6 +1105,21 @@ def manual_char_to_byte(ch: str, *, encodings: Sequence[str] = ("cp1251", "latin
 	return None
 
 
+def _code_points(text: str) -> np.ndarray:
+	return np.frombuffer(text.encode("utf-32-le"), dtype="<u4")
+
+
+def _manual_bytes(codes: np.ndarray, char_to_byte: Callable[[str], int | None]) -> np.ndarray:
+	"""char_to_byte() of each code point as int16 (-1 for None), called once per distinct character."""
+	distinct, inverse = np.unique(codes, return_inverse=True)
+	lut = np.full(len(distinct), -1, dtype=np.int16)
+	for idx, code in enumerate(distinct.tolist()):
+		value = char_to_byte(chr(code))
+		if value is not None:
+			lut[idx] = value
+	return lut[inverse.reshape(-1)]
+
+
 def apply_manual_plaintexts_to_key(
 	*,
 	ciphertexts: Sequence[bytes],
@@ -1133,6 +1128,7 @@ def apply_manual_plaintexts_to_key(
 	common_len: int,
 	prev_plaintexts: Sequence[str] | None,
 	char_to_byte: Callable[[str], int | None] = manual_char_to_byte,
+	positions: Iterable[int] | None = None,
 ) -> dict:
 	"""Incrementally update a global partial key from manual plaintext edits.
 
@@ -1143,66 +1139,80 @@ def apply_manual_plaintexts_to_key(
 	  key[pos] is recomputed from that symbol.
 	- If multiple plaintexts changed at the same position in one run, the LAST changed
 	  plaintext in file order wins (higher Plaintext index).
-	"""
-	updates = 0
-	clears = 0
-	conflicts: list[dict] = []
 
+	`positions` limits the scan to known changed columns (see edit_session);
+	the default is every position below common_len. The texts are compared as
+	code point arrays and char_to_byte runs once per distinct changed character;
+	only the conflicting columns are listed one by one.
+	"""
 	prev_plaintexts = prev_plaintexts or []
-
-	for pos in range(common_len):
+	columns = np.arange(common_len) if positions is None else np.fromiter(positions, dtype=np.int64)
+	count = min(len(ciphertexts), len(manual_plaintexts))
+	# Per text and column: 0 = unchanged/ignored, 1 = cleared with '_', 2 = set to key_bytes.
+	kinds = np.zeros((count, len(columns)), dtype=np.int8)
+	key_bytes = np.zeros((count, len(columns)), dtype=np.int16)
+	plain_bytes = np.zeros((count, len(columns)), dtype=np.int16)
+	for text_index in range(count):
+		cipher = ciphertexts[text_index]
+		new_codes = _code_points(manual_plaintexts[text_index])
+		prev_codes = _code_points(prev_plaintexts[text_index] if text_index < len(prev_plaintexts) else "")
+		inside = np.flatnonzero(columns < min(len(new_codes), len(cipher)))
+		cols = columns[inside]
+		new = new_codes[cols].astype(np.int64)
+		prev = np.full(len(cols), -1, dtype=np.int64)
+		in_prev = cols < len(prev_codes)
+		prev[in_prev] = prev_codes[cols[in_prev]]
+		changed = new != prev
+		clear = changed & (new == ord("_"))
+		# '*' is a query marker: it does not affect the key.
+		candidates = np.flatnonzero(changed & ~clear & (new != ord("*")))
+		plain = _manual_bytes(new[candidates], char_to_byte)
+		candidates, plain = candidates[plain >= 0], plain[plain >= 0]
+		kinds[text_index, inside[clear]] = 1
+		kinds[text_index, inside[candidates]] = 2
+		plain_bytes[text_index, inside[candidates]] = plain
+		cipher_bytes = np.frombuffer(bytes(cipher), dtype=np.uint8)
+		key_bytes[text_index, inside[candidates]] = cipher_bytes[cols[candidates]] ^ plain
+
+	# The last changed text in file order wins.
+	winner = np.full(len(columns), -1, dtype=np.int64)
+	for text_index in range(count):
+		winner[kinds[text_index] != 0] = text_index
+
+	# Same-position multi-change conflicts (informational): different key bytes among the sets.
+	is_set = kinds == 2
+	lowest = np.where(is_set, key_bytes, 256).min(axis=0, initial=256)
+	highest = np.where(is_set, key_bytes, -1).max(axis=0, initial=-1)
+	conflicts: list[dict] = []
+	for col in np.flatnonzero(is_set.any(axis=0) & (highest > lowest)).tolist():
+		pos = int(columns[col])
 		events: list[dict] = []
-		for text_index, cipher in enumerate(ciphertexts):
-			if text_index >= len(manual_plaintexts):
-				break
-			manual_text = manual_plaintexts[text_index]
-			if pos >= len(manual_text) or pos >= len(cipher):
-				continue
-
-			prev_text = prev_plaintexts[text_index] if text_index < len(prev_plaintexts) else ""
-			prev_ch = prev_text[pos] if pos < len(prev_text) else ""
-			new_ch = manual_text[pos]
-			changed = (prev_ch != new_ch)
-			if not changed:
-				continue
-
-			if new_ch == "_":
+		for text_index in range(count):
+			if kinds[text_index, col] == 1:
 				events.append({"text": text_index, "pos": pos, "type": "clear"})
-				continue
-			if new_ch == "*":
-				# Query marker: does not affect key.
-				continue
-
-			plain_b = char_to_byte(new_ch)
-			if plain_b is None:
-				continue
-			key_b = cipher[pos] ^ plain_b
-			events.append(
-				{
-					"text": text_index,
-					"pos": pos,
-					"type": "set",
-					"plain": plain_b,
-					"key": key_b,
-				}
-			)
-
-		if not events:
-			continue
-
-		# Detect same-position multi-change conflicts (informational).
-		set_keys = {e["key"] for e in events if e["type"] == "set"}
-		if len(set_keys) > 1:
-			conflicts.append({"pos": pos, "events": events})
+			elif kinds[text_index, col] == 2:
+				events.append(
+					{
+						"text": text_index,
+						"pos": pos,
+						"type": "set",
+						"plain": int(plain_bytes[text_index, col]),
+						"key": int(key_bytes[text_index, col]),
+					}
+				)
+		conflicts.append({"pos": pos, "events": events})
 
-		chosen = events[-1]
-		if chosen["type"] == "clear":
+	updates = 0
+	clears = 0
+	for col in np.flatnonzero(winner >= 0).tolist():
+		pos = int(columns[col])
+		text_index = int(winner[col])
+		if kinds[text_index, col] == 1:
 			if key[pos] is not None:
 				clears += 1
 			key[pos] = None
 			continue
-
-		new_key_byte = chosen["key"]
+		new_key_byte = int(key_bytes[text_index, col])
 		if key[pos] != new_key_byte:
 			key[pos] = new_key_byte
 			updates += 1
@@ -1210,6 +1220,43 @@ def apply_manual_plaintexts_to_key(
 	return {"common_len": common_len, "updates": updates, "clears": clears, "conflicts": conflicts}
 
 
+def overlay_manual_edits(
+	plaintexts: Sequence[bytearray],
+	*,
+	manual_plaintexts: Sequence[str],
+	prev_plaintexts: Sequence[str] | None,
+	positions: Iterable[int],
+	char_to_byte: Callable[[str], int | None] = manual_char_to_byte,
+) -> None:
+	"""Write the changed manual character of each position into `plaintexts` (in place).
+
+	Same rule as apply_manual_plaintexts_to_key(): when several plaintexts changed
+	at one position, the last one wins. '_' and '*' are left to the key-derived bytes.
+	"""
+	prev = prev_plaintexts or []
+	for pos in positions:
+		winner_text = None
+		winner_ch = None
+		for text_index in range(min(len(plaintexts), len(manual_plaintexts))):
+			new_text = manual_plaintexts[text_index]
+			if pos >= len(new_text):
+				continue
+			prev_text = prev[text_index] if text_index < len(prev) else ""
+			prev_ch = prev_text[pos] if pos < len(prev_text) else ""
+			new_ch = new_text[pos]
+			if prev_ch != new_ch:
+				winner_text = text_index
+				winner_ch = new_ch
+		if winner_text is None or winner_ch in {"_", "*"}:
+			# Clear: key-derived guess already has '_' where key byte became None.
+			continue
+		plain_b = char_to_byte(winner_ch)
+		if plain_b is None:
+			continue
+		if pos < len(plaintexts[winner_text]):
+			plaintexts[winner_text][pos] = plain_b
+
+
 def write_manual_mismatch_report(
 	*,
 	ciphertexts: Sequence[bytes],
@@ -1219,8 +1266,15 @@ def write_manual_mismatch_report(
 	out_path: str | Path,
 	char_to_byte: Callable[[str], int | None] = manual_char_to_byte,
 	max_rows: int = 500,
+	key_map: Optional[KeyMap] = None,
 ) -> tuple[Path, int]:
-	"""Write a report of places where key does not reproduce manual non-'_' chars."""
+	"""Write a report of places where key does not reproduce manual non-'_' chars.
+
+	char_to_byte runs once per distinct character and the comparison is one
+	(texts x positions) array pass (KeyMap.mismatches), so the report is cheap
+	enough for every incremental run. With key_map (which must hold `key`) every
+	row also names the source, confidence and time of its key byte.
+	"""
 	path = Path(out_path)
 
 	def _byte_to_display(b: int) -> str:
@@ -1235,36 +1289,48 @@ def write_manual_mismatch_report(
 				continue
 		return f"\\x{b:02x}"
 
+	count = min(len(ciphertexts), len(manual_plaintexts))
+	rows = np.zeros((count, common_len), dtype=np.uint8)
+	manual = np.full((count, common_len), -1, dtype=np.int16)
+	for text_index in range(count):
+		cipher = ciphertexts[text_index]
+		codes = _code_points(manual_plaintexts[text_index])
+		limit = min(common_len, len(codes), len(cipher))
+		rows[text_index, :limit] = np.frombuffer(bytes(cipher[:limit]), dtype=np.uint8)
+		codes = codes[:limit]
+		manual_here = _manual_bytes(codes, char_to_byte)
+		manual_here[(codes == ord("_")) | (codes == ord("*"))] = -1
+		manual[text_index, :limit] = manual_here
+	provenance = key_map if key_map is not None else KeyMap.from_key(key, length=common_len)
+	bad_texts, bad_positions = provenance.mismatches(rows, manual)
+
 	mismatch_rows: list[str] = []
-	for text_index, cipher in enumerate(ciphertexts):
-		if text_index >= len(manual_plaintexts):
-			break
-		manual_text = manual_plaintexts[text_index]
-		limit = min(common_len, len(manual_text), len(cipher))
-		for pos in range(limit):
-			ch = manual_text[pos]
-			if ch in {"_", "*"}:
-				continue
-			manual_b = char_to_byte(ch)
-			if manual_b is None:
-				continue
-			key_b = key[pos]
-			if key_b is None:
-				mismatch_rows.append(
-					f"text={text_index + 1} pos={pos:>4} manual={ch!r}/{manual_b:02x} key=None dec=_"
-				)
-				continue
-			dec_b = cipher[pos] ^ key_b
-			if dec_b != manual_b:
-				mismatch_rows.append(
-					f"text={text_index + 1} pos={pos:>4} manual={ch!r}/{manual_b:02x}"
-					f" key={key_b:02x} dec={_byte_to_display(dec_b)!r}/{dec_b:02x}"
-				)
+	for text_index, pos in zip(bad_texts.tolist(), bad_positions.tolist()):
+		ch = manual_plaintexts[text_index][pos]
+		manual_b = int(manual[text_index, pos])
+		key_b = int(provenance.key[pos])
+		if key_b < 0:
+			row = f"text={text_index + 1} pos={pos:>4} manual={ch!r}/{manual_b:02x} key=None dec=_"
+		else:
+			dec_b = int(rows[text_index, pos]) ^ key_b
+			row = (
+				f"text={text_index + 1} pos={pos:>4} manual={ch!r}/{manual_b:02x}"
+				f" key={key_b:02x} dec={_byte_to_display(dec_b)!r}/{dec_b:02x}"
+			)
+		if key_map is not None:
+			row += f" {key_map.describe(pos)}"
+		mismatch_rows.append(row)
 
 	lines: list[str] = []
 	lines.append("Manual mismatch report (manual fixes vs derived key)")
 	lines.append(f"ciphertexts={len(ciphertexts)} common_len={common_len}")
 	lines.append("Rule: '_' is treated as unknown/mask and is NOT a key constraint.")
+	if key_map is not None:
+		sources = key_map.summary()
+		lines.append(
+			"Key sources: "
+			+ (", ".join(f"{name}={v['known']} (conf {v['mean_confidence']:.2f})" for name, v in sources.items()) or "-")
+		)
 	lines.append("")
 	if mismatch_rows:
 		lines.append(f"Mismatches: {len(mismatch_rows)}")
@@ -1282,34 +1348,12 @@ def _bin_prefix(value: int, prefix_len: int) -> str:
 	return format(value, "08b")[:prefix_len]
 
 
-def _xor_triplet_key(ciphertexts: Sequence[bytes], pos: int, prefix_len: int) -> str:
-	if len(ciphertexts) != 3:
-		raise ValueError("Expected exactly 3 ciphertexts")
-	c1, c2, c3 = ciphertexts
-	b1, b2, b3 = c1[pos], c2[pos], c3[pos]
-	xor_ab = _bin_prefix(b1 ^ b2, prefix_len)
-	xor_ac = _bin_prefix(b1 ^ b3, prefix_len)
-	xor_bc = _bin_prefix(b2 ^ b3, prefix_len)
-	return f"{xor_ab}|{xor_ac}|{xor_bc}"
-
-
-def _allowed_classes_from_mask_chars(mask3_ch: str, mask4_ch: str) -> set[str]:
-	"""Allowed class labels {' ', 'a', 'A'} based on mask symbols."""
-	# mask4: '#' -> punct/space, '<' -> lowercase, '>' -> uppercase
-	if mask4_ch == "#":
-		return {" "}
-	if mask4_ch == "<":
-		return {"a"}
-	if mask4_ch == ">":
-		return {"A"}
-
-	# mask3: '#' -> punct/space, '<' or '>' -> letter (either case)
-	if mask3_ch == "#":
-		return {" "}
-	if mask3_ch in {"<", ">"}:
-		return {"a", "A"}
-
-	return {" ", "a", "A"}
+def _xor_pairs_key(ciphertexts: Sequence[bytes], pos: int, prefix_len: int) -> str:
+	"""Binary XOR prefixes of all ciphertext pairs at pos ("ab|ac|bc" for three texts)."""
+	return "|".join(
+		_bin_prefix(ciphertexts[i][pos] ^ ciphertexts[j][pos], prefix_len)
+		for i, j in combinations(range(len(ciphertexts)), 2)
+	)
 
 
 def _space_punct_chars() -> list[str]:
@@ -1366,6 +1410,31 @@ def _iter_star_positions(manual_plaintexts: Sequence[str], *, common_len: int) -
 	return sorted(positions)
 
 
+STAR_OPTIONS_FILE = "options.bin"
+_STAR_CLASS_ORDER = (" ", "a", "A")
+
+
+@lru_cache(maxsize=None)
+def _star_class_pools() -> tuple[np.ndarray, np.ndarray]:
+	"""(8, 256) allowed-byte table per class subset (bit i = _STAR_CLASS_ORDER[i]) and byte ranks.
+
+	The rank keeps the old enumeration order: punctuation/space, then lower, then upper.
+	"""
+	pools = np.zeros((1 << len(_STAR_CLASS_ORDER), 256), dtype=bool)
+	rank = np.full(256, 256, dtype=np.int16)
+	next_rank = 0
+	for bit, cls in enumerate(_STAR_CLASS_ORDER):
+		for ch in _class_chars(cls):
+			b = ord(ch)
+			if rank[b] == 256:
+				rank[b] = next_rank
+				next_rank += 1
+			for mask in range(len(pools)):
+				if mask >> bit & 1:
+					pools[mask, b] = True
+	return pools, rank
+
+
 def write_star_triplet_options(
 	*,
 	ciphertexts: Sequence[bytes],
@@ -1373,108 +1442,107 @@ def write_star_triplet_options(
 	mask3_lines: Sequence[str],
 	mask4_lines: Sequence[str],
 	common_len: int,
-	xor_maps4_path: str | Path = Path("K3") / "xor_maps4.json",
 	out_dir: str | Path = Path("K3") / "star_triplets",
 ) -> dict:
 	"""For each position marked with '*' in manual plaintexts, write all possible
-	concrete triples (p1,p2,p3) that are mutually consistent.
+	concrete columns (p1, ..., pN) that are mutually consistent.
 
 	Mutual consistency means there exists a single key byte k such that:
-		k = c1[pos] ^ p1 = c2[pos] ^ p2 = c3[pos] ^ p3
+		k = c1[pos] ^ p1 = c2[pos] ^ p2 = ... = cN[pos] ^ pN
 	And each pi belongs to the class allowed by the current masks.
 
-	Output: JSONL files, each line is [ch1, ch2, ch3].
+	All starred positions are solved in one pass (see pad_engine.iter_consistent_columns)
+	and written to a single binary file, STAR_OPTIONS_FILE: N bytes per column,
+	positions back to back. index.json gives each position's byte offset and
+	column count; read_star_triplet_options() decodes one position. The xor_maps4
+	id (see xor_index) is only defined for three ciphertexts; other counts get id '?'.
 	"""
+	out_dir = Path(out_dir)
+	# Older runs wrote one pos*.jsonl per position; a run without stars leaves nothing behind.
+	if out_dir.is_dir():
+		for stale in out_dir.glob("pos*.jsonl"):
+			stale.unlink()
 	star_positions = _iter_star_positions(manual_plaintexts, common_len=common_len)
 	if not star_positions:
-		return {"positions": 0, "files": 0}
+		for name in ("index.json", STAR_OPTIONS_FILE):
+			(out_dir / name).unlink(missing_ok=True)
+		return {"positions": 0, "written_positions": 0, "files": 0}
+
+	positions = [
+		pos for pos in star_positions
+		if pos < common_len and all(pos < len(c) for c in ciphertexts)
+	]
+	xor_maps = load_xor_maps4()
+
+	# Allowed class bits per (position, text); bit order follows _STAR_CLASS_ORDER.
+	allowed = np.full((len(positions), len(ciphertexts)), CLASS_BITS, dtype=np.uint8)
+	if positions:
+		length = positions[-1] + 1
+		for i in range(len(ciphertexts)):
+			m3 = mask3_lines[i] if i < len(mask3_lines) else ""
+			m4 = mask4_lines[i] if i < len(mask4_lines) else ""
+			allowed[:, i] = allowed_classes(encode_mask(m3), encode_mask(m4), length)[positions]
+	class_labels = [
+		sorted(cls for bit, cls in enumerate(_STAR_CLASS_ORDER) if bits >> bit & 1)
+		for bits in range(CLASS_BITS + 1)
+	]
 
-	xor_maps4_path = Path(xor_maps4_path)
-	data = json.loads(xor_maps4_path.read_text(encoding="utf-8"))
-	prefix_len = int(data.get("bin_prefix_len", 3))
-	mapping = data.get("xor_triplet_to_triples")
-	if not isinstance(mapping, dict):
-		mapping = {}
+	rows, _present = stack_ciphertexts(ciphertexts)
+	columns = np.ascontiguousarray(rows[:, positions].T)
+	pools, rank = _star_class_pools()
 
-	out_dir = Path(out_dir)
 	out_dir.mkdir(parents=True, exist_ok=True)
+	out_path = out_dir / STAR_OPTIONS_FILE
 
 	index: dict[str, dict[str, object]] = {}
-	written = 0
-
-	for pos in star_positions:
-		if pos >= common_len:
-			continue
-		if any(pos >= len(c) for c in ciphertexts):
-			continue
-
-		xor_key = _xor_triplet_key(ciphertexts, pos, prefix_len)
-		xor_id = "?"
-		entry = mapping.get(xor_key)
-		if isinstance(entry, dict) and isinstance(entry.get("id"), str):
-			xor_id = entry["id"]
-
-		allowed_classes: list[set[str]] = []
-		for i in range(3):
-			m3 = mask3_lines[i] if i < len(mask3_lines) else ""
-			m4 = mask4_lines[i] if i < len(mask4_lines) else ""
-			m3_ch = m3[pos] if pos < len(m3) else "_"
-			m4_ch = m4[pos] if pos < len(m4) else "_"
-			allowed_classes.append(_allowed_classes_from_mask_chars(m3_ch, m4_ch))
-
-		# Build per-text concrete byte pools from allowed classes.
-		pools_b: list[list[int]] = []
-		pools_set: list[set[int]] = []
-		for cls_set in allowed_classes:
-			chars: list[str] = []
-			for cls in (" ", "a", "A"):
-				if cls in cls_set:
-					chars.extend(_class_chars(cls))
-			# convert to bytes (ASCII only here)
-			b_list: list[int] = []
-			seen_b: set[int] = set()
-			for ch in chars:
-				b = ord(ch)
-				if b not in seen_b:
-					b_list.append(b)
-					seen_b.add(b)
-			pools_b.append(b_list)
-			pools_set.append(seen_b)
-
-		c1, c2, c3 = ciphertexts[0][pos], ciphertexts[1][pos], ciphertexts[2][pos]
-
-		# Enumerate mutually consistent triples efficiently:
-		# for each possible p1, key byte is determined, hence p2 and p3 are determined.
-		results: list[tuple[int, int, int]] = []
-		for p1 in pools_b[0]:
-			k = c1 ^ p1
-			p2 = c2 ^ k
-			if p2 not in pools_set[1]:
-				continue
-			p3 = c3 ^ k
-			if p3 not in pools_set[2]:
-				continue
-			results.append((p1, p2, p3))
+	row = 0
+	offset = 0
+	with out_path.open("wb") as f:
+		for counts, options in iter_consistent_columns(columns, allowed, pools, rank):
+			f.write(options.tobytes())
+			for count in counts.tolist():
+				pos = positions[row]
+				xor_key = _xor_pairs_key(ciphertexts, pos, xor_maps.prefix_len)
+				index[str(pos)] = {
+					"pos": pos,
+					"xor_key": xor_key,
+					# Unknown keys (and every key when N != 3) get '?'.
+					"id": xor_maps.id_char(xor_key),
+					"file": out_path.name,
+					"offset": offset,
+					"count": count,
+					"allowed_classes": [class_labels[bits] for bits in allowed[row].tolist()],
+					"status": "ok",
+				}
+				offset += count * len(ciphertexts)
+				row += 1
 
-		out_path = out_dir / f"pos.jsonl"
-		with out_path.open("w", encoding="utf-8") as f:
-			for p1, p2, p3 in results:
-				f.write(json.dumps([chr(p1), chr(p2), chr(p3)], ensure_ascii=False) + "\n")
+	(out_dir / "index.json").write_text(json.dumps(index, ensure_ascii=False, indent=2), encoding="utf-8")
 
-		index[str(pos)] = {
-			"pos": pos,
-			"xor_key": xor_key,
-			"id": xor_id,
-			"file": out_path.name,
-			"count": len(results),
-			"allowed_classes": [sorted(s) for s in allowed_classes],
-			"status": "ok",
-		}
-		written += 1
+	return {
+		"positions": len(star_positions),
+		"written_positions": len(positions),
+		"files": 1,
+		"out_dir": str(out_dir),
+	}
 
-	(out_dir / "index.json").write_text(json.dumps(index, ensure_ascii=False, indent=2), encoding="utf-8")
 
-	return {"positions": len(star_positions), "files": written, "out_dir": str(out_dir)}
+def read_star_triplet_options(out_dir: str | Path, pos: int) -> list[list[str]]:
+	"""Columns written by write_star_triplet_options() for one position."""
+	out_dir = Path(out_dir)
+	index_path = out_dir / "index.json"
+	if not index_path.exists():
+		return []
+	index = json.loads(index_path.read_text(encoding="utf-8"))
+	entry = index.get(str(pos))
+	if entry is None or "offset" not in entry:
+		# Missing, or a legacy pos*.jsonl entry: the next main.py run rewrites the index.
+		return []
+	width = len(entry["allowed_classes"])
+	with (out_dir / entry["file"]).open("rb") as f:
+		f.seek(entry["offset"])
+		data = f.read(entry["count"] * width)
+	return [[chr(b) for b in data[i:i + width]] for i in range(0, len(data), width)]
 
 
 def overlay_manual_plaintexts_on_guesses(
@@ -1556,14 +1624,7 @@ def apply_partial_key(ciphertext: bytes, key: Sequence[Optional[int]], *, unknow
 
 	Known positions decrypt, unknown positions become `unknown_byte`.
 	"""
-	output = bytearray()
-	limit = min(len(ciphertext), len(key))
-	for index in range(limit):
-		key_byte = key[index]
-		output.append((ciphertext[index] ^ key_byte) if key_byte is not None else unknown_byte)
-	if len(ciphertext) > limit:
-		output.extend([unknown_byte] * (len(ciphertext) - limit))
-	return bytes(output)
+	return DecryptedView(ciphertext, key, unknown_byte=unknown_byte).tobytes()
 
 
 def apply_partial_key_to_all(
@@ -1572,7 +1633,7 @@ def apply_partial_key_to_all(
 	*,
 	unknown_byte: int = ord("_"),
 ) -> list[bytes]:
-	return [apply_partial_key(ciphertext, key, unknown_byte=unknown_byte) for ciphertext in ciphertexts]
+	return [view.tobytes() for view in decrypted_views(ciphertexts, key, unknown_byte=unknown_byte)]
 
 
 def _is_ascii_letter(byte_value: int) -> bool:
@@ -1593,6 +1654,34 @@ def _is_common_punct_or_digit(byte_value: int) -> bool:
 	)
 
 
+# 256-entry lookups for the pairwise xor byte c_j ^ c_k.
+_XOR_IS_LETTER = np.array([_is_ascii_letter(b) for b in range(256)], dtype=bool)
+_XOR_IS_PUNCT_OR_DIGIT = np.array([_is_common_punct_or_digit(b) for b in range(256)], dtype=bool)
+
+
+def _pairwise_xor_votes(rows: np.ndarray, table: np.ndarray, *, chunk: int = 1 << 14) -> np.ndarray:
+	"""(N, L) per text j: number of other texts k with table[c_j ^ c_k] set.
+
+	Each unordered pair is looked up once and credited to both texts. Columns
+	are processed in chunks with one reused buffer, so the working set stays
+	in cache and memory stays at the size of the matrix.
+	"""
+	n, length = rows.shape
+	lookup = table.astype(np.uint8)
+	votes = np.zeros(rows.shape, dtype=np.int32)
+	buf = np.empty((max(n - 1, 0), min(chunk, length)), dtype=np.uint8)
+	for start in range(0, length, chunk):
+		block = rows[:, start:start + chunk]
+		block_votes = votes[:, start:start + chunk]
+		for a in range(n - 1):
+			hits = buf[:n - a - 1, :block.shape[1]]
+			np.bitwise_xor(block[a + 1:], block[a], out=hits)
+			np.take(lookup, hits, out=hits)
+			block_votes[a] += hits.sum(axis=0, dtype=np.int32)
+			block_votes[a + 1:] += hits
+	return votes
+
+
 def guess_space_positions(
 	ciphertexts: Sequence[bytes],
 	key: Optional[list[Optional[int]]] = None,
@@ -1606,6 +1695,7 @@ def guess_space_positions(
 	For each position i and each text j we count how many pairwise XORs
 	(cj[i] ^ ck[i]) look like an ASCII letter. If many votes, we assume
 	plaintext[j][i] == space (0x20), and thus key[i] = cj[i] ^ 0x20.
+	When several texts qualify at one position the key follows the last one.
 	"""
 	if len(ciphertexts) < 2:
 		raise ValueError("Need at least 2 ciphertexts for space-guessing")
@@ -1629,34 +1719,26 @@ def guess_space_positions(
 		# For n=3 => 2 votes; for larger n => ~60% of other texts.
 		required_votes = max(2, int((n - 1) * 0.6 + 0.999))
 
-	votes_per_text = [0] * n
-	decided_positions = 0
-
-	for pos in range(common_len):
-		for j in range(n):
-			if plaintexts[j][pos] != unknown_byte:
-				continue
-
-			votes = 0
-			cj = ciphertexts[j][pos]
-			for k in range(n):
-				if k == j:
-					continue
-				x = cj ^ ciphertexts[k][pos]
-				if _is_ascii_letter(x):
-					votes += 1
-
-			if votes >= required_votes:
-				plaintexts[j][pos] = 0x20
-				key[pos] = cj ^ 0x20
-				votes_per_text[j] += 1
-				decided_positions += 1
-
+	rows, _present = stack_ciphertexts([c[:common_len] for c in ciphertexts])
+	plain = np.stack([np.frombuffer(bytes(p[:common_len]), dtype=np.uint8) for p in plaintexts])
+	decided = (plain == unknown_byte) & (_pairwise_xor_votes(rows, _XOR_IS_LETTER) >= required_votes)
+
+	for j in range(n):
+		if decided[j].any():
+			plain[j, decided[j]] = 0x20
+			plaintexts[j][:common_len] = plain[j].tobytes()
+	hit = decided.any(axis=0)
+	positions = np.flatnonzero(hit)
+	last_text = n - 1 - np.argmax(decided[::-1, hit], axis=0)
+	for pos, value in zip(positions.tolist(), (rows[last_text, positions] ^ 0x20).tolist()):
+		key[pos] = value
+
+	votes_per_text = decided.sum(axis=1)
 	hints = {
 		"common_len": common_len,
 		"required_votes": required_votes,
-		"spaces_per_text": votes_per_text,
-		"decided_positions": decided_positions,
+		"spaces_per_text": votes_per_text.tolist(),
+		"decided_positions": int(votes_per_text.sum()),
 	}
 	return key, plaintexts, hints
 
@@ -1676,20 +1758,63 @@ def guess_punctuation_positions(
 	if common_len is None:
 		common_len = min(len(ciphertext) for ciphertext in ciphertexts)
 
-	counts = [0] * common_len
-	for i in range(common_len):
-		for a in range(len(ciphertexts)):
-			for b in range(a + 1, len(ciphertexts)):
-				x = ciphertexts[a][i] ^ ciphertexts[b][i]
-				if _is_common_punct_or_digit(x):
-					counts[i] += 1
+	rows, _present = stack_ciphertexts([c[:common_len] for c in ciphertexts])
+	# Every pair is credited to both of its texts.
+	counts = _pairwise_xor_votes(rows, _XOR_IS_PUNCT_OR_DIGIT).sum(axis=0) // 2
 
 	return {
 		"common_len": common_len,
-		"punct_counts": counts,
+		"punct_counts": counts.tolist(),
 	}
 
 
+# Stricter than "printable" for the other texts under a suggested key byte: mostly text-ish bytes.
+_OTHER_REASONABLE = np.array([b == 32 or _is_ascii_letter(b) or 48 <= b <= 57 for b in range(256)], dtype=bool)
+
+
+def _punctuation_suggestion_ranks(
+	rows: np.ndarray,
+	known: np.ndarray,
+	punct: np.ndarray,
+	*,
+	required_support: int,
+	limit: int,
+	chunk: int = 1 << 14,
+) -> np.ndarray:
+	"""Sorted ranks of the best (pos, text, char) punctuation hypotheses (see suggest_punctuation_chars()).
+
+	Support is computed for a chunk of positions at once as a (positions, texts,
+	chars) array, one lookup per unordered pair of texts. The rank packs
+	(-support, conflict, pos, text, char) into one int64, so the best `limit`
+	ranks (all when limit <= 0) are kept with a partition per chunk and memory
+	stays bounded by the chunk and the limit.
+	"""
+	n, length = rows.shape
+	cells = length * n * len(punct)
+	# Text k decrypts to c_k ^ c_j ^ p under the key byte c_j ^ p, so support only
+	# depends on the pairwise xor: pair_support[c_j ^ c_k, p], credited to both texts.
+	pair_support = _OTHER_REASONABLE[np.arange(256, dtype=np.uint8)[:, None] ^ punct].astype(np.int16)
+	best = np.zeros(0, dtype=np.int64)
+	for start in range(0, length, chunk):
+		cols = rows[:, start:start + chunk].T  # (C, N)
+		support = np.zeros((len(cols), n, len(punct)), dtype=np.int16)
+		for a in range(n - 1):
+			hits = pair_support[cols[:, a + 1:] ^ cols[:, a, None]]  # (C, N - a - 1, P)
+			support[:, a] += hits.sum(axis=1, dtype=np.int16)
+			support[:, a + 1:] += hits
+		flat = np.flatnonzero(support >= required_support)
+		pos, rest = np.divmod(flat, n * len(punct))
+		text, char = np.divmod(rest, len(punct))
+		known_byte = known[start + pos]
+		conflict = (known_byte >= 0) & (known_byte != cols[pos, text] ^ punct[char])
+		rank = ((n - 1 - support.reshape(-1)[flat].astype(np.int64)) * 2 + conflict) * cells
+		best = np.concatenate([best, rank + start * n * len(punct) + flat])
+		if 0 < limit < len(best):
+			best = best[np.argpartition(best, limit - 1)[:limit]]
+	best.sort()
+	return best
+
+
 def suggest_punctuation_chars(
 	ciphertexts: Sequence[bytes],
 	*,
@@ -1720,74 +1845,48 @@ def suggest_punctuation_chars(
 	other_count = max(0, n - 1)
 	required_other_support = max(1, int(other_count * min_support_ratio + 0.999))
 
-	def is_other_reasonable(byte_value: int) -> bool:
-		# Stricter than "printable": we want mostly text-ish bytes.
-		if byte_value == 32:
-			return True
-		if _is_ascii_letter(byte_value):
-			return True
-		if 48 <= byte_value <= 57:
-			return True
-		return False
-
-	confirmed: list[dict] = []
-	suggestions: list[dict] = []
-
-	key_list: list[Optional[int]]
-	if key is None:
-		key_list = [None] * common_len
-	else:
-		key_list = list(key) + [None] * max(0, common_len - len(key))
-		key_list = key_list[:common_len]
+	known = np.full(common_len, -1, dtype=np.int16)
+	if key is not None:
+		key_values = [-1 if kb is None else kb for kb in list(key)[:common_len]]
+		known[:len(key_values)] = key_values
+	rows, _present = stack_ciphertexts([c[:common_len] for c in ciphertexts])
+	# Characters outside one byte never decrypt from a key byte and never get support.
+	punct = np.array([pb for pb in punct_bytes if pb < 256], dtype=np.uint8)
 
 	# Confirmed punctuation based on existing key bytes.
-	for pos in range(common_len):
-		kb = key_list[pos]
-		if kb is None:
-			continue
-		for text_index, ciphertext in enumerate(ciphertexts):
-			plain_byte = ciphertext[pos] ^ kb
-			if plain_byte in punct_bytes:
-				confirmed.append(
-					{
-						"pos": pos,
-						"text": text_index,
-						"char": chr(plain_byte),
-						"key_known": True,
-					}
-				)
-
-	# Heuristic suggestions (include positions even if key is known).
-	for pos in range(common_len):
-		kb_existing = key_list[pos]
-		for text_index, ciphertext in enumerate(ciphertexts):
-			for pb in punct_bytes:
-				candidate_kb = ciphertext[pos] ^ pb
-				other_support = 0
-				for other_index, other_cipher in enumerate(ciphertexts):
-					if other_index == text_index:
-						continue
-					plain_byte = other_cipher[pos] ^ candidate_kb
-					if is_other_reasonable(plain_byte):
-						other_support += 1
-				conflict = kb_existing is not None and kb_existing != candidate_kb
-				if other_support < required_other_support:
-					continue
-				suggestions.append(
-					{
-						"pos": pos,
-						"text": text_index,
-						"char": chr(pb),
-						"support": other_support,
-						"required_support": required_other_support,
-						"conflict_with_known_key": conflict,
-					}
-				)
-
-	# Sort best-first; keep the list bounded.
-	suggestions.sort(key=lambda item: (-item["support"], item["conflict_with_known_key"], item["pos"], item["text"]))
-	if max_suggestions > 0:
-		suggestions = suggestions[:max_suggestions]
+	plain = rows ^ known.astype(np.uint8)
+	hit = (known >= 0) & np.isin(plain, punct)
+	confirmed = [
+		{"pos": pos, "text": text_index, "char": chr(plain[text_index, pos]), "key_known": True}
+		for pos, text_index in zip(*(axis.tolist() for axis in np.nonzero(hit.T)))
+	]
+
+	ranks = _punctuation_suggestion_ranks(
+		rows,
+		known,
+		punct,
+		required_support=required_other_support,
+		limit=max_suggestions,
+	)
+	# rank = ((other_count - support) * 2 + conflict) * cells + (pos * n + text) * len(punct) + char.
+	cells = common_len * n * len(punct)
+	order_key, flat = np.divmod(ranks, max(cells, 1))
+	miss, conflicts = np.divmod(order_key, 2)
+	cell, char_index = np.divmod(flat, max(len(punct), 1))
+	positions, texts = np.divmod(cell, n)
+	suggestions = [
+		{
+			"pos": pos,
+			"text": text_index,
+			"char": chr(punct[ci]),
+			"support": other_count - m,
+			"required_support": required_other_support,
+			"conflict_with_known_key": bool(conflict),
+		}
+		for pos, text_index, ci, m, conflict in zip(
+			positions.tolist(), texts.tolist(), char_index.tolist(), miss.tolist(), conflicts.tolist()
+		)
+	]
 
 	return {
 		"common_len": common_len,
@@ -1810,33 +1909,7 @@ def crib_drag(
 	Given xored_plaintexts = m1 ^ m2 and a guess (crib) for m1 at some offset,
 	we compute candidate fragment of m2.
 	"""
-	if isinstance(guess, str):
-		guess_bytes = guess.encode(encoding, errors="strict")
-	else:
-		guess_bytes = bytes(guess)
-
-	if not guess_bytes:
-		return []
-
-	results: list[dict] = []
-	for offset in range(0, max(0, len(xored_plaintexts) - len(guess_bytes) + 1)):
-		fragment = xor_bytes(xored_plaintexts[offset:offset + len(guess_bytes)], guess_bytes)
-		printable = sum(1 for b in fragment if _is_ascii_printable(b) or b in (10, 13, 9))
-		ratio = printable / len(fragment)
-		if ratio < min_printable_ratio:
-			continue
-
-		results.append(
-			{
-				"offset": offset,
-				"fragment_bytes": fragment,
-				"fragment_ascii": fragment.decode("ascii", errors="replace"),
-				"printable_ratio": ratio,
-			}
-		)
-
-	results.sort(key=lambda item: (-item["printable_ratio"], item["offset"]))
-	return results
+	return drag_cribs(xored_plaintexts, [guess], encoding=encoding, min_printable_ratio=min_printable_ratio)[0]
 
 
 def generate_crib_drag_report(
@@ -1850,32 +1923,112 @@ def generate_crib_drag_report(
 ) -> Path:
 	"""Generate a crib-dragging report file.
 
-	This does not modify the key; it only writes analysis output.
+	This does not modify the key; it only writes analysis output. All cribs are
+	dragged over a pair in one crib_engine sweep and the report is written pair
+	by pair, so thousands of cribs do not pile up in memory.
 	"""
 	path = Path(out_path)
-	lines: list[str] = []
-	lines.append("Crib-dragging report (OTP reuse / multi-time pad)")
-	lines.append(f"ciphertexts={len(ciphertexts)} common_len={common_len}")
-	lines.append("")
-	for i in range(len(ciphertexts)):
-		for j in range(i + 1, len(ciphertexts)):
-			xored = xor_bytes(ciphertexts[i][:common_len], ciphertexts[j][:common_len])
-			any_for_pair = False
-			for crib in cribs:
-				hits = crib_drag(xored, crib, min_printable_ratio=min_printable_ratio)
-				if max_hits_per_crib > 0:
-					hits = hits[:max_hits_per_crib]
-				if not hits:
-					continue
-				if not any_for_pair:
-					lines.append(f"Pair Plaintext {i + 1} ^ Plaintext {j + 1}")
-					any_for_pair = True
-				lines.append(f"  crib={crib!r} (assuming it is in Plaintext {i + 1})")
-				for hit in hits:
-					lines.append(f"    offset={hit['offset']:>4}: {hit['fragment_ascii']}")
-			if any_for_pair:
-				lines.append("")
-	path.write_text("\n".join(lines).rstrip() + "\n", encoding="utf-8")
+	with path.open("w", encoding="utf-8") as out:
+		# The report ends with exactly one newline: trailing whitespace is held back until more text follows.
+		pending = ""
+
+		def emit(text: str) -> None:
+			nonlocal pending
+			text = pending + text
+			body = text.rstrip()
+			pending = text[len(body):]
+			out.write(body)
+
+		emit("Crib-dragging report (OTP reuse / multi-time pad)\n")
+		emit(f"ciphertexts={len(ciphertexts)} common_len={common_len}\n")
+		for i in range(len(ciphertexts)):
+			for j in range(i + 1, len(ciphertexts)):
+				xored = xor_bytes(ciphertexts[i][:common_len], ciphertexts[j][:common_len])
+				hits_per_crib = drag_cribs(
+					xored,
+					cribs,
+					min_printable_ratio=min_printable_ratio,
+					max_hits=max_hits_per_crib,
+				)
+				lines: list[str] = []
+				for crib, hits in zip(cribs, hits_per_crib):
+					if not hits:
+						continue
+					if not lines:
+						lines.append(f"Pair Plaintext {i + 1} ^ Plaintext {j + 1}")
+					lines.append(f"  crib={crib!r} (assuming it is in Plaintext {i + 1})")
+					for hit in hits:
+						lines.append(f"    offset={hit['offset']:>4}: {hit['fragment_ascii']}")
+				if lines:
+					emit("\n" + "\n".join(lines) + "\n")
+		out.write("\n")
+	return path
+
+
+def keyed_crib_hits(
+	*,
+	ciphertexts: Sequence[bytes],
+	key: Sequence[Optional[int]],
+	masks3: Sequence[str],
+	masks4: Sequence[str],
+	cribs: Sequence[str],
+	max_hits_per_crib: int = 5,
+) -> list[list[dict]]:
+	"""Key-consistent crib hits (crib_engine.drag_cribs_keyed) over the common length.
+
+	Mask lines give the allowed classes of every text (missing lines allow all);
+	hits are ranked by byte frequencies of the plaintext the known key already gives.
+	"""
+	common_len = min(len(c) for c in ciphertexts)
+	known = key_to_array(list(key)[:common_len] + [None] * max(0, common_len - len(key)))
+	allowed = np.stack(
+		[
+			allowed_classes(
+				encode_mask(masks3[i] if i < len(masks3) else ""),
+				encode_mask(masks4[i] if i < len(masks4) else ""),
+				common_len,
+			)
+			for i in range(len(ciphertexts))
+		]
+	)
+	hit = known >= 0
+	samples = [np.frombuffer(c[:common_len], dtype=np.uint8)[hit] ^ known[hit].astype(np.uint8) for c in ciphertexts]
+	return drag_cribs_keyed(
+		ciphertexts,
+		cribs,
+		key=known,
+		allowed=allowed,
+		byte_scores=byte_log_frequencies([s.tobytes() for s in samples]),
+		max_hits=max_hits_per_crib,
+	)
+
+
+def write_keyed_crib_drag_report(
+	*,
+	ciphertexts: Sequence[bytes],
+	key: Sequence[Optional[int]],
+	cribs: Sequence[str],
+	hits: Sequence[Sequence[dict]],
+	out_path: str | Path,
+) -> Path:
+	"""Write keyed_crib_hits() results: per crib, the implied fragment of every text."""
+	common_len = min(len(c) for c in ciphertexts)
+	known_count = sum(1 for kb in list(key)[:common_len] if kb is not None)
+	path = Path(out_path)
+	with path.open("w", encoding="utf-8") as out:
+		out.write("Key-consistent crib-dragging report (partial key + masks)\n")
+		out.write(f"ciphertexts={len(ciphertexts)} common_len={common_len} known_key={known_count}\n")
+		for crib, crib_hits in zip(cribs, hits):
+			if not crib_hits:
+				continue
+			out.write(f"\ncrib={crib!r}\n")
+			for hit in crib_hits:
+				out.write(
+					f"  text={hit['text'] + 1} offset={hit['offset']:>5} score={hit['score']:.1f}"
+					f" new_key={hit['new_key_bytes']}\n"
+				)
+				for i, fragment in enumerate(hit["fragments"], start=1):
+					out.write(f"    Plaintext {i}: {fragment.decode('cp1251', errors='replace')!r}\n")
 	return path
 
 
@@ -1928,40 +2081,92 @@ def save_state(
 	plaintexts: Optional[Sequence[bytes | bytearray]] = None,
 	manual_plaintexts: Optional[Sequence[str]] = None,
 	meta: Optional[dict] = None,
-) -> None:
-	"""Save current cracking state to JSON."""
-	path = Path(state_path)
-	payload = {
-		"saved_at": datetime.now().isoformat(timespec="seconds"),
-		"ciphertexts_b64": [base64.b64encode(c).decode("ascii") for c in ciphertexts],
-		"key": list(key),
-		"plaintexts_b64": [base64.b64encode(bytes(p)).decode("ascii") for p in (plaintexts or [])],
-		"manual_plaintexts": list(manual_plaintexts or []),
-		"meta": meta or {},
-	}
-	path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
-
+	key_map: Optional[KeyMap] = None,
+) -> Path:
+	"""Save current cracking state to the binary store (state.json -> state.bin).
 
-def load_state(state_path: str | Path) -> dict:
-	"""Load cracking state from JSON."""
-	path = Path(state_path)
-	payload = json.loads(path.read_text(encoding="utf-8"))
+	key_map adds the per-position provenance of the key (see key_map.py).
+	Use export_state_json() when a JSON copy is needed.
+	"""
+	return save_store(
+		state_path,
+		ciphertexts=ciphertexts,
+		key=key,
+		plaintexts=plaintexts,
+		manual_plaintexts=manual_plaintexts,
+		meta=meta,
+		extra_arrays=key_map.arrays() if key_map is not None else None,
+	)
 
-	ciphertexts = [base64.b64decode(s) for s in payload.get("ciphertexts_b64", [])]
-	plaintexts = [base64.b64decode(s) for s in payload.get("plaintexts_b64", [])]
-	key = payload.get("key", [])
-	manual_plaintexts = payload.get("manual_plaintexts", [])
 
+def load_state(state_path: str | Path) -> dict:
+	"""Load cracking state from state.bin (preferred) or a state.json export."""
+	state = load_any(state_path, mmap=False)
 	return {
-		"saved_at": payload.get("saved_at"),
-		"ciphertexts": ciphertexts,
-		"plaintexts": plaintexts,
-		"key": key,
-		"manual_plaintexts": manual_plaintexts,
-		"meta": payload.get("meta", {}),
+		"saved_at": state["saved_at"],
+		"ciphertexts": [bytes(c) for c in state["ciphertexts"]],
+		"plaintexts": [bytes(p) for p in state["plaintexts"]],
+		"key": key_to_list(state["key"]),
+		"manual_plaintexts": state["manual_plaintexts"],
+		"arrays": {name: np.array(array) for name, array in state["arrays"].items()},
+		"meta": state["meta"],
 	}
 
 
+def open_key_journal(path: str | Path, *, length: int) -> Optional["key_journal.KeyJournal"]:
+	"""Key journal next to the state (see key_journal.py); None if it cannot be used."""
+	try:
+		return key_journal.KeyJournal(path, length=length)
+	except (OSError, ValueError) as exc:
+		print(f"Журнал ключа недоступен ({path}): {exc}")
+		return None
+
+
+def commit_key(
+	state_path: str | Path,
+	state: dict,
+	ciphertexts: Sequence[bytes],
+	key_map: KeyMap,
+	old_key: Sequence[Optional[int]],
+	*,
+	source: str,
+	journal_path: str | Path | None,
+) -> Path:
+	"""Save the key of `key_map` into the state loaded by load_state().
+
+	The change from `old_key` is recorded in the key journal as one `source`
+	entry (skipped when journal_path is None or the journal is unusable), the
+	plaintexts are re-derived from the new key and the input fingerprint is
+	dropped from the meta: the files written by main.py no longer follow the
+	key, so its next run has to be a full one.
+	"""
+	new_key = key_map.to_list()
+	if journal_path is not None:
+		journal = open_key_journal(journal_path, length=len(new_key))
+		if journal is not None:
+			journal.record(old_key, new_key, source=source)
+	meta = dict(state["meta"])
+	meta.pop("inputs", None)
+	return save_state(
+		state_path,
+		ciphertexts=ciphertexts,
+		key=new_key,
+		plaintexts=apply_partial_key_to_all(ciphertexts, new_key),
+		manual_plaintexts=state["manual_plaintexts"],
+		meta=meta,
+		key_map=key_map,
+	)
+
+
+def export_state_json(state_path: str | Path, json_path: str | Path | None = None) -> Path:
+	"""Dump the binary state as JSON (same layout as the old state.json).
+
+	This is how the tracked state.json is refreshed: state.bin is not committed.
+	"""
+	source = resolve_state_path(state_path)
+	return export_json(load_any(source, mmap=False), json_path or Path(source).with_suffix(".json"))
+
+
 def save_key_history(
 	history_path: str | Path,
 	key: Sequence[Optional[int]],
@@ -1981,7 +2186,7 @@ def save_key_history(
 
 def write_plaintexts_file(
 	output_path: str | Path,
-	plaintexts: Sequence[bytes | bytearray | str],
+	plaintexts: Sequence[bytes | bytearray | str | DecryptedView],
 	*,
 	encoding: str = "utf-8",
 	masks: Sequence[str] | None = None,
@@ -1998,28 +2203,36 @@ def write_plaintexts_file(
 	mask lines so plaintext edits don't affect masks and vice versa.
 	"""
 	path = Path(output_path)
-	lines: list[str] = []
-	for index, pt in enumerate(plaintexts, start=1):
-		lines.append(f"Plaintext {index}:")
-		if isinstance(pt, str):
-			decoded = pt
-		else:
-			decoded = bytes(pt).decode(encoding, errors="replace")
-		lines.append(decoded)
-		if masks is not None and (index - 1) < len(masks):
-			lines.append(masks[index - 1])
-		if masks2 is not None and (index - 1) < len(masks2):
-			lines.append(masks2[index - 1])
-		if reference_texts is not None and (index - 1) < len(reference_texts):
-			ref = reference_texts[index - 1] or ""
-			for ref_line in ref.splitlines() or [""]:
-				lines.append(ref_line)
-		lines.append("")
-	# Do not strip spaces: they can be meaningful for manual plaintext edits.
-	text = "\n".join(lines)
-	if not text.endswith("\n"):
-		text += "\n"
-	path.write_text(text, encoding="utf-8")
+	with path.open("w", encoding="utf-8") as out:
+		if not plaintexts:
+			out.write("\n")
+		for index, pt in enumerate(plaintexts, start=1):
+			# Blocks are separated by one empty line.
+			if index > 1:
+				out.write("\n")
+			out.write(f"Plaintext {index}:\n")
+			if isinstance(pt, str):
+				out.write(pt)
+			elif isinstance(pt, DecryptedView):
+				# Decrypt and decode piece by piece instead of materializing the text.
+				decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+				for chunk in pt.chunks():
+					out.write(decoder.decode(chunk))
+				out.write(decoder.decode(b"", final=True))
+			else:
+				out.write(bytes(pt).decode(encoding, errors="replace"))
+			out.write("\n")
+			lines: list[str] = []
+			if masks is not None and (index - 1) < len(masks):
+				lines.append(masks[index - 1])
+			if masks2 is not None and (index - 1) < len(masks2):
+				lines.append(masks2[index - 1])
+			if reference_texts is not None and (index - 1) < len(reference_texts):
+				ref = reference_texts[index - 1] or ""
+				lines.extend(ref.splitlines() or [""])
+			# Do not strip spaces: they can be meaningful for manual plaintext edits.
+			for line in lines:
+				out.write(line + "\n")
 
 
 def parse_plaintexts(file_path: str | Path, *, expected_count: Optional[int] = None) -> list[str]:
@@ -2027,22 +2240,59 @@ def parse_plaintexts(file_path: str | Path, *, expected_count: Optional[int] = N
 
 	Returns a list of strings (Unicode). Unknown bytes are expected to be '_' (underscore).
 	"""
-	path = Path(file_path)
-	content = path.read_text(encoding="utf-8")
-	lines = content.splitlines()
+	scan = _scan_plaintexts_file(file_path, expected_count=expected_count)
+	return _plaintexts_from_scan(scan, expected_count)
+
+
+def parse_plaintexts_and_masks(
+	file_path: str | Path,
+	*,
+	expected_count: Optional[int] = None,
+) -> tuple[list[str], list[str], list[str]]:
+	"""parse_plaintexts() and parse_masks_two() in one read: (plaintexts, mask3_lines, mask4_lines)."""
+	scan = _scan_plaintexts_file(file_path, expected_count=expected_count)
+	mask3_lines, mask4_lines = _masks_from_scan(scan, expected_count)
+	return _plaintexts_from_scan(scan, expected_count), mask3_lines, mask4_lines
+
+
+_PLAINTEXT_HEADER_RE = re.compile(r"^\s*Plaintext\s+(\d+)\s*:\s*$", re.IGNORECASE)
+_MASK_HEADER_RE = re.compile(r"^\s*Mask\s+(\d+)\s*:\s*$", re.IGNORECASE)
+_MASK_LINE_BYTES = b"0123456789ABCDEFabcdef#<>_|&?"
+
+
+def _is_mask_line(line: str) -> bool:
+	"""Same answer as _MASK_LINE_RE_ANY.fullmatch(line), without a regex pass over long lines.
+
+	Mask symbols are ASCII, so any other line is rejected by the O(1) isascii()
+	flag; ASCII lines are checked with one bytes.translate() deleting the symbols.
+	"""
+	if len(line) < 20 or not line.isascii():
+		return False
+	raw = line.encode("ascii")
+	return not raw.translate(None, _MASK_LINE_BYTES) and raw.strip(b"_") != b""
+
+
+def _scan_plaintexts_file(file_path: str | Path, *, expected_count: Optional[int]) -> dict:
+	"""Classify every line of a plaintexts file once, for parse_plaintexts/parse_masks_two.
+
+	Each line is tested against the header patterns (anchored, they fail on the
+	first character of a text line) and at most once more for being a mask line
+	(see _is_mask_line()).
+	Returns the plaintext blocks (still without the expected_count check), the
+	mask candidates per header number and whether any header was seen.
+	"""
+	lines = Path(file_path).read_text(encoding="utf-8").splitlines()
 
 	plaintexts: list[str] = []
 	current: list[str] = []
+	# parse_masks_two: mask-looking lines (stripped) per "Plaintext N:" block.
+	mask_candidates: list[tuple[int, list[str]]] = []
+	block_masks: list[str] | None = None
 
 	def flush():
 		if current or (expected_count is not None and len(plaintexts) < expected_count):
 			plaintexts.append("\n".join(current).rstrip("\n"))
 
-	plaintext_header_re = re.compile(r"^\s*Plaintext\s+(\d+)\s*:\s*$", re.IGNORECASE)
-	mask_header_re = re.compile(r"^\s*Mask\s+(\d+)\s*:\s*$", re.IGNORECASE)
-	# Require at least one non-'_' symbol to avoid dropping plaintext lines that
-	# might be all '_' early in the workflow.
-	mask_line_re = _MASK_LINE_RE_ANY
 	saw_any_header = False
 	in_mask_block = False
 	# Some files (including the editable copy) write mask lines directly under plaintext.
@@ -2052,7 +2302,8 @@ def parse_plaintexts(file_path: str | Path, *, expected_count: Optional[int] = N
 	skipping_reference = False
 
 	for line in lines:
-		if plaintext_header_re.match(line):
+		header = _PLAINTEXT_HEADER_RE.match(line)
+		if header:
 			if saw_any_header:
 				flush()
 				current = []
@@ -2061,15 +2312,28 @@ def parse_plaintexts(file_path: str | Path, *, expected_count: Optional[int] = N
 			in_mask_block = False
 			seen_inline_masks_in_block = 0
 			skipping_reference = False
+			block_masks = []
+			mask_candidates.append((int(header.group(1)), block_masks))
 			continue
-		if mask_header_re.match(line):
+
+		is_mask = None
+		if block_masks is not None:
+			stripped = line.strip()
+			is_mask = _is_mask_line(stripped)
+			if is_mask:
+				block_masks.append(stripped)
+			if stripped is not line:
+				# parse_plaintexts tests the raw line; surrounding blanks never match.
+				is_mask = False
+
+		if _MASK_HEADER_RE.match(line):
 			# Ignore everything in a mask block until the next "Plaintext N:" header.
 			in_mask_block = True
 			continue
 		if saw_any_header and not in_mask_block:
 			# Backward/forward compatibility: some versions write mask line(s)
 			# directly under plaintext. Detect and skip such lines.
-			if current and mask_line_re.fullmatch(line):
+			if current and is_mask:
 				seen_inline_masks_in_block += 1
 				if seen_inline_masks_in_block >= 2:
 					skipping_reference = True
@@ -2080,10 +2344,7 @@ def parse_plaintexts(file_path: str | Path, *, expected_count: Optional[int] = N
 				if not line.strip():
 					skipping_reference = False
 				continue
-			if not line.strip():
-				# Keep empty lines as part of plaintext (rare).
-				current.append(line)
-				continue
+			# Empty lines are kept as part of plaintext (rare).
 			current.append(line)
 
 	if saw_any_header:
@@ -2092,12 +2353,47 @@ def parse_plaintexts(file_path: str | Path, *, expected_count: Optional[int] = N
 		# Fallback: treat each non-empty line as separate plaintext guess.
 		plaintexts = [line for line in lines if line.strip()]
 
+	return {"plaintexts": plaintexts, "mask_candidates": mask_candidates}
+
+
+def _plaintexts_from_scan(scan: dict, expected_count: Optional[int]) -> list[str]:
+	plaintexts = scan["plaintexts"]
 	if expected_count is not None and len(plaintexts) < expected_count:
 		raise ValueError(f"Expected at least {expected_count} plaintext blocks, got {len(plaintexts)}")
-
 	return plaintexts
 
 
+def _masks_from_scan(scan: dict, expected_count: Optional[int]) -> tuple[list[str], list[str]]:
+	results3: dict[int, str] = {}
+	results4: dict[int, str] = {}
+	for num, candidates in scan["mask_candidates"]:
+		if len(candidates) >= 2:
+			results3[num - 1] = candidates[-2]
+			results4[num - 1] = candidates[-1]
+		elif len(candidates) == 1:
+			# Backward compatibility: single mask line.
+			only = candidates[-1]
+			if re.search(r"[A-F4-9]", only, flags=re.IGNORECASE):
+				results4[num - 1] = only
+			else:
+				results3[num - 1] = only
+
+	if expected_count is None:
+		if not (results3 or results4):
+			return ([], [])
+		max_index = max([*results3.keys(), *results4.keys()])
+		count = max_index + 1
+	else:
+		count = expected_count
+
+	out3: list[str] = []
+	out4: list[str] = []
+	for i in range(count):
+		out3.append(results3.get(i, ""))
+		out4.append(results4.get(i, ""))
+	return out3, out4
+
+
 def _char_to_single_byte(char: str) -> Optional[int]:
 	if char == "_":
 		return None
@@ -2144,42 +2440,33 @@ def update_key_from_plaintexts(
 
 	conflicts: list[dict] = []
 	updates = 0
+	current = key_to_array(key[:common_len])
 
+	# Texts are applied in order, so a later text sees (and may override) the bytes of earlier ones.
 	for text_index, ciphertext in enumerate(ciphertexts):
 		if text_index >= len(plaintexts):
 			break
 		pt = plaintexts[text_index]
 		if isinstance(pt, (bytes, bytearray)):
-			pt_bytes = bytes(pt)
-			limit = min(common_len, len(pt_bytes), len(ciphertext))
-			for pos in range(limit):
-				value = pt_bytes[pos]
-				if value == ord("_"):
-					continue
-				new_key_byte = ciphertext[pos] ^ value
-				old_key_byte = key[pos]
-				if old_key_byte is not None and old_key_byte != new_key_byte:
-					conflicts.append({"pos": pos, "old": old_key_byte, "new": new_key_byte, "text": text_index})
-					if not override_conflicts:
-						continue
-				key[pos] = new_key_byte
-				updates += 1
-			continue
-
-		pt_text = str(pt)
-		limit = min(common_len, len(pt_text), len(ciphertext))
-		for pos in range(limit):
-			byte_value = _char_to_single_byte(pt_text[pos])
-			if byte_value is None:
-				continue
-			new_key_byte = ciphertext[pos] ^ byte_value
-			old_key_byte = key[pos]
-			if old_key_byte is not None and old_key_byte != new_key_byte:
-				conflicts.append({"pos": pos, "old": old_key_byte, "new": new_key_byte, "text": text_index})
-				if not override_conflicts:
-					continue
-			key[pos] = new_key_byte
-			updates += 1
+			values = np.frombuffer(bytes(pt), dtype=np.uint8).astype(np.int16)
+			values[values == ord("_")] = -1
+		else:
+			values = _manual_bytes(_code_points(str(pt)), _char_to_single_byte)
+		limit = min(common_len, len(values), len(ciphertext))
+		values = values[:limit]
+		positions = np.flatnonzero(values >= 0)
+		new_bytes = np.frombuffer(bytes(ciphertext[:limit]), dtype=np.uint8)[positions] ^ values[positions]
+		old_bytes = current[positions]
+		clash = (old_bytes >= 0) & (old_bytes != new_bytes)
+		for pos, old, new in zip(positions[clash].tolist(), old_bytes[clash].tolist(), new_bytes[clash].tolist()):
+			conflicts.append({"pos": pos, "old": old, "new": new, "text": text_index})
+		if not override_conflicts:
+			positions, new_bytes = positions[~clash], new_bytes[~clash]
+		current[positions] = new_bytes
+		updates += len(positions)
+
+	for pos in np.flatnonzero(current != key_to_array(key[:common_len])).tolist():
+		key[pos] = int(current[pos])
 
 	stats = {
 		"common_len": common_len,
@@ -0,0 +1,340 @@
+"""Append-only binary journal of K3 key changes: undo/redo, replay to a time, per-position history.
+
+Every change of the key is appended as a record of (position, old byte, new
+byte) deltas with a time and a source ("manual", "auto_solver", ...). Undo and
+redo are records too, so the file is never rewritten: an undo appends the
+inverse deltas of the last edit still in effect, a redo appends them again.
+Undo/redo cost O(deltas of that edit). A snapshot of the whole key is appended
+when a journal is started and then every `snapshot_every` deltas, so replaying
+to a time starts from the closest snapshot instead of the beginning.
+
+File layout (key bytes are int16, -1 = unknown, as in state_store)::
+
+	magic (8 bytes) | key length (u32)
+	record: kind (u8) | time (f64, unix) | count (u32) | ref (i32) | source length (u16) | source | payload
+
+	EDIT / UNDO / REDO   count deltas of (pos u32, old i16, new i16); ref = the edit undone/redone
+	SNAPSHOT             count = key length int16 values
+
+A record cut short by a crash is dropped (and truncated away) on open.
+
+	python key_journal.py --log 10          # last edits
+	python key_journal.py --undo            # revert the last edit in state.bin
+	python key_journal.py --at 2026-10-19T12:00:00
+	python key_journal.py --who 1234        # edits that last touched position 1234
+"""
+from __future__ import annotations
+
+import argparse
+import struct
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+# Module import: help_methods imports this module back (commit_key, open_key_journal).
+import help_methods
+from key_map import KeyMap
+from state_store import key_to_array, resolve_state_path
+
+
+MAGIC = b"VKEYJRN\x01"
+EDIT = 1
+UNDO = 2
+REDO = 3
+SNAPSHOT = 4
+KIND_NAMES = {EDIT: "edit", UNDO: "undo", REDO: "redo", SNAPSHOT: "snapshot"}
+
+DELTA_DTYPE = np.dtype([("pos", "<u4"), ("old", "<i2"), ("new", "<i2")])
+_FILE_HEADER = struct.Struct("<8sI")
+_RECORD = struct.Struct("<BdIiH")
+
+
+@dataclass(frozen=True)
+class JournalEntry:
+	id: int
+	kind: int
+	time: float
+	source: str
+	ref: int
+	deltas: np.ndarray  # DELTA_DTYPE; for snapshots, the key (int16)
+
+	@property
+	def kind_name(self) -> str:
+		return KIND_NAMES.get(self.kind, str(self.kind))
+
+	def describe(self) -> str:
+		when = datetime.fromtimestamp(self.time).isoformat(timespec="seconds")
+		size = f"{len(self.deltas)} байт ключа" if self.kind != SNAPSHOT else "снимок"
+		ref = f" -> #{self.ref}" if self.ref >= 0 else ""
+		return f"#{self.id:<5} {when} {self.kind_name:<8}{ref} {self.source} ({size})"
+
+
+class KeyJournal:
+	"""The journal file plus its in-memory index (entries, undo/redo stacks, per-position deltas)."""
+
+	def __init__(self, path: str | Path, *, length: int, snapshot_every: int = 4096) -> None:
+		self.path = Path(path)
+		self.length = length
+		self.snapshot_every = snapshot_every
+		self.entries: list[JournalEntry] = []
+		self._undo: list[int] = []
+		self._redo: list[int] = []
+		self._since_snapshot = 0
+		self._touch_index: Optional[tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+		if self.path.exists():
+			self._load()
+		else:
+			with self.path.open("wb") as file:
+				file.write(_FILE_HEADER.pack(MAGIC, length))
+
+	def _load(self) -> None:
+		data = self.path.read_bytes()
+		if len(data) < _FILE_HEADER.size:
+			raise ValueError(f"{self.path}: truncated key journal")
+		magic, length = _FILE_HEADER.unpack_from(data)
+		if magic != MAGIC:
+			raise ValueError(f"{self.path}: not a key journal")
+		if length != self.length:
+			raise ValueError(f"{self.path}: journal is for a key of {length} bytes, not {self.length}")
+		offset = _FILE_HEADER.size
+		while offset + _RECORD.size <= len(data):
+			kind, when, count, ref, source_len = _RECORD.unpack_from(data, offset)
+			body = offset + _RECORD.size + source_len
+			dtype = np.dtype("<i2") if kind == SNAPSHOT else DELTA_DTYPE
+			end = body + count * dtype.itemsize
+			if end > len(data):
+				break
+			source = data[offset + _RECORD.size:body].decode("utf-8")
+			payload = np.frombuffer(data, dtype=dtype, count=count, offset=body).copy()
+			self._index(JournalEntry(len(self.entries), kind, when, source, ref, payload))
+			offset = end
+		if offset < len(data):
+			# Incomplete last record (interrupted write).
+			with self.path.open("r+b") as file:
+				file.truncate(offset)
+
+	def _index(self, entry: JournalEntry) -> None:
+		self.entries.append(entry)
+		self._touch_index = None
+		if entry.kind == SNAPSHOT:
+			self._since_snapshot = 0
+			return
+		self._since_snapshot += len(entry.deltas)
+		if entry.kind == EDIT:
+			self._undo.append(entry.id)
+			self._redo.clear()
+		elif entry.kind == UNDO:
+			self._redo.append(self._undo.pop())
+		elif entry.kind == REDO:
+			self._undo.append(self._redo.pop())
+
+	def _append(self, kind: int, payload: np.ndarray, *, source: str, ref: int = -1, when: Optional[float] = None) -> JournalEntry:
+		entry = JournalEntry(len(self.entries), kind, time.time() if when is None else when, source, ref, payload)
+		source_bytes = source.encode("utf-8")
+		with self.path.open("ab") as file:
+			file.write(_RECORD.pack(kind, entry.time, len(payload), ref, len(source_bytes)))
+			file.write(source_bytes)
+			file.write(payload.tobytes())
+		self._index(entry)
+		return entry
+
+	def _maybe_snapshot(self, key: Sequence[Optional[int]] | np.ndarray | None, when: Optional[float]) -> None:
+		if key is not None and self._since_snapshot >= self.snapshot_every:
+			self._append(SNAPSHOT, key_to_array(key).astype("<i2"), source="snapshot", when=when)
+
+	@staticmethod
+	def _deltas(positions: Sequence[int] | np.ndarray, old: Sequence[Optional[int]], new: Sequence[Optional[int]]) -> np.ndarray:
+		deltas = np.zeros(len(positions), dtype=DELTA_DTYPE)
+		deltas["pos"] = positions
+		deltas["old"] = key_to_array(old) if len(positions) else []
+		deltas["new"] = key_to_array(new) if len(positions) else []
+		return deltas
+
+	def append_edit(
+		self,
+		positions: Sequence[int] | np.ndarray,
+		old: Sequence[Optional[int]],
+		new: Sequence[Optional[int]],
+		*,
+		source: str,
+		key: Sequence[Optional[int]] | np.ndarray | None = None,
+		when: Optional[float] = None,
+	) -> Optional[JournalEntry]:
+		"""Journal key bytes that changed from old to new (None = unknown); None if nothing changed.
+
+		`key` is the key after the change; it is only read when a snapshot is due.
+		The first edit of a new journal needs it to store the starting snapshot.
+		"""
+		deltas = self._deltas(positions, old, new)
+		deltas = deltas[deltas["old"] != deltas["new"]]
+		if not len(deltas):
+			return None
+		if not self.entries:
+			if key is None:
+				raise ValueError("The first journal entry needs the key to store the starting snapshot")
+			start = key_to_array(key).astype("<i2")
+			start[deltas["pos"]] = deltas["old"]
+			self._append(SNAPSHOT, start, source="start", when=when)
+		entry = self._append(EDIT, deltas, source=source, when=when)
+		self._maybe_snapshot(key, when)
+		return entry
+
+	def record(
+		self,
+		old_key: Sequence[Optional[int]] | np.ndarray,
+		new_key: Sequence[Optional[int]] | np.ndarray,
+		*,
+		source: str,
+		when: Optional[float] = None,
+	) -> Optional[JournalEntry]:
+		"""Journal the difference between two whole keys."""
+		old_arr, new_arr = key_to_array(old_key), key_to_array(new_key)
+		changed = np.flatnonzero(old_arr != new_arr)
+		return self.append_edit(changed, old_arr[changed], new_arr[changed], source=source, key=new_arr, when=when)
+
+	@property
+	def can_undo(self) -> bool:
+		return bool(self._undo)
+
+	@property
+	def can_redo(self) -> bool:
+		return bool(self._redo)
+
+	def _revert(self, kind: int, entry_id: int, key: np.ndarray, *, to_new: bool, when: Optional[float]) -> JournalEntry:
+		edit = self.entries[entry_id].deltas
+		pos = edit["pos"].astype(np.int64)
+		target = edit["new"] if to_new else edit["old"]
+		if not to_new:
+			# Undo the edit's deltas last-to-first, so a position changed twice ends at its first old value.
+			pos, target = pos[::-1], target[::-1]
+		deltas = np.zeros(len(pos), dtype=DELTA_DTYPE)
+		deltas["pos"] = pos
+		# The current bytes (not the journaled ones), so replay stays exact after outside changes.
+		deltas["old"] = key[pos]
+		deltas["new"] = target
+		key[pos] = target
+		entry = self._append(kind, deltas, source=self.entries[entry_id].source, ref=entry_id, when=when)
+		self._maybe_snapshot(key, when)
+		return entry
+
+	def undo(self, key: np.ndarray, *, when: Optional[float] = None) -> Optional[JournalEntry]:
+		"""Revert the last edit still in effect on `key` (int16, in place); None if there is none."""
+		if not self._undo:
+			return None
+		return self._revert(UNDO, self._undo[-1], key, to_new=False, when=when)
+
+	def redo(self, key: np.ndarray, *, when: Optional[float] = None) -> Optional[JournalEntry]:
+		"""Re-apply the last undone edit on `key` (int16, in place); None if there is none."""
+		if not self._redo:
+			return None
+		return self._revert(REDO, self._redo[-1], key, to_new=True, when=when)
+
+	def key_at(self, when: float) -> np.ndarray:
+		"""The key as of `when`: the last snapshot not after it plus the deltas up to it.
+
+		Before the first record this is the starting snapshot.
+		"""
+		snapshots = [e for e in self.entries if e.kind == SNAPSHOT]
+		if not snapshots:
+			return np.full(self.length, -1, dtype=np.int16)
+		base = snapshots[0]
+		for entry in snapshots:
+			if entry.time > when:
+				break
+			base = entry
+		key = base.deltas.astype(np.int16)
+		for entry in self.entries[base.id + 1:]:
+			if entry.time > when:
+				break
+			if entry.kind != SNAPSHOT:
+				key[entry.deltas["pos"].astype(np.int64)] = entry.deltas["new"]
+		return key
+
+	def touches(self, position: int, *, limit: int = 5) -> list[tuple[JournalEntry, Optional[int], Optional[int]]]:
+		"""The last `limit` records that changed `position`, newest first, with (old, new) bytes."""
+		if self._touch_index is None:
+			parts = [e for e in self.entries if e.kind != SNAPSHOT]
+			self._touch_index = (
+				np.concatenate([e.deltas["pos"] for e in parts] + [np.zeros(0, dtype="<u4")]),
+				np.concatenate([np.full(len(e.deltas), e.id) for e in parts] + [np.zeros(0, dtype=np.int64)]),
+				np.concatenate([np.arange(len(e.deltas)) for e in parts] + [np.zeros(0, dtype=np.int64)]),
+			)
+		positions, owners, rows = self._touch_index
+		hits = np.flatnonzero(positions == position)[::-1][:limit]
+		out = []
+		for hit in hits.tolist():
+			entry = self.entries[int(owners[hit])]
+			delta = entry.deltas[int(rows[hit])]
+			old, new = int(delta["old"]), int(delta["new"])
+			out.append((entry, None if old < 0 else old, None if new < 0 else new))
+		return out
+
+
+def _parse_time(text: str) -> float:
+	try:
+		return float(text)
+	except ValueError:
+		return datetime.fromisoformat(text).timestamp()
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="K3 key journal: history, undo/redo and replay of key changes.")
+	parser.add_argument("--task", default="2026_02_24_10_27_04_Анна_Казакевич_task.txt")
+	parser.add_argument("--state", default="state.json")
+	parser.add_argument("--journal", default="key_journal.bin")
+	action = parser.add_mutually_exclusive_group()
+	action.add_argument("--log", type=int, nargs="?", const=20, metavar="N", help="show the last N records (default action, N=20)")
+	action.add_argument("--undo", type=int, nargs="?", const=1, metavar="N", help="revert the last N edits")
+	action.add_argument("--redo", type=int, nargs="?", const=1, metavar="N", help="re-apply the last N undone edits")
+	action.add_argument("--at", metavar="TIME", help="restore the key as of TIME (ISO date/time or unix seconds)")
+	action.add_argument("--who", type=int, metavar="POS", help="records that last changed key position POS")
+	args = parser.parse_args()
+
+	if not resolve_state_path(args.state).exists():
+		raise SystemExit(f"{args.state}: no state, run main.py first")
+	state = help_methods.load_state(args.state)
+	key = key_to_array(state["key"]).copy()
+	journal = help_methods.open_key_journal(args.journal, length=len(key))
+	if journal is None:
+		raise SystemExit(1)
+
+	if args.who is not None:
+		for entry, old, new in journal.touches(args.who):
+			print(f"{entry.describe()}: {old} -> {new}")
+		return
+	if args.undo is None and args.redo is None and args.at is None:
+		for entry in journal.entries[-(args.log or 20):]:
+			print(entry.describe())
+		print(f"undo: {'да' if journal.can_undo else 'нет'}, redo: {'да' if journal.can_redo else 'нет'}")
+		return
+
+	if args.at is not None:
+		target = journal.key_at(_parse_time(args.at))
+		entry = journal.record(key, target, source=f"restore {args.at}")
+		key = target
+		print(entry.describe() if entry else "Ключ уже в этом состоянии")
+	else:
+		step = journal.undo if args.undo is not None else journal.redo
+		for _ in range(args.undo if args.undo is not None else args.redo):
+			entry = step(key)
+			if entry is None:
+				print("Больше нечего " + ("отменять" if args.undo is not None else "повторять"))
+				break
+			print(entry.describe())
+
+	ciphertexts = help_methods.load_ciphertexts(args.task)
+	# Restored bytes are stamped as "journal": the journal keeps no confidence.
+	key_map = KeyMap.from_state(state, length=len(key))
+	old_key = key_map.to_list()
+	key_map.sync(key, source="journal")
+	# The undo/redo/restore above is already journaled.
+	saved = help_methods.commit_key(args.state, state, ciphertexts, key_map, old_key, source="journal", journal_path=None)
+	print(f"Ключ записан в {saved}; запустите main.py, чтобы обновить plaintexts_guess*.txt")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,205 @@
+"""Structured K3 key: every key byte with its confidence, source and time of the last change.
+
+KeyMap keeps four parallel arrays over the key positions:
+
+	key         int16    key byte, -1 where unknown (state_store.key_to_array)
+	confidence  float32  0..1, 0 for unknown bytes
+	source      uint8    index into SOURCES (who set or cleared the byte)
+	time        float64  unix time of the last change, 0 if never recorded
+
+Writers keep using the flat key list and call sync() afterwards: the changed
+positions are found with one array comparison and stamped with the source.
+Mismatches against manual plaintexts and conflicts with a proposed key are
+array comparisons as well, so reports do not loop over texts x positions.
+
+The arrays are stored in state.bin next to the key (see arrays() and
+from_state()); a state without them gives the known bytes the source
+"legacy": set before their provenance was recorded.
+"""
+from __future__ import annotations
+
+import time
+from datetime import datetime
+from typing import Optional, Sequence
+
+import numpy as np
+
+from state_store import key_to_array, key_to_list
+
+
+SOURCES = ("legacy", "manual", "crib", "space", "auto_solver", "journal", "reference")
+DEFAULT_CONFIDENCE = {
+	"legacy": 1.0,
+	"manual": 1.0,
+	"crib": 0.8,
+	"space": 0.5,
+	"auto_solver": 0.6,
+	"journal": 1.0,
+	"reference": 0.9,
+}
+ARRAY_NAMES = ("key.confidence", "key.source", "key.time")
+
+
+def source_code(source: str) -> int:
+	try:
+		return SOURCES.index(source)
+	except ValueError:
+		raise ValueError(f"unknown key source {source!r}, expected one of {SOURCES}") from None
+
+
+class KeyMap:
+	"""Key bytes plus per-position provenance (see the module docstring)."""
+
+	def __init__(self, length: int) -> None:
+		self.key = np.full(length, -1, dtype=np.int16)
+		self.confidence = np.zeros(length, dtype=np.float32)
+		self.source = np.zeros(length, dtype=np.uint8)
+		self.time = np.zeros(length, dtype=np.float64)
+
+	@classmethod
+	def from_key(
+		cls,
+		key: Sequence[Optional[int]] | np.ndarray,
+		*,
+		length: Optional[int] = None,
+		source: str = "legacy",
+		confidence: Optional[float] = None,
+		when: float = 0.0,
+	) -> "KeyMap":
+		"""A map of `key` (cut or padded to length) with one source for all known bytes."""
+		values = key_to_array(key)
+		out = cls(len(values) if length is None else length)
+		n = min(len(out), len(values))
+		out.key[:n] = values[:n]
+		known = out.key >= 0
+		out.confidence[known] = DEFAULT_CONFIDENCE[source] if confidence is None else confidence
+		out.source[known] = source_code(source)
+		out.time[known] = when
+		return out
+
+	@classmethod
+	def from_state(cls, state: dict, *, length: Optional[int] = None) -> "KeyMap":
+		"""The map saved with a state (help_methods.load_state), or a "legacy" map of its key."""
+		out = cls.from_key(state.get("key") or [], length=length)
+		arrays = state.get("arrays") or {}
+		if not all(name in arrays and len(arrays[name]) >= len(out) for name in ARRAY_NAMES):
+			return out
+		n = len(out)
+		known = out.key >= 0
+		out.confidence[:] = np.where(known, arrays["key.confidence"][:n], 0)
+		out.source[:] = arrays["key.source"][:n]
+		out.time[:] = arrays["key.time"][:n]
+		# Bytes the saved provenance calls unknown but the key has (written without a map).
+		stale = known & (out.confidence == 0)
+		out.confidence[stale] = DEFAULT_CONFIDENCE["legacy"]
+		out.source[stale] = 0
+		return out
+
+	def __len__(self) -> int:
+		return len(self.key)
+
+	def arrays(self) -> dict[str, np.ndarray]:
+		"""Named arrays for save_state(key_map=...) / state_store.save_store(extra_arrays=...)."""
+		return dict(zip(ARRAY_NAMES, (self.confidence, self.source, self.time)))
+
+	def to_list(self) -> list[Optional[int]]:
+		return key_to_list(self.key)
+
+	def _stamp(self, positions: np.ndarray, values: np.ndarray, source: str, confidence, when: Optional[float]) -> None:
+		self.key[positions] = values
+		set_here = values >= 0
+		conf = DEFAULT_CONFIDENCE[source] if confidence is None else confidence
+		self.confidence[positions] = np.where(set_here, conf, 0)
+		self.source[positions] = source_code(source)
+		self.time[positions] = time.time() if when is None else when
+
+	def sync(
+		self,
+		key: Sequence[Optional[int]] | np.ndarray,
+		*,
+		source: str,
+		positions: Optional[Sequence[int] | np.ndarray] = None,
+		confidence: Optional[float | np.ndarray] = None,
+		when: Optional[float] = None,
+	) -> np.ndarray:
+		"""Take over the bytes of `key` that differ from the map and stamp them with `source`.
+
+		`positions` limits the comparison (e.g. the columns an edit touched);
+		cleared bytes keep the source that cleared them with confidence 0.
+		`confidence` is one value or one per position of the key. Returns the
+		changed positions.
+		"""
+		if positions is None:
+			values = np.full(len(self), -1, dtype=np.int16)
+			given = key_to_array(key)[:len(self)]
+			values[:len(given)] = given
+			changed = np.flatnonzero(self.key != values)
+			values = values[changed]
+		else:
+			# Only the listed bytes are read, so a small edit does not convert the whole key.
+			candidates = np.asarray(positions, dtype=np.int64)
+			values = key_to_array([key[p] if p < len(key) else None for p in candidates.tolist()])
+			differs = self.key[candidates] != values
+			changed, values = candidates[differs], values[differs]
+		if isinstance(confidence, np.ndarray):
+			confidence = confidence[changed]
+		self._stamp(changed, values, source, confidence, when)
+		return changed
+
+	def propose(
+		self,
+		key: Sequence[Optional[int]] | np.ndarray,
+		*,
+		source: str,
+		confidence: Optional[float] = None,
+		when: Optional[float] = None,
+	) -> tuple[np.ndarray, np.ndarray]:
+		"""Take the known bytes of `key` where the map is unknown or less confident.
+
+		Returns (taken positions, conflicting positions): conflicts are known
+		bytes that differ and were kept because their confidence is not lower.
+		"""
+		values = np.full(len(self), -1, dtype=np.int16)
+		given = key_to_array(key)[:len(self)]
+		values[:len(given)] = given
+		conf = DEFAULT_CONFIDENCE[source] if confidence is None else confidence
+		differs = (values >= 0) & (self.key != values)
+		take = differs & ((self.key < 0) | (self.confidence < conf))
+		taken = np.flatnonzero(take)
+		self._stamp(taken, values[taken], source, conf, when)
+		return taken, np.flatnonzero(differs & ~take)
+
+	def conflicts(self, key: Sequence[Optional[int]] | np.ndarray) -> np.ndarray:
+		"""Positions where both the map and `key` know the byte and disagree."""
+		values = key_to_array(key)[:len(self)]
+		here = self.key[:len(values)]
+		return np.flatnonzero((here >= 0) & (values >= 0) & (here != values))
+
+	def mismatches(self, rows: np.ndarray, manual: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+		"""(text, position) pairs, text-major, where the key does not give the manual byte.
+
+		rows are the (N, L) ciphertext bytes and manual the (N, L) int16 manual
+		bytes with -1 where a text has no constraint; L may be shorter than the map.
+		"""
+		length = manual.shape[1]
+		key = self.key[:length]
+		decoded = rows[:, :length] ^ np.where(key >= 0, key, 0).astype(np.uint8)
+		bad = (manual >= 0) & ((key < 0) | (decoded != manual))
+		return np.nonzero(bad)
+
+	def describe(self, pos: int) -> str:
+		"""`source conf time` of one position, for reports."""
+		stamp = self.time[pos]
+		when = datetime.fromtimestamp(stamp).isoformat(timespec="seconds") if stamp > 0 else "-"
+		return f"src={SOURCES[self.source[pos]]} conf={self.confidence[pos]:.2f} at={when}"
+
+	def summary(self) -> dict[str, dict]:
+		"""Known bytes per source with their mean confidence."""
+		known = self.key >= 0
+		counts = np.bincount(self.source[known], minlength=len(SOURCES))
+		totals = np.bincount(self.source[known], weights=self.confidence[known], minlength=len(SOURCES))
+		return {
+			name: {"known": int(counts[code]), "mean_confidence": round(float(totals[code] / counts[code]), 4)}
+			for code, name in enumerate(SOURCES)
+			if counts[code]
+		}
@@ -0,0 +1,118 @@
+"""Lazy plaintext views: a ciphertext under a partial key, decrypted per slice.
+
+DecryptedView wraps the ciphertext buffer (no copy) and a shared int16 key
+array (-1 = unknown, see state_store.key_to_array). Slicing decrypts only the
+requested range with numpy: np.bitwise_xor for the known key bytes and np.where
+for the unknown ones, which read as `unknown_byte` (also past the end of the
+key), exactly as help_methods.apply_partial_key() does.
+
+Small reads (context windows, previews) go through a per-view LRU cache of
+aligned windows; reads larger than the cache bypass it. The key array is not
+copied, so after changing it in place call invalidate() on the views.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Iterator, Optional, Sequence
+
+import numpy as np
+
+from state_store import key_to_array
+
+
+class DecryptedView:
+	"""Read-only, bytes-like plaintext of one ciphertext under a partial key."""
+
+	def __init__(
+		self,
+		ciphertext: bytes,
+		key: np.ndarray | Sequence[Optional[int]],
+		*,
+		unknown_byte: int = ord("_"),
+		window: int = 4096,
+		cache_windows: int = 8,
+	) -> None:
+		self._cipher = np.frombuffer(ciphertext, dtype=np.uint8)
+		self._key = key_to_array(key)
+		self.unknown_byte = unknown_byte
+		self.window = window
+		self.cache_windows = cache_windows
+		self._cache: OrderedDict[int, bytes] = OrderedDict()
+
+	def __len__(self) -> int:
+		return len(self._cipher)
+
+	def _decrypt(self, start: int, stop: int) -> bytes:
+		cipher = self._cipher[start:stop]
+		key = self._key[start:min(stop, len(self._key))]
+		out = np.full(len(cipher), self.unknown_byte, dtype=np.uint8)
+		out[:len(key)] = np.where(key >= 0, np.bitwise_xor(cipher[:len(key)], key.astype(np.uint8)), self.unknown_byte)
+		return out.tobytes()
+
+	def _window_bytes(self, index: int) -> bytes:
+		cached = self._cache.get(index)
+		if cached is not None:
+			self._cache.move_to_end(index)
+			return cached
+		start = index * self.window
+		data = self._decrypt(start, min(start + self.window, len(self)))
+		self._cache[index] = data
+		if len(self._cache) > self.cache_windows:
+			self._cache.popitem(last=False)
+		return data
+
+	def tobytes(self, start: int = 0, stop: Optional[int] = None) -> bytes:
+		"""Plaintext bytes of [start, stop) (clipped to the view, like a bytes slice with step 1)."""
+		start, stop, _ = slice(start, stop).indices(len(self))
+		if stop <= start:
+			return b""
+		first, last = start // self.window, (stop - 1) // self.window
+		if last - first + 1 > self.cache_windows:
+			return self._decrypt(start, stop)
+		data = b"".join(self._window_bytes(i) for i in range(first, last + 1))
+		offset = first * self.window
+		return data[start - offset:stop - offset]
+
+	def __getitem__(self, item: int | slice) -> int | bytes:
+		if isinstance(item, slice):
+			if item.step in (None, 1):
+				return self.tobytes(item.start, item.stop)
+			return self.tobytes()[item]
+		index = item + len(self) if item < 0 else item
+		if not 0 <= index < len(self):
+			raise IndexError("DecryptedView index out of range")
+		return self.tobytes(index, index + 1)[0]
+
+	def __bytes__(self) -> bytes:
+		return self.tobytes()
+
+	def __iter__(self) -> Iterator[int]:
+		for chunk in self.chunks():
+			yield from chunk
+
+	def chunks(self, size: int = 1 << 16) -> Iterator[bytes]:
+		"""The whole plaintext in consecutive pieces, decrypted one piece at a time."""
+		for start in range(0, len(self), size):
+			yield self._decrypt(start, min(start + size, len(self)))
+
+	def decode(self, encoding: str = "utf-8", errors: str = "strict") -> str:
+		return self.tobytes().decode(encoding, errors)
+
+	def invalidate(self) -> None:
+		"""Drop cached windows (after the shared key array changed in place)."""
+		self._cache.clear()
+
+	def __repr__(self) -> str:
+		known = int((self._key[:len(self)] >= 0).sum())
+		return f"DecryptedView(len={len(self)}, known={known})"
+
+
+def decrypted_views(
+	ciphertexts: Sequence[bytes],
+	key: np.ndarray | Sequence[Optional[int]],
+	*,
+	unknown_byte: int = ord("_"),
+) -> list[DecryptedView]:
+	"""One view per ciphertext, all sharing one key array."""
+	shared = key_to_array(key)
+	return [DecryptedView(c, shared, unknown_byte=unknown_byte) for c in ciphertexts]
@@ -1,22 +1,29 @@
 
 from pathlib import Path
+import argparse
 import sys
+import time
 
+from edit_session import EditSession, input_fingerprint
+from key_journal import KeyJournal
+from key_map import KeyMap
 from help_methods import (
 	apply_partial_key_to_all,
 	load_ciphertexts,
 	load_state,
+	open_key_journal,
+	resolve_state_path,
 	manual_char_to_byte,
-	parse_masks_two,
 	apply_manual_mask_overrides,
 	merge_manual_mask_constraints,
 	refine_mask_lines_with_manual_constraints,
 	make_partial_key,
-	parse_plaintexts,
+	parse_plaintexts_and_masks,
 	try_restore_plaintexts_from_state,
 	save_key_history,
 	save_state,
 	apply_manual_plaintexts_to_key,
+	overlay_manual_edits,
 	write_manual_mismatch_report,
 	write_star_triplet_options,
 	write_plaintexts_file,
@@ -97,8 +104,153 @@ def _load_reference_texts(path: Path, *, expected_count: int) -> list[str]:
 	return ["\n".join(g).rstrip("\n") for g in groups]
 
 
+def _open_session(
+	*,
+	ciphertexts: list[bytes],
+	base_mask3_lines: list[str],
+	base_mask4_lines: list[str],
+	ref_texts: list[str],
+	state_path: Path,
+	edited_plaintexts_path: Path,
+	plaintexts_path: str,
+	meta: dict,
+) -> EditSession | None:
+	"""Resume from the last run's snapshot; None if a full run is needed first."""
+	if not edited_plaintexts_path.exists():
+		return None
+	return EditSession.from_state(
+		state_path,
+		ciphertexts=ciphertexts,
+		base_mask3=base_mask3_lines,
+		base_mask4=base_mask4_lines,
+		reference_texts=ref_texts,
+		display_path=plaintexts_path,
+		inputs=meta["inputs"],
+		char_to_byte=_manual_char_to_byte_with_unicode_apostrophe,
+	)
+
+
+def _apply_edits(
+	session: EditSession,
+	*,
+	state_path: Path,
+	edited_plaintexts_path: Path,
+	plaintexts_path: str,
+	meta: dict,
+	journal: KeyJournal | None = None,
+) -> None:
+	"""Apply only the columns changed since the last snapshot and write the outputs."""
+	started = time.perf_counter()
+	count = len(session.ciphertexts)
+	edited_plaintexts, edited_masks3, edited_masks4 = parse_plaintexts_and_masks(edited_plaintexts_path, expected_count=count)
+	stats = session.apply(edited_plaintexts, edited_masks3, edited_masks4)
+	if journal is not None:
+		journal.append_edit(
+			stats["key_positions"],
+			stats["key_old"],
+			[session.key[p] for p in stats["key_positions"]],
+			source="manual",
+			key=session.key,
+		)
+	print(
+		"Инкрементально: изменено позиций",
+		f"text={len(stats['text_positions'])}",
+		f"key={len(stats['key_positions'])}",
+		f"mask={len(stats['mask_positions'])};",
+		f"updates={stats['updates']} conflicts={len(stats['conflicts'])} clears={stats['clears']}",
+	)
+
+	# Called without stars too, so options left from an earlier run are removed.
+	star_stats = write_star_triplet_options(
+		ciphertexts=session.ciphertexts,
+		manual_plaintexts=edited_plaintexts,
+		mask3_lines=session.display3,
+		mask4_lines=session.display4,
+		common_len=session.common_len,
+	)
+	if star_stats.get("files"):
+		print("Сгенерированы варианты для '*' позиций:", f"positions={star_stats.get('written_positions')} files={star_stats.get('files')} dir={star_stats.get('out_dir')}")
+
+	if not stats["text_positions"] and not stats["mask_positions"]:
+		print(f"Изменений нет ({(time.perf_counter() - started) * 1000:.1f} мс)")
+		return
+
+	mismatch_count = session.write_outputs(
+		plaintexts_path=plaintexts_path,
+		edited_path=edited_plaintexts_path,
+		report_path="manual_mismatch_report.txt",
+	)
+	if mismatch_count:
+		print(f"Несовпадения manual vs key: {mismatch_count} (см. manual_mismatch_report.txt)")
+	manual_edits = {k: stats[k] for k in ("common_len", "updates", "clears", "conflicts")}
+	saved_path = session.save(state_path, meta={**meta, "manual_edits": manual_edits})
+	print(f"Состояние сохранено в: {saved_path} ({(time.perf_counter() - started) * 1000:.1f} мс)")
+
+
+def _file_signature(path: Path) -> tuple[int, int] | None:
+	try:
+		st = path.stat()
+	except OSError:
+		return None
+	return st.st_mtime_ns, st.st_size
+
+
+def _watch_edits(
+	session: EditSession,
+	*,
+	state_path: Path,
+	edited_plaintexts_path: Path,
+	plaintexts_path: str,
+	meta: dict,
+	interval: float,
+	journal: KeyJournal | None = None,
+) -> bool:
+	"""Poll the editable copy and apply every save with the session kept in memory.
+
+	A save is applied once the file looks the same on two polls in a row, so a
+	half-written file is not parsed. Returns True when one of the input files
+	(task, masks, texts.txt) changed and everything has to be reloaded, False
+	on Ctrl+C.
+	"""
+	print(f"Слежу за изменениями {edited_plaintexts_path} (опрос {interval * 1000:.0f} мс, Ctrl+C — выход)")
+	applied = _file_signature(edited_plaintexts_path)
+	pending = applied
+	try:
+		while True:
+			time.sleep(interval)
+			if input_fingerprint(list(meta["inputs"])) != meta["inputs"]:
+				return True
+			current = _file_signature(edited_plaintexts_path)
+			if current is None or current == applied:
+				pending = current
+				continue
+			if current != pending:
+				pending = current
+				continue
+			try:
+				_apply_edits(
+					session,
+					state_path=state_path,
+					edited_plaintexts_path=edited_plaintexts_path,
+					plaintexts_path=plaintexts_path,
+					meta=meta,
+					journal=journal,
+				)
+			except ValueError as exc:
+				print(f"Не удалось разобрать {edited_plaintexts_path}: {exc}")
+			# Our own rewrite of the copy is not a new edit.
+			applied = pending = _file_signature(edited_plaintexts_path)
+	except KeyboardInterrupt:
+		print("Слежение остановлено")
+		return False
+
+
 #
-def go_main():
+def go_main(incremental: bool = False, watch: bool = False, interval: float = 0.02) -> bool:
+	"""Run K3 once (fully or incrementally) and optionally keep watching the editable copy.
+
+	Returns True when watch mode saw an input file change and wants a fresh start.
+	"""
 	print("K3: первичный анализ многократно использованного OTP (Вермам)")
 
 	default_task_path = "2026_02_24_10_27_04_Анна_Казакевич_task.txt"
@@ -111,8 +263,8 @@ def go_main():
 	print(f"Общая длина для анализа (min len): {common_len}")
 
 	# Load mask3/mask4 (as produced by build_mask3.py / build_mask4.py)
-	mask3_path =  Path("mask3_final_3.txt")
-	mask4_path = Path("mask4_final_3.txt")
+	mask3_path = Path(f"mask3_final_{len(ciphertexts)}.txt")
+	mask4_path = Path(f"mask4_final_{len(ciphertexts)}.txt")
 	try:
 		base_mask3_lines = _load_mask_lines_txt(mask3_path, expected_count=len(ciphertexts))
 		base_mask4_lines = _load_mask_lines_txt(mask4_path, expected_count=len(ciphertexts))
@@ -126,13 +278,45 @@ def go_main():
 		base_mask4_lines = ["_" * len(c) for c in ciphertexts]
 
 	state_path = Path("state.json")
-	history_path =  Path("key_history.jsonl")
+	journal = open_key_journal(Path("key_journal.bin"), length=common_len)
+	edited_plaintexts_path = Path("plaintexts_guess copy.txt")
+	plaintexts_path = "plaintexts_guess.txt"
+	ref_texts = _load_reference_texts( Path("texts.txt"), expected_count=len(ciphertexts))
+	# Inputs the saved snapshot was built from; the incremental mode needs them unchanged.
+	inputs = input_fingerprint([task_path, mask3_path, mask4_path, "texts.txt"])
+	meta = {"task_path": str(task_path), "common_len": common_len, "inputs": inputs, "reports": {}}
+
+	session_args = dict(
+		ciphertexts=ciphertexts,
+		base_mask3_lines=base_mask3_lines,
+		base_mask4_lines=base_mask4_lines,
+		ref_texts=ref_texts,
+		state_path=state_path,
+		edited_plaintexts_path=edited_plaintexts_path,
+		plaintexts_path=plaintexts_path,
+		meta=meta,
+	)
+	output_args = dict(
+		state_path=state_path,
+		edited_plaintexts_path=edited_plaintexts_path,
+		plaintexts_path=plaintexts_path,
+		meta=meta,
+		journal=journal,
+	)
+	if incremental or watch:
+		session = _open_session(**session_args)
+		if session is not None:
+			_apply_edits(session, **output_args)
+			return watch and _watch_edits(session, interval=interval, **output_args)
+		print("Инкрементальный режим: нет снимка прошлого запуска или входные файлы изменились — полный пересчёт")
+
 	prev_plaintexts = try_restore_plaintexts_from_state(state_path)
 
 	# Key is stored in state.json and is updated incrementally from manual edits.
 	# This allows '_' changes to clear key bytes and concrete changes to overwrite them.
 	key: list[int | None]
-	if state_path.exists():
+	key_map = KeyMap(common_len)
+	if resolve_state_path(state_path).exists():
 		try:
 			state = load_state(state_path)
 			key_raw = state.get("key") or []
@@ -141,6 +325,7 @@ def go_main():
 				key.extend([None] * (common_len - len(key)))
 			else:
 				key = key[:common_len]
+			key_map = KeyMap.from_state(state, length=common_len)
 			print("Ключ загружен из state.json и будет обновлён по ручным правкам")
 		except Exception:
 			key = make_partial_key(common_len)
@@ -148,17 +333,15 @@ def go_main():
 	else:
 		key = make_partial_key(common_len)
 		print("state.json не найден — ключ начнётся пустым")
+	key_before = list(key)
 
-	edited_plaintexts_path = Path("plaintexts_guess copy.txt")
-	ref_texts = _load_reference_texts( Path("texts.txt"), expected_count=len(ciphertexts))
 	manual_stats = None
 	edited_plaintexts = None
 	edited_masks3 = None
 	edited_masks4 = None
 	if edited_plaintexts_path.exists():
 		try:
-			edited_plaintexts = parse_plaintexts(edited_plaintexts_path, expected_count=len(ciphertexts))
-			edited_masks3, edited_masks4 = parse_masks_two(
+			edited_plaintexts, edited_masks3, edited_masks4 = parse_plaintexts_and_masks(
 				edited_plaintexts_path,
 				expected_count=len(ciphertexts),
 			)
@@ -184,6 +367,7 @@ def go_main():
 	else:
 		print("Файл ручных правок не найден: plaintexts_guess copy.txt")
 
+	key_map.sync(key, source="manual")
 	guesses_from_key = apply_partial_key_to_all(ciphertexts, key, unknown_byte=ord("_"))
 
 	# Manual mask overrides are stored in the editable copy file. They must be
@@ -234,7 +418,7 @@ def go_main():
 			if star_stats.get("files"):
 				print(
 					"Сгенерированы варианты для '*' позиций:",
-					f"files={star_stats.get('files')} dir={star_stats.get('out_dir')}",
+					f"positions={star_stats.get('written_positions')} files={star_stats.get('files')} dir={star_stats.get('out_dir')}",
 				)
 		except Exception as exc:
 			print(f"Не удалось построить варианты для '*' позиций: {exc}")
@@ -250,33 +434,14 @@ def go_main():
 	manual_snapshot_for_state: list[str] = []
 	editable_plaintexts_bytes: list[bytes] | None = None
 	if edited_plaintexts is not None:
-		prev = prev_plaintexts or []
 		bufs = [bytearray(pt) for pt in guesses_from_key]
-		for pos in range(common_len):
-			winner_text = None
-			winner_ch = None
-			for text_index, _cipher in enumerate(ciphertexts):
-				if text_index >= len(edited_plaintexts):
-					break
-				new_text = edited_plaintexts[text_index]
-				if pos >= len(new_text):
-					continue
-				prev_text = prev[text_index] if text_index < len(prev) else ""
-				prev_ch = prev_text[pos] if pos < len(prev_text) else ""
-				new_ch = new_text[pos]
-				if prev_ch != new_ch:
-					winner_text = text_index
-					winner_ch = new_ch
-			if winner_text is None:
-				continue
-			if winner_ch in {"_", "*"}:
-				# Clear: key-derived guess already has '_' where key byte became None.
-				continue
-			plain_b = _manual_char_to_byte_with_unicode_apostrophe(winner_ch)
-			if plain_b is None:
-				continue
-			if winner_text < len(bufs) and pos < len(bufs[winner_text]):
-				bufs[winner_text][pos] = plain_b
+		overlay_manual_edits(
+			bufs,
+			manual_plaintexts=edited_plaintexts,
+			prev_plaintexts=prev_plaintexts,
+			positions=range(common_len),
+			char_to_byte=_manual_char_to_byte_with_unicode_apostrophe,
+		)
 		editable_plaintexts_bytes = [bytes(b) for b in bufs]
 		manual_snapshot_for_state = [b.decode("cp1251", errors="replace") for b in editable_plaintexts_bytes]
 	else:
@@ -292,11 +457,11 @@ def go_main():
 			common_len=common_len,
 			out_path= "manual_mismatch_report.txt",
 			char_to_byte=_manual_char_to_byte_with_unicode_apostrophe,
+			key_map=key_map,
 		)
 		if mismatch_count:
 			print(f"Несовпадения manual vs key: {mismatch_count} (см. {report_path})")
 
-	plaintexts_path = "plaintexts_guess.txt"
 	write_plaintexts_file(
 		plaintexts_path,
 		guessed_plaintexts,
@@ -330,20 +495,40 @@ def go_main():
 				reference_texts=ref_texts,
 			)
 
-	save_state(
+	if journal is not None:
+		journal.record(key_before, key, source="manual")
+	saved_path = save_state(
 		state_path,
 		ciphertexts=ciphertexts,
 		key=key,
 		plaintexts=guessed_plaintexts,
 		manual_plaintexts=manual_snapshot_for_state,
-		meta={
-			"task_path": str(task_path),
-			"common_len": common_len,
-			"manual_edits": manual_stats or {},
-			"reports": {},
-		},
+		meta={**meta, "manual_edits": manual_stats or {}},
+		key_map=key_map,
 	)
-	print(f"Состояние сохранено в: {state_path}")
+	print(f"Состояние сохранено в: {saved_path}")
+
+	if not watch:
+		return False
+	session = _open_session(**session_args)
+	if session is None:
+		print("Не удалось открыть снимок для слежения")
+		return False
+	return _watch_edits(session, interval=interval, **output_args)
 
 if __name__ == "__main__":
-	go_main()
\ No newline at end of file
+	parser = argparse.ArgumentParser(description="K3: apply manual edits from 'plaintexts_guess copy.txt'.")
+	parser.add_argument(
+		"--incremental",
+		action="store_true",
+		help="recompute only the columns changed since the last run (falls back to a full run)",
+	)
+	parser.add_argument(
+		"--watch",
+		action="store_true",
+		help="stay resident and apply every save of the editable copy incrementally",
+	)
+	parser.add_argument("--interval", type=float, default=20, help="watch polling interval, ms (default: 20)")
+	args = parser.parse_args()
+	while go_main(incremental=args.incremental, watch=args.watch, interval=args.interval / 1000):
+		print("Входные файлы изменились — перезапуск")
\ No newline at end of file
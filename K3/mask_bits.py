@@ -0,0 +1,114 @@
+"""Bit-packed class masks: one uint8 code per mask cell.
+
+Mask lines are written as text ("#<>_|&?0-9A-F"), but merging, overriding and
+class lookups work on uint8 arrays, one per ciphertext, so they are numpy
+operations instead of per-character loops. Text is only rendered when a line
+is written or handed to code that still expects strings.
+
+Codes (every cell holds exactly one symbol, so encoding is lossless):
+
+	0x00        '_'   free
+	0x01        '#'   class flag: punctuation / space
+	0x02        '<'   class flag: lowercase (mask4) / letter (mask3)
+	0x04        '>'   class flag: uppercase (mask4) / letter (mask3)
+	0x08        '&'   all ciphertext bytes equal
+	0x10        '|'   forced equal to another text
+	0x20        '?'   unknown xor id
+	0x40 + id   '0'..'F' xor-triplet id (see xor_index)
+
+A cell is a class constraint when only class bits are set; the class bits use
+the same order as the star-option classes (' ', 'a', 'A'), so for mask4 they
+are directly the allowed classes.
+"""
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+
+
+FREE = 0x00
+PUNCT = 0x01
+LOWER = 0x02
+UPPER = 0x04
+CLASS_BITS = PUNCT | LOWER | UPPER
+_NON_CLASS_BITS = 0xFF & ~CLASS_BITS
+EQUAL = 0x08
+LINKED = 0x10
+UNKNOWN_ID = 0x20
+XOR_ID = 0x40
+
+_SYMBOLS = {"_": FREE, "#": PUNCT, "<": LOWER, ">": UPPER, "&": EQUAL, "|": LINKED, "?": UNKNOWN_ID}
+_SYMBOLS.update({digit: XOR_ID + value for value, digit in enumerate("0123456789ABCDEF")})
+
+# ASCII code point -> code, -1 for characters that are not mask symbols (encoded as FREE).
+_ENCODE = np.full(128, -1, dtype=np.int16)
+for _symbol, _code in _SYMBOLS.items():
+	_ENCODE[ord(_symbol)] = _code
+	# Mask lines are parsed case-insensitively; ids are rendered upper case.
+	_ENCODE[ord(_symbol.lower())] = _code
+
+_RENDER = np.full(256, ord("?"), dtype=np.uint8)
+for _symbol, _code in _SYMBOLS.items():
+	_RENDER[_code] = ord(_symbol)
+
+# mask3 has no case: either letter symbol allows both letter classes.
+_MASK3_ALLOWED = np.array([0, PUNCT, LOWER | UPPER, 0, LOWER | UPPER, 0, 0, 0], dtype=np.uint8)
+
+
+def encode_mask(line: str) -> np.ndarray:
+	"""Mask text -> uint8 codes; characters that are not mask symbols are free cells."""
+	points = np.frombuffer(line.encode("utf-32-le"), dtype="<u4")
+	codes = np.where(points < 128, _ENCODE[np.minimum(points, 127)], -1)
+	# Stray characters (e.g. left over from a header line) never constrained anything.
+	return np.where(codes < 0, FREE, codes).astype(np.uint8)
+
+
+def render_mask(codes: np.ndarray) -> str:
+	return _RENDER[codes].tobytes().decode("ascii")
+
+
+def encode_masks(lines: Sequence[str]) -> list[np.ndarray]:
+	return [encode_mask(line) for line in lines]
+
+
+def render_masks(masks: Sequence[np.ndarray]) -> list[str]:
+	return [render_mask(codes) for codes in masks]
+
+
+def is_class(codes: np.ndarray) -> np.ndarray:
+	"""True where the cell is a class constraint ('#', '<', '>')."""
+	return (codes != FREE) & ((codes & _NON_CLASS_BITS) == 0)
+
+
+def _padded(codes: np.ndarray, length: int) -> np.ndarray:
+	if len(codes) >= length:
+		return codes[:length]
+	return np.concatenate([codes, np.full(length - len(codes), FREE, dtype=np.uint8)])
+
+
+def merge_constraints(mask3: np.ndarray, mask4: np.ndarray) -> np.ndarray:
+	"""Class constraint per cell: the mask4 symbol if it is a class, else the mask3 one, else free."""
+	length = max(len(mask3), len(mask4))
+	m3, m4 = _padded(mask3, length), _padded(mask4, length)
+	return np.where(is_class(m4), m4, np.where(is_class(m3), m3, FREE)).astype(np.uint8)
+
+
+def override_classes(base: np.ndarray, manual: np.ndarray) -> np.ndarray:
+	"""Copy of base with the manual class symbols laid over it (within both lengths)."""
+	out = base.copy()
+	limit = min(len(base), len(manual))
+	hit = is_class(manual[:limit])
+	out[:limit][hit] = manual[:limit][hit]
+	return out
+
+
+def allowed_classes(mask3: np.ndarray, mask4: np.ndarray, length: int) -> np.ndarray:
+	"""Allowed class bits (PUNCT/LOWER/UPPER) per position from a mask3/mask4 pair.
+
+	A mask4 class wins; a mask3 class narrows to punctuation or letters;
+	anything else allows all three classes.
+	"""
+	m3, m4 = _padded(mask3, length), _padded(mask4, length)
+	from_mask3 = np.where(is_class(m3), _MASK3_ALLOWED[m3 & CLASS_BITS], CLASS_BITS)
+	return np.where(is_class(m4), m4 & CLASS_BITS, from_mask3).astype(np.uint8)
@@ -0,0 +1,250 @@
+"""N-ciphertext class-mask engine for a reused one-time pad.
+
+With a shared key byte k, the class of every plaintext byte is
+top(p_i) = top(c_i) ^ top(k), so all pairwise class constraints at a position
+reduce to one unknown: the top bits of the key. Instead of enumerating
+(n choose 2) pairwise XOR maps, each position keeps a bitset of key-top values
+that are still possible; every ciphertext contributes one AND against a small
+lookup table. All passes are numpy operations over an (N, length) array, so
+the work grows linearly with N * length.
+
+Class models (top bits of the plaintext byte):
+	mask3: 2 bits, 0 = punctuation/space, 1 = letter
+	mask4: 3 bits, 1 = punctuation/space, 2 = uppercase, 3 = lowercase
+
+Both models only use classes whose highest top bit is 0, so texts whose
+ciphertext high bit differs cannot be explained together; they fall into
+separate groups (the pairs between groups are "invalid" in help_methods terms).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Iterator, Sequence
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class ClassModel:
+	bits: int
+	allowed: frozenset[int]
+	symbols: dict[int, str] = field(hash=False)
+
+	@property
+	def low_values(self) -> int:
+		"""Number of key-top values left once the high bit is fixed by the group."""
+		return 1 << (self.bits - 1)
+
+	def allowed_key_bits(self) -> np.ndarray:
+		"""LUT: low top bits of a ciphertext -> bitset of key low bits giving an allowed class."""
+		table = np.zeros(self.low_values, dtype=np.uint8)
+		for low in range(self.low_values):
+			for t in range(self.low_values):
+				if low ^ t in self.allowed:
+					table[low] |= 1 << t
+		return table
+
+
+MODELS = {
+	"mask3": ClassModel(2, frozenset({0, 1}), {0: "#", 1: "<"}),
+	"mask4": ClassModel(3, frozenset({1, 2, 3}), {1: "#", 2: ">", 3: "<"}),
+}
+
+_POPCOUNT = np.array([bin(v).count("1") for v in range(256)], dtype=np.uint8)
+# Index of the single set bit (only meaningful where popcount == 1).
+_LOWEST_BIT = np.array([(v & -v).bit_length() - 1 if v else 0 for v in range(256)], dtype=np.int8)
+
+
+def stack_ciphertexts(ciphertexts: Sequence[bytes]) -> tuple[np.ndarray, np.ndarray]:
+	"""(N, maxlen) uint8 rows padded with zeros and the matching presence mask."""
+	n = len(ciphertexts)
+	maxlen = max((len(c) for c in ciphertexts), default=0)
+	rows = np.zeros((n, maxlen), dtype=np.uint8)
+	present = np.zeros((n, maxlen), dtype=bool)
+	for i, c in enumerate(ciphertexts):
+		rows[i, :len(c)] = np.frombuffer(bytes(c), dtype=np.uint8)
+		present[i, :len(c)] = True
+	return rows, present
+
+
+def all_equal_positions(rows: np.ndarray, present: np.ndarray) -> np.ndarray:
+	"""True where every present ciphertext has the same byte."""
+	if not len(rows):
+		return np.zeros(0, dtype=bool)
+	lo = np.where(present, rows, 255).min(axis=0)
+	hi = np.where(present, rows, 0).max(axis=0)
+	return present.any(axis=0) & (lo == hi)
+
+
+def equal_byte_marks(rows: np.ndarray, present: np.ndarray) -> np.ndarray:
+	"""(N, L) True where the byte of text i equals the byte of another present text."""
+	n = len(rows)
+	if n < 2:
+		return np.zeros(rows.shape, dtype=bool)
+	# Absent cells get unique values above 255 so they never match anything.
+	values = np.where(present, rows.astype(np.int16), 256 + np.arange(n, dtype=np.int16)[:, None])
+	order = np.argsort(values, axis=0, kind="stable")
+	ordered = np.take_along_axis(values, order, axis=0)
+	dup = np.zeros(ordered.shape, dtype=bool)
+	same = ordered[1:] == ordered[:-1]
+	dup[1:] |= same
+	dup[:-1] |= same
+	marks = np.zeros(rows.shape, dtype=bool)
+	np.put_along_axis(marks, order, dup, axis=0)
+	return marks
+
+
+def _split_top_bits(rows: np.ndarray, model: ClassModel) -> tuple[np.ndarray, np.ndarray]:
+	top = rows >> (8 - model.bits)
+	high = top >> (model.bits - 1)
+	low = top & (model.low_values - 1)
+	return high, low
+
+
+def _group_key_bits(
+	low: np.ndarray,
+	members: np.ndarray,
+	model: ClassModel,
+	fixed: np.ndarray | None,
+) -> np.ndarray:
+	"""Bitset (per position) of key low bits consistent with every member text."""
+	full = (1 << model.low_values) - 1
+	candidates = np.where(members, model.allowed_key_bits()[low], full).astype(np.uint8)
+	if fixed is not None:
+		has_fixed = members & (fixed >= 0)
+		fixed_low = (low ^ np.where(has_fixed, fixed, 0)).astype(np.uint8)
+		candidates &= np.where(has_fixed, np.left_shift(1, fixed_low, dtype=np.uint8), full).astype(np.uint8)
+	return np.bitwise_and.reduce(candidates, axis=0)
+
+
+def _classes_from_bits(low: np.ndarray, key_bits: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+	"""Per text class (low ^ t) where key_bits holds exactly one t, and that unique mask."""
+	unique = _POPCOUNT[key_bits] == 1
+	t = _LOWEST_BIT[key_bits]
+	return (low ^ t).astype(np.int8), unique
+
+
+def _low_bit_duplicates(low: np.ndarray, members: np.ndarray, model: ClassModel) -> np.ndarray:
+	"""(N, L) True where another member text has the same low top bits (forced equal class)."""
+	dup = np.zeros(low.shape, dtype=bool)
+	for value in range(model.low_values):
+		hit = members & (low == value)
+		dup |= hit & (hit.sum(axis=0) >= 2)
+	return dup
+
+
+def class_mask_lines(
+	ciphertexts: Sequence[bytes],
+	*,
+	variant: str = "mask4",
+	equal_marks: str = "all",
+) -> list[str]:
+	"""Class mask lines for any number of ciphertexts.
+
+	Symbols follow help_methods.compute_mask(): a class symbol when the class is
+	forced, '|' when it is only forced equal to another text, '_' otherwise.
+	equal_marks="all" writes '&' where all present bytes are equal (compute_mask),
+	"pairs" writes '&' for every text whose byte equals another one (build_mask*).
+	"""
+	model = MODELS[variant]
+	rows, present = stack_ciphertexts(ciphertexts)
+	if not rows.size:
+		return ["" for _ in ciphertexts]
+	high, low = _split_top_bits(rows, model)
+
+	# A text whose high bit differs from any other present text has an invalid pair,
+	# and then so do all the others: the position stays unclassified.
+	any_high = (present & (high == 1)).any(axis=0)
+	any_low = (present & (high == 0)).any(axis=0)
+	consistent = ~(any_high & any_low)
+	group_size = present.sum(axis=0)
+
+	key_bits = _group_key_bits(low, present, model, None)
+	classes, unique = _classes_from_bits(low, key_bits)
+	solvable = consistent & (group_size >= 2) & (key_bits != 0)
+
+	out = np.full(rows.shape, ord("_"), dtype=np.uint8)
+	for cls, sym in model.symbols.items():
+		out[present & solvable & unique & (classes == cls)] = ord(sym)
+	forced_equal = present & solvable & ~unique & _low_bit_duplicates(low, present, model)
+	out[forced_equal] = ord("|")
+
+	if equal_marks == "all":
+		out[:, all_equal_positions(rows, present)] = ord("&")
+	elif equal_marks == "pairs":
+		out[equal_byte_marks(rows, present)] = ord("&")
+	else:
+		raise ValueError(f"Unknown equal_marks: {equal_marks!r}")
+
+	return [out[i, :len(c)].tobytes().decode("ascii") for i, c in enumerate(ciphertexts)]
+
+
+def forced_classes(
+	ciphertexts: Sequence[bytes],
+	*,
+	variant: str,
+	fixed: np.ndarray | None = None,
+) -> np.ndarray:
+	"""(N, maxlen) forced class per text and position, -1 where not forced.
+
+	fixed is an (N, maxlen) int array of manual classes (-1 = free). Texts are
+	grouped by their ciphertext high bit and each group is solved on its own,
+	as refine_mask_lines_with_manual_constraints() does with its components.
+	Nothing is forced where no two texts can be linked.
+	"""
+	model = MODELS[variant]
+	rows, present = stack_ciphertexts(ciphertexts)
+	forced = np.full(rows.shape, -1, dtype=np.int8)
+	if not rows.size:
+		return forced
+	high, low = _split_top_bits(rows, model)
+
+	group_sizes = []
+	for group in (0, 1):
+		members = present & (high == group)
+		key_bits = _group_key_bits(low, members, model, fixed)
+		classes, unique = _classes_from_bits(low, key_bits)
+		hit = members & unique
+		forced[hit] = classes[hit]
+		group_sizes.append(members.sum(axis=0))
+
+	linked = (group_sizes[0] >= 2) | (group_sizes[1] >= 2)
+	forced[:, ~linked] = -1
+	return forced
+
+
+def iter_consistent_columns(
+	columns: np.ndarray,
+	allowed: np.ndarray,
+	pools: np.ndarray,
+	first_rank: np.ndarray | None = None,
+	*,
+	chunk_size: int = 4096,
+) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+	"""Plaintext columns sharing one key byte, for many positions at once.
+
+	columns is (P, N): the ciphertext bytes of N texts at P positions.
+	allowed is (P, N): an index into pools, a (M, 256) bool table of allowed
+	plaintext bytes (one row per allowed-class combination).
+	Every position tries all 256 key bytes in one broadcast; a key survives when
+	each text decrypts to an allowed byte.
+
+	Yields (counts, rows) per chunk of positions. counts[p] is the number of
+	columns found for position p, and rows (sum(counts), N) lists them position
+	by position. Within one position rows follow first_rank[text-0 byte]
+	(default: text-0 byte order).
+	"""
+	keys = np.arange(256, dtype=np.uint8)
+	for start in range(0, len(columns), chunk_size):
+		block = columns[start:start + chunk_size]
+		plain = block[:, :, None] ^ keys  # (P, N, 256)
+		ok = np.take_along_axis(pools[allowed[start:start + chunk_size]], plain, axis=2).all(axis=1)
+		if first_rank is not None:
+			order = np.argsort(first_rank[plain[:, 0, :]], axis=1, kind="stable")
+		else:
+			# p0 = c0 ^ k, so sorting by the text-0 byte is just a key permutation.
+			order = block[:, 0, None] ^ keys
+		ok = np.take_along_axis(ok, order, axis=1)
+		plain = np.take_along_axis(plain, order[:, None, :], axis=2)
+		pos_idx, key_idx = np.nonzero(ok)
+		yield ok.sum(axis=1), plain[pos_idx, :, key_idx]
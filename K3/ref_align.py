@@ -0,0 +1,427 @@
+"""Reference-text alignment for K3: find where the source texts fit the ciphertexts and fill the key.
+
+text1.txt .. text3.txt (and texts.txt) are near copies of the plaintexts. If a
+piece R[r:r+m] of a reference lies under text t at position j, the key there is
+c_t ^ R, and that key decrypts every other text too.
+
+Search: the references are indexed once by the hashes of their k-grams
+(ReferenceIndex: a sorted uint64 array, cached as .npz next to the task), so a
+k-gram lookup is a binary search, not a scan of the corpus. Every window of k
+known plaintext bytes of every text (under the known key bytes) is looked up; a
+hit gives a diagonal (text, reference position - text position).
+
+Verification: along a diagonal all positions are checked at once. Known key
+bytes must give the reference byte (after folding the quotes and dashes the
+references spell typographically), unknown ones must decrypt every text to a
+plausible byte of a class its masks allow (xor_index.PLAIN_CLASSES,
+mask_bits). The run of checked positions around a hit is a segment; its unknown
+key bytes are proposed, except for the last `trim` bytes of an end that no known
+byte confirms (an insertion in the reference would go unnoticed there) and for
+folded quote/dash bytes, whose exact spelling is unknown. Proposals of all
+segments are merged by weight (the verified bytes of their segments), so texts
+that agree reinforce each other and disagreements are reported as conflicts.
+
+At least a few known key bytes per region are needed to anchor a reference
+(main.py edits, crib_engine or auto_solver provide them).
+
+	python ref_align.py                              # text1..3.txt against state.bin, report only
+	python ref_align.py --refs big_corpus.txt --apply
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from help_methods import (
+	commit_key,
+	load_ciphertexts,
+	load_state,
+	parse_masks_two,
+)
+from auto_solver import DEFAULT_TASK_PATH, mask_class_bits
+from edit_session import input_fingerprint
+from key_map import KeyMap
+from pad_engine import stack_ciphertexts
+from state_store import resolve_state_path
+from xor_index import PLAIN_CLASSES
+
+
+# Bytes compared up to spelling: typographic quotes and dashes fold to ASCII.
+FOLD = np.arange(256, dtype=np.uint8)
+for _chars, _ascii in (("‘’", "'"), ("“”«»„", '"'), ("–—", "-")):
+	FOLD[list(_chars.encode("cp1251"))] = ord(_ascii)
+# Reference bytes that do not tell which byte of their fold class the plaintext has.
+AMBIGUOUS = np.bincount(FOLD, minlength=256)[FOLD] > 1
+
+_HASH_MULT = np.uint64(0x9E3779B97F4A7C15)
+
+
+def normalize_reference(text: str) -> bytes:
+	"""Reference text as plaintext bytes: whitespace runs (line breaks) become one space, cp1251."""
+	return re.sub(r"\s+", " ", text).strip().encode("cp1251", errors="replace")
+
+
+def kgram_hashes(data: np.ndarray, k: int, *, chunk: int = 1 << 20) -> np.ndarray:
+	"""(len - k + 1,) uint64 polynomial hashes of the folded k-grams of data (uint8)."""
+	if len(data) < k:
+		return np.zeros(0, dtype=np.uint64)
+	powers = np.full(k, _HASH_MULT, dtype=np.uint64) ** np.arange(k - 1, -1, -1, dtype=np.uint64)
+	windows = sliding_window_view(FOLD[data], k)
+	out = np.empty(len(windows), dtype=np.uint64)
+	for start in range(0, len(windows), chunk):
+		part = windows[start:start + chunk].astype(np.uint64)
+		# uint64 arithmetic wraps, which is the modulus of the hash.
+		out[start:start + chunk] = (part * powers).sum(axis=1, dtype=np.uint64)
+	return out
+
+
+class ReferenceIndex:
+	"""Concatenated reference bytes plus their k-gram hashes, sorted for binary search."""
+
+	def __init__(
+		self,
+		*,
+		data: np.ndarray,
+		starts: np.ndarray,
+		names: Sequence[str],
+		k: int,
+		hashes: np.ndarray,
+		positions: np.ndarray,
+	) -> None:
+		self.data = data
+		self.starts = starts  # (D + 1,) document boundaries in data
+		self.names = list(names)
+		self.k = k
+		self.hashes = hashes
+		self.positions = positions
+
+	@classmethod
+	def build(cls, documents: Sequence[tuple[str, bytes]], *, k: int = 16, max_occurrences: int = 4) -> "ReferenceIndex":
+		"""Index (name, bytes) documents; k-grams seen more than max_occurrences times are left out."""
+		data = np.frombuffer(b"".join(doc for _name, doc in documents), dtype=np.uint8)
+		starts = np.cumsum([0] + [len(doc) for _name, doc in documents])
+		hashes = kgram_hashes(data, k)
+		positions = np.arange(len(hashes), dtype=np.int64)
+		# k-grams that cross a document boundary are not text.
+		doc = np.searchsorted(starts, positions, side="right") - 1
+		inside = positions + k <= starts[doc + 1]
+		hashes, positions = hashes[inside], positions[inside]
+		order = np.argsort(hashes, kind="stable")
+		hashes, positions = hashes[order], positions[order]
+		if max_occurrences > 0 and len(hashes):
+			first = np.concatenate([[True], hashes[1:] != hashes[:-1]])
+			group = np.cumsum(first) - 1
+			keep = np.bincount(group)[group] <= max_occurrences
+			hashes, positions = hashes[keep], positions[keep]
+		return cls(
+			data=data,
+			starts=starts,
+			names=[name for name, _doc in documents],
+			k=k,
+			hashes=hashes,
+			positions=positions,
+		)
+
+	@classmethod
+	def from_files(
+		cls,
+		paths: Sequence[str | Path],
+		*,
+		k: int = 16,
+		max_occurrences: int = 4,
+		cache: Optional[str | Path] = None,
+	) -> "ReferenceIndex":
+		"""Index of text files (utf-8), reused from `cache` while the files and settings are unchanged."""
+		stamp = json.dumps({"files": input_fingerprint(paths), "k": k, "max_occurrences": max_occurrences})
+		if cache is not None and Path(cache).exists():
+			with np.load(cache, allow_pickle=False) as stored:
+				if str(stored["stamp"]) == stamp:
+					return cls(
+						data=stored["data"],
+						starts=stored["starts"],
+						names=[str(n) for n in stored["names"]],
+						k=int(stored["k"]),
+						hashes=stored["hashes"],
+						positions=stored["positions"],
+					)
+		documents = [
+			(str(path), normalize_reference(Path(path).read_text(encoding="utf-8", errors="replace"))) for path in paths
+		]
+		index = cls.build(documents, k=k, max_occurrences=max_occurrences)
+		if cache is not None:
+			with open(cache, "wb") as file:
+				np.savez(
+					file,
+					stamp=np.array(stamp),
+					data=index.data,
+					starts=index.starts,
+					names=np.array(index.names),
+					k=np.array(index.k),
+					hashes=index.hashes,
+					positions=index.positions,
+				)
+		return index
+
+	def lookup(self, hashes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+		"""(query index, reference position) for every indexed occurrence of each query hash."""
+		left = np.searchsorted(self.hashes, hashes, side="left")
+		right = np.searchsorted(self.hashes, hashes, side="right")
+		counts = right - left
+		queries = np.repeat(np.arange(len(hashes)), counts)
+		offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+		return queries, self.positions[np.repeat(left, counts) + offsets]
+
+	def document(self, position: int) -> int:
+		return int(np.searchsorted(self.starts, position, side="right") - 1)
+
+
+def _anchor_hits(folded: np.ndarray, known: np.ndarray, index: ReferenceIndex) -> tuple[np.ndarray, np.ndarray]:
+	"""(text position, reference position) of the indexed k-grams among the fully known windows of one text."""
+	k = index.k
+	if len(folded) < k:
+		return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+	run = np.concatenate([[0], np.cumsum(known)])
+	starts = np.flatnonzero(run[k:] - run[:-k] == k)
+	hashes = kgram_hashes(folded, k)[starts]
+	queries, ref_pos = index.lookup(hashes)
+	return starts[queries], ref_pos
+
+
+def _diagonal_segments(
+	*,
+	text: int,
+	diagonal: int,
+	anchors: np.ndarray,
+	rows: np.ndarray,
+	folded: np.ndarray,
+	known: np.ndarray,
+	allowed: np.ndarray,
+	index: ReferenceIndex,
+	trim: int,
+) -> list[dict]:
+	"""Checked runs around the anchors of one (text, diagonal); each with its proposed key bytes."""
+	doc = index.document(int(anchors[0]) + diagonal)
+	doc_start, doc_stop = int(index.starts[doc]), int(index.starts[doc + 1])
+	lo, hi = max(0, doc_start - diagonal), min(rows.shape[1], doc_stop - diagonal)
+	anchors = anchors[(anchors >= lo) & (anchors + index.k <= hi)]
+	if not len(anchors):
+		return []
+	ref = index.data[lo + diagonal:hi + diagonal]
+	known_here = known[lo:hi]
+	implied = rows[text, lo:hi] ^ ref
+	plausible = ((PLAIN_CLASSES[rows[:, lo:hi] ^ implied] & allowed[:, lo:hi]) != 0).all(axis=0)
+	ok = np.where(known_here, folded[text, lo:hi] == FOLD[ref], plausible)
+	bad = np.flatnonzero(~ok)
+
+	rel = np.unique(anchors - lo)
+	rel = rel[[bool(ok[a:a + index.k].all()) for a in rel.tolist()]]
+	after = np.searchsorted(bad, rel)
+	lefts = np.where(after > 0, bad[np.maximum(after - 1, 0)] + 1, 0) if len(bad) else np.zeros_like(rel)
+	rights = np.where(after < len(bad), bad[np.minimum(after, len(bad) - 1)], hi - lo) if len(bad) else np.full_like(rel, hi - lo)
+
+	segments: list[dict] = []
+	for left, right in sorted(set(zip(lefts.tolist(), rights.tolist()))):
+		verified = np.flatnonzero(known_here[left:right]) + left
+		first, last = int(verified[0]), int(verified[-1])
+		# Ends that no known byte confirms: keep all but `trim` bytes of them.
+		left = min(first, left + trim)
+		right = max(last + 1, right - trim)
+		unknown = np.flatnonzero(~known_here[left:right]) + left
+		new = unknown[~AMBIGUOUS[ref[unknown]]]
+		segments.append(
+			{
+				"text": text,
+				"start": lo + left,
+				"stop": lo + right,
+				"reference": index.names[doc],
+				"ref_offset": lo + left + diagonal - doc_start,
+				"verified": len(verified),
+				"positions": new + lo,
+				"key_bytes": implied[new].astype(np.int16),
+				"ambiguous": unknown[AMBIGUOUS[ref[unknown]]] + lo,
+			}
+		)
+	return segments
+
+
+def align_references(
+	ciphertexts: Sequence[bytes],
+	index: ReferenceIndex,
+	*,
+	key: np.ndarray,
+	allowed: np.ndarray,
+	min_hits: int = 2,
+	trim: int = 8,
+) -> dict:
+	"""Align the indexed references with the texts under `key` ((L,) int, -1 unknown).
+
+	allowed is the (N, L) mask class bits. Returns the merged proposal "key"
+	((L,) int16, -1 where nothing is proposed), the "segments" (text, start,
+	stop, reference, ref_offset, verified, positions, key_bytes), the
+	"conflicts" (positions where segments disagreed), "ambiguous" (folded
+	quote/dash bytes left out) and the per-text/per-reference "coverage".
+	"""
+	length = len(key)
+	rows, _present = stack_ciphertexts(ciphertexts)
+	rows = np.ascontiguousarray(rows[:, :length])
+	known = key >= 0
+	folded = FOLD[rows ^ np.where(known, key, 0).astype(np.uint8)]
+
+	segments: list[dict] = []
+	for text in range(len(rows)):
+		positions, ref_pos = _anchor_hits(folded[text], known, index)
+		diagonals, inverse, counts = np.unique(ref_pos - positions, return_inverse=True, return_counts=True)
+		for d in np.flatnonzero(counts >= min_hits).tolist():
+			segments.extend(
+				_diagonal_segments(
+					text=text,
+					diagonal=int(diagonals[d]),
+					anchors=positions[inverse.reshape(-1) == d],
+					rows=rows,
+					folded=folded,
+					known=known,
+					allowed=allowed,
+					index=index,
+					trim=trim,
+				)
+			)
+
+	proposal = np.full(length, -1, dtype=np.int16)
+	conflicts = np.zeros(0, dtype=np.int64)
+	if segments:
+		pos = np.concatenate([s["positions"] for s in segments])
+		val = np.concatenate([s["key_bytes"] for s in segments]).astype(np.int64)
+		weight = np.concatenate([np.full(len(s["positions"]), s["verified"], dtype=np.float64) for s in segments])
+		# Total weight of each (position, byte); the heaviest byte of a position wins.
+		pairs, inverse = np.unique(pos * 256 + val, return_inverse=True)
+		totals = np.bincount(inverse.reshape(-1), weights=weight)
+		pair_pos, pair_val = np.divmod(pairs, 256)
+		order = np.lexsort((-totals, pair_pos))
+		# Segments over a fully known key carry no positions, so `order` may be empty.
+		first = np.ones(len(order), dtype=bool)
+		first[1:] = pair_pos[order][1:] != pair_pos[order][:-1]
+		proposal[pair_pos[order][first]] = pair_val[order][first]
+		conflicts = np.unique(pair_pos[order][~first])
+
+	covered = np.zeros(rows.shape, dtype=bool)
+	ref_covered = np.zeros(len(index.data), dtype=bool)
+	doc_starts = {name: int(start) for name, start in zip(index.names, index.starts)}
+	for s in segments:
+		covered[s["text"], s["start"]:s["stop"]] = True
+		ref_start = doc_starts[s["reference"]] + s["ref_offset"]
+		ref_covered[ref_start:ref_start + s["stop"] - s["start"]] = True
+	ambiguous = 0
+	if segments:
+		# Folded bytes that no other segment resolved.
+		skipped = np.unique(np.concatenate([s["ambiguous"] for s in segments]))
+		ambiguous = int((proposal[skipped] < 0).sum())
+	return {
+		"key": proposal,
+		"segments": segments,
+		"conflicts": conflicts,
+		"ambiguous": ambiguous,
+		"coverage": {
+			"texts": covered.mean(axis=1).tolist(),
+			"references": {
+				name: float(ref_covered[index.starts[i]:index.starts[i + 1]].mean()) if index.starts[i + 1] > index.starts[i] else 0.0
+				for i, name in enumerate(index.names)
+			},
+		},
+	}
+
+
+def write_alignment_report(result: dict, *, key: np.ndarray, out_path: str | Path, max_rows: int = 500) -> Path:
+	path = Path(out_path)
+	segments = sorted(result["segments"], key=lambda s: (s["text"], s["start"]))
+	proposal = result["key"]
+	lines = ["Reference alignment report (reference texts vs known key)"]
+	lines.append(
+		f"key known={int((key >= 0).sum())}/{len(key)} proposed={int((proposal >= 0).sum())}"
+		f" conflicts={len(result['conflicts'])} ambiguous={result['ambiguous']}"
+	)
+	for i, share in enumerate(result["coverage"]["texts"], start=1):
+		lines.append(f"text {i}: covered {share:.1%}")
+	for name, share in result["coverage"]["references"].items():
+		lines.append(f"{name}: used {share:.1%}")
+	lines.append("")
+	lines.append(f"Segments: {len(segments)}")
+	for s in segments[:max_rows]:
+		lines.append(
+			f"text={s['text'] + 1} pos={s['start']:>5}..{s['stop']:<5} {s['reference']}@{s['ref_offset']}"
+			f" verified={s['verified']} new={len(s['positions'])}"
+		)
+	if len(segments) > max_rows:
+		lines.append("...")
+	if len(result["conflicts"]):
+		lines.append("")
+		lines.append(f"Conflicts: {len(result['conflicts'])}")
+		lines.append(" ".join(str(p) for p in result["conflicts"][:max_rows].tolist()))
+	path.write_text("\n".join(lines).rstrip() + "\n", encoding="utf-8")
+	return path
+
+
+def _default_references() -> list[str]:
+	numbered = [p for p in (f"text{i}.txt" for i in range(1, 10)) if Path(p).exists()]
+	return numbered or ["texts.txt"]
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Align reference texts with the K3 ciphertexts and fill the key from them.")
+	parser.add_argument("--task", default=DEFAULT_TASK_PATH)
+	parser.add_argument("--state", default="state.json")
+	parser.add_argument("--masks-from", default="plaintexts_guess.txt", help="file with mask3/mask4 lines (written by main.py)")
+	parser.add_argument("--refs", nargs="*", default=None, help="reference text files (utf-8); default: text1.txt.. or texts.txt")
+	parser.add_argument("--k", type=int, default=16, help="k-gram length used for the lookup")
+	parser.add_argument("--min-hits", type=int, default=2, help="k-gram hits a diagonal needs")
+	parser.add_argument("--trim", type=int, default=8, help="unconfirmed bytes dropped at each segment end")
+	parser.add_argument("--index", default="reference_index.npz", help="index cache ('' to disable)")
+	parser.add_argument("--report", default="reference_alignment_report.txt")
+	parser.add_argument("--apply", action="store_true", help="write the proposed key bytes into the state")
+	parser.add_argument("--journal", default="key_journal.bin", help="key journal to record --apply in (see key_journal.py)")
+	args = parser.parse_args()
+
+	ciphertexts = load_ciphertexts(args.task)
+	length = min(len(c) for c in ciphertexts)
+	state = load_state(args.state) if resolve_state_path(args.state).exists() else None
+	key_map = KeyMap.from_state(state, length=length) if state is not None else KeyMap(length)
+	mask3_lines: list[str] = []
+	mask4_lines: list[str] = []
+	if Path(args.masks_from).exists():
+		mask3_lines, mask4_lines = parse_masks_two(args.masks_from, expected_count=len(ciphertexts))
+	allowed = np.ascontiguousarray(mask_class_bits(mask3_lines, mask4_lines, len(ciphertexts), length).T)
+
+	refs = args.refs or _default_references()
+	index = ReferenceIndex.from_files(refs, k=args.k, cache=args.index or None)
+	print(f"Индекс: {len(index.names)} файлов, {len(index.data)} байт, {len(index.hashes)} k-грамм (k={index.k})")
+	result = align_references(
+		ciphertexts,
+		index,
+		key=key_map.key,
+		allowed=allowed,
+		min_hits=args.min_hits,
+		trim=args.trim,
+	)
+	report = write_alignment_report(result, key=key_map.key, out_path=args.report)
+	coverage = " ".join(f"text{i}={share:.1%}" for i, share in enumerate(result["coverage"]["texts"], start=1))
+	print(
+		f"Сегментов: {len(result['segments'])}; покрытие {coverage}; новых байт ключа: {int((result['key'] >= 0).sum())}"
+		f" (конфликтов {len(result['conflicts'])}, неоднозначных {result['ambiguous']}); отчёт: {report}"
+	)
+
+	if args.apply:
+		if state is None:
+			raise SystemExit(f"{args.state}: no state to update, run main.py first")
+		old_key = key_map.to_list()
+		taken, _kept = key_map.propose(result["key"], source="reference")
+		saved = commit_key(args.state, state, ciphertexts, key_map, old_key, source="reference", journal_path=args.journal)
+		print(f"Записано байт ключа: {len(taken)} в {saved}; запустите main.py, чтобы обновить plaintexts_guess*.txt")
+
+
+if __name__ == "__main__":
+	main()
@@ -6,12 +6,15 @@ import subprocess
 import sys
 from pathlib import Path
 
+from crib_engine import drag_cribs, load_cribs
 from help_methods import (
-	crib_drag,
 	generate_crib_drag_report,
+	keyed_crib_hits,
 	load_ciphertexts,
-	parse_masks_two,
-	parse_plaintexts,
+	load_state,
+	parse_plaintexts_and_masks,
+	resolve_state_path,
+	write_keyed_crib_drag_report,
 	write_plaintexts_file,
 	xor_bytes,
 )
@@ -159,6 +162,17 @@ def main() -> None:
 		default=20,
 		help="Max number of (pair,crib,hit) applications (default: 20)",
 	)
+	parser.add_argument(
+		"--cribs",
+		type=Path,
+		default=None,
+		help="Dictionary file with one crib per line (spaces kept); default: a few common words",
+	)
+	parser.add_argument(
+		"--keyed",
+		action="store_true",
+		help="Place cribs against the partial key of state.json and the masks instead of single pairs",
+	)
 	args = parser.parse_args()
 
 	auto_apply = not args.no_apply
@@ -180,6 +194,13 @@ def main() -> None:
 		" with ",
 		" is ",
 	]
+	if args.cribs is not None:
+		cribs = load_cribs(args.cribs)
+		print(f"Загружено cribs: {len(cribs)} из {args.cribs}")
+
+	if args.keyed:
+		_run_keyed(ciphertexts, cribs, auto_apply=auto_apply, args=args)
+		return
 
 	out_path = Path("K3") / "crib_drag_report.txt"
 	path = generate_crib_drag_report(
@@ -199,8 +220,7 @@ def main() -> None:
 	if not editable_path.exists():
 		raise FileNotFoundError(str(editable_path))
 
-	plaintexts = parse_plaintexts(editable_path, expected_count=len(ciphertexts))
-	m3, m4 = parse_masks_two(editable_path, expected_count=len(ciphertexts))
+	plaintexts, m3, m4 = parse_plaintexts_and_masks(editable_path, expected_count=len(ciphertexts))
 	ref_texts = _load_reference_texts(Path("K3") / "texts.txt", expected_count=len(ciphertexts))
 
 	applied_events = 0
@@ -209,12 +229,10 @@ def main() -> None:
 	for i in range(len(ciphertexts)):
 		for j in range(i + 1, len(ciphertexts)):
 			xored = xor_bytes(ciphertexts[i][:common_len], ciphertexts[j][:common_len])
-			for crib in cribs:
+			hits_per_crib = drag_cribs(xored, cribs, min_printable_ratio=0.90, max_hits=args.max_hits_per_crib)
+			for hits in hits_per_crib:
 				if applied_events >= args.max_applied_cribs:
 					break
-				hits = crib_drag(xored, crib, min_printable_ratio=0.90)
-				if args.max_hits_per_crib > 0:
-					hits = hits[: args.max_hits_per_crib]
 				if not hits:
 					continue
 
@@ -260,10 +278,86 @@ def main() -> None:
 		print(f"Авто-вставка: events={applied_events} chars={changed_chars_total}")
 		# Run main to propagate into key and plaintexts_guess.txt.
 		print("Запуск K3/main.py для применения в ключ и обновления вывода...")
-		subprocess.run([sys.executable, str(Path('K3') / 'main.py')], check=False)
+		subprocess.run([sys.executable, 'main.py'], check=False, cwd=Path('K3'))
 	else:
 		print("Авто-вставка: подходящих вставок не найдено (или все конфликтуют с масками/ручными символами)")
 
 
+def _run_keyed(ciphertexts: list[bytes], cribs: list[str], *, auto_apply: bool, args: argparse.Namespace) -> None:
+	"""Keyed mode: every hit fixes the fragment of all texts, so it is applied to all of them or not at all."""
+	editable_path = Path("K3") / "plaintexts_guess copy.txt"
+	n = len(ciphertexts)
+	plaintexts, m3, m4 = [""] * n, [""] * n, [""] * n
+	if editable_path.exists():
+		plaintexts, m3, m4 = parse_plaintexts_and_masks(editable_path, expected_count=n)
+	elif auto_apply:
+		raise FileNotFoundError(str(editable_path))
+
+	state_path = Path("K3") / "state.json"
+	key = load_state(state_path)["key"] if resolve_state_path(state_path).exists() else []
+	hits = keyed_crib_hits(
+		ciphertexts=ciphertexts,
+		key=key,
+		masks3=m3,
+		masks4=m4,
+		cribs=cribs,
+		max_hits_per_crib=args.max_hits_per_crib,
+	)
+	path = write_keyed_crib_drag_report(
+		ciphertexts=ciphertexts,
+		key=key,
+		cribs=cribs,
+		hits=hits,
+		out_path=Path("K3") / "crib_drag_keyed_report.txt",
+	)
+	print(f"Сохранено: {path} (hits={sum(len(h) for h in hits)})")
+	if not auto_apply:
+		return
+
+	applied_events = 0
+	changed_chars_total = 0
+	for crib_hits in hits:
+		if applied_events >= args.max_applied_cribs:
+			break
+		for hit in crib_hits:
+			updated = list(plaintexts)
+			changed = 0
+			for j, fragment in enumerate(hit["fragments"]):
+				applied = _try_apply_fragment(
+					plaintext_block=updated[j],
+					mask3_line=m3[j],
+					mask4_line=m4[j],
+					offset=hit["offset"],
+					fragment=fragment.decode("cp1251", errors="replace"),
+				)
+				if applied is None:
+					break
+				updated[j], count = applied
+				changed += count
+			else:
+				if changed <= 0:
+					continue
+				plaintexts = updated
+				applied_events += 1
+				changed_chars_total += changed
+				break
+
+	if not applied_events:
+		print("Авто-вставка: подходящих вставок не найдено (или все конфликтуют с масками/ручными символами)")
+		return
+	ref_texts = _load_reference_texts(Path("K3") / "texts.txt", expected_count=n)
+	write_plaintexts_file(
+		editable_path,
+		plaintexts,
+		encoding="utf-8",
+		masks=m3,
+		masks2=m4,
+		reference_texts=ref_texts,
+	)
+	print(f"Авто-вставка: events={applied_events} chars={changed_chars_total}")
+	print("Запуск K3/main.py для применения в ключ и обновления вывода...")
+	subprocess.run([sys.executable, 'main.py'], check=False, cwd=Path('K3'))
+
+
 if __name__ == "__main__":
 	main()
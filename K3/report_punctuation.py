@@ -5,6 +5,7 @@ from help_methods import (
 	guess_punctuation_positions,
 	load_ciphertexts,
 	load_state,
+	resolve_state_path,
 )
 
 
@@ -26,7 +27,7 @@ def main() -> None:
 
 	# Report that uses current key if present.
 	state_path = Path("K3") / "state.json"
-	if state_path.exists():
+	if resolve_state_path(state_path).exists():
 		state = load_state(state_path)
 		key = state.get("key") or [None] * common_len
 		print(f"Ключ загружен из: {state_path}")
@@ -0,0 +1,20 @@
+import pytest
+
+from auto_solver import DEFAULT_WEIGHTS, ByteNgramModel
+
+
+def test_default_weights_cover_the_supported_orders():
+	for order in (2, 3):
+		model = ByteNgramModel(order)
+		assert len(model.weights) == order + 1
+		assert sum(model.weights) == pytest.approx(1.0)
+	assert ByteNgramModel(3).weights == pytest.approx(list(DEFAULT_WEIGHTS))
+
+
+def test_unsupported_orders_fail_clearly():
+	with pytest.raises(ValueError, match="table"):
+		ByteNgramModel(4)
+	with pytest.raises(ValueError, match=">= 2"):
+		ByteNgramModel(1)
+	with pytest.raises(ValueError, match="Expected 3 interpolation weights"):
+		ByteNgramModel(2, weights=[0.5, 0.5])
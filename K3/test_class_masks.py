@@ -0,0 +1,121 @@
+import numpy as np
+
+import help_methods as hm
+from pad_engine import class_mask_lines
+
+
+PLAINTEXTS = [
+	b"It was the best of times, it was the worst of times; it was the age of WISDOM.",
+	b"Mr. Pickwick said that the gentleman in the green coat had gone to Dingley Dell",
+	b"Call me Ishmael. Some years ago - never mind how long precisely - having little",
+	b"A SLIGHT DECLINE of the road, and then the coach stopped.",
+]
+# mask4 class of a plaintext byte by its top three bits.
+TRUE_CLASS = {1: "#", 2: ">", 3: "<"}
+
+
+def encrypt(plaintexts, seed=1):
+	rng = np.random.default_rng(seed)
+	key = rng.integers(0, 256, max(len(p) for p in plaintexts), dtype=np.uint8)
+	return [bytes(np.frombuffer(p, dtype=np.uint8) ^ key[:len(p)]) for p in plaintexts]
+
+
+def wrong_classes(masks, plaintexts):
+	return [
+		(i, pos, sym)
+		for i, line in enumerate(masks)
+		for pos, sym in enumerate(line)
+		if sym in "#<>" and TRUE_CLASS.get(plaintexts[i][pos] >> 5) != sym
+	]
+
+
+def test_compute_mask_classes_match_the_plaintexts():
+	ciphertexts = encrypt(PLAINTEXTS[:3])
+	masks = hm.compute_mask(ciphertexts)
+	assert [len(m) for m in masks] == [len(c) for c in ciphertexts]
+	assert wrong_classes(masks, PLAINTEXTS[:3]) == []
+	assert sum(sym in "#<>" for line in masks for sym in line) > 0
+
+
+def test_compute_mask_ragged_tail_matches_the_table_prefix():
+	# Text 4 is shorter: the lookup table covers its length, the loop the rest.
+	texts = [PLAINTEXTS[0], PLAINTEXTS[1], PLAINTEXTS[3]]
+	ciphertexts = encrypt(texts)
+	masks = hm.compute_mask(ciphertexts)
+	short = len(texts[2])
+	assert masks[0][short:] == hm.compute_mask([c[short:] for c in ciphertexts[:2]])[0]
+	assert [m[:short] for m in masks] == hm.compute_mask([c[:short] for c in ciphertexts])
+	assert wrong_classes(masks, texts) == []
+
+
+def test_compute_mask_marks_equal_bytes():
+	ciphertexts = [b"\x10\x20\x30", b"\x10\x21\x30", b"\x10\x22\x31"]
+	masks = hm.compute_mask(ciphertexts)
+	assert [m[0] for m in masks] == ["&"] * 3
+	assert all(m[2] != "&" for m in masks)
+
+
+def refine(ciphertexts, constraints, variant="mask4"):
+	return hm.refine_mask_lines_with_manual_constraints(
+		ciphertexts=ciphertexts,
+		base_masks=hm.compute_mask(ciphertexts),
+		manual_masks=[""] * len(ciphertexts),
+		constraint_masks=constraints,
+		mask_variant=variant,
+	)
+
+
+def test_refine_forces_only_true_classes():
+	ciphertexts = encrypt(PLAINTEXTS[:3])
+	# Text 1 fully known: the others follow wherever a pair links them.
+	constraints = ["".join(TRUE_CLASS[b >> 5] for b in PLAINTEXTS[0]), "", ""]
+	refined = refine(ciphertexts, constraints)
+	assert wrong_classes(refined, PLAINTEXTS[:3]) == []
+	forced = sum(sym in "#<>" for line in refined[1:] for sym in line)
+	assert forced > sum(sym in "#<>" for line in hm.compute_mask(ciphertexts)[1:] for sym in line)
+
+
+def test_refine_is_the_same_with_a_cold_cache():
+	ciphertexts = encrypt(PLAINTEXTS[:3])
+	constraints = ["".join(TRUE_CLASS[b >> 5] for b in PLAINTEXTS[0][:40]), "", ""]
+	for variant in ("mask3", "mask4"):
+		warm = refine(ciphertexts, constraints, variant)
+		hm._solve_refine_signature.cache_clear()
+		assert refine(ciphertexts, constraints, variant) == warm
+
+
+def test_refine_keeps_manual_class_symbols():
+	ciphertexts = encrypt(PLAINTEXTS[:3])
+	# A wrong manual class stays visible even where the xor constraints force another one.
+	wrong = "<" if PLAINTEXTS[1][2] >> 5 != 3 else "#"
+	refined = hm.refine_mask_lines_with_manual_constraints(
+		ciphertexts=ciphertexts,
+		base_masks=hm.compute_mask(ciphertexts),
+		manual_masks=["", "__" + wrong, ""],
+		constraint_masks=["".join(TRUE_CLASS[b >> 5] for b in PLAINTEXTS[0]), "", ""],
+		mask_variant="mask4",
+	)
+	assert refined[1][2] == wrong
+
+
+def test_n_text_engine_matches_the_three_text_path():
+	for count in (2, 3):
+		ciphertexts = encrypt(PLAINTEXTS[:count])
+		assert class_mask_lines(ciphertexts) == hm.compute_mask(ciphertexts)
+
+
+def test_four_texts_classify_more_and_stay_correct():
+	ciphertexts = encrypt(PLAINTEXTS)
+	masks = hm.compute_mask(ciphertexts)
+	assert wrong_classes(masks, PLAINTEXTS) == []
+	three = hm.compute_mask(ciphertexts[:3])
+	assert sum(s in "#<>" for m in masks[:3] for s in m) > sum(s in "#<>" for m in three for s in m)
+
+
+def test_bitwise_refine_matches_the_per_position_solver(monkeypatch):
+	ciphertexts = encrypt(PLAINTEXTS[:3])
+	constraints = ["".join(TRUE_CLASS[b >> 5] for b in PLAINTEXTS[0][:50]), "", ""]
+	expected = {variant: refine(ciphertexts, constraints, variant) for variant in ("mask3", "mask4")}
+	monkeypatch.setattr(hm, "_MASK_TABLE_MAX_N", 0)
+	for variant, lines in expected.items():
+		assert refine(ciphertexts, constraints, variant) == lines
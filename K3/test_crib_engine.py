@@ -0,0 +1,121 @@
+import numpy as np
+
+import help_methods as hm
+from crib_engine import PRINTABLE, drag_cribs, drag_cribs_keyed
+from mask_bits import CLASS_BITS
+
+
+PLAINTEXTS = [
+	b"It was the best of times, it was the worst of times; it was the age of wisdom.",
+	b"Mr. Pickwick said that the gentleman in the green coat had gone to Dingley Dell",
+	b"Call me Ishmael. Some years ago - never mind how long precisely - having little",
+]
+KEY = np.random.default_rng(7).integers(0, 256, min(len(p) for p in PLAINTEXTS), dtype=np.uint8)
+CIPHERTEXTS = [bytes(np.frombuffer(p[:len(KEY)], dtype=np.uint8) ^ KEY) for p in PLAINTEXTS]
+XORED = hm.xor_bytes(CIPHERTEXTS[0], CIPHERTEXTS[1])
+CRIBS = ["the ", " was ", "times", "e", "", "x" * 100, "Pickwick"]
+
+
+def brute_force(xored, crib, min_ratio, max_hits=0):
+	"""The per-offset loop drag_cribs replaced."""
+	hits = []
+	for offset in range(len(xored) - len(crib) + 1):
+		fragment = bytes(x ^ ord(c) for x, c in zip(xored[offset:], crib))
+		ratio = sum(PRINTABLE[b] for b in fragment) / len(crib)
+		if ratio >= min_ratio:
+			hits.append({"offset": offset, "fragment_bytes": fragment, "printable_ratio": ratio})
+	hits.sort(key=lambda hit: (-hit["printable_ratio"], hit["offset"]))
+	return hits[:max_hits] if max_hits > 0 else hits
+
+
+def test_drag_cribs_matches_the_per_offset_loop():
+	for max_hits in (0, 3):
+		for batch_cells in (1 << 22, 100):
+			results = drag_cribs(XORED, CRIBS, min_printable_ratio=0.85, max_hits=max_hits, batch_cells=batch_cells)
+			assert len(results) == len(CRIBS)
+			for crib, hits in zip(CRIBS, results):
+				expected = brute_force(XORED, crib, 0.85, max_hits) if crib and len(crib) <= len(XORED) else []
+				assert [(h["offset"], h["fragment_bytes"], h["printable_ratio"]) for h in hits] == [
+					(h["offset"], h["fragment_bytes"], h["printable_ratio"]) for h in expected
+				]
+
+
+def test_a_true_crib_reveals_the_other_text():
+	offset = PLAINTEXTS[1].index(b"Pickwick")
+	hits = hm.crib_drag(XORED, "Pickwick", min_printable_ratio=1.0)
+	assert {"offset": offset, "fragment": PLAINTEXTS[0][offset:offset + 8]} in [
+		{"offset": h["offset"], "fragment": h["fragment_bytes"]} for h in hits
+	]
+
+
+def test_report_lists_every_pair_with_hits(tmp_path):
+	path = hm.generate_crib_drag_report(
+		ciphertexts=CIPHERTEXTS,
+		common_len=len(KEY),
+		out_path=tmp_path / "report.txt",
+		cribs=["the ", "x" * 100],
+		max_hits_per_crib=2,
+	)
+	text = path.read_text(encoding="utf-8")
+	assert text.endswith("\n") and not text.endswith("\n\n")
+	lines = text.splitlines()
+	assert lines[:2] == ["Crib-dragging report (OTP reuse / multi-time pad)", f"ciphertexts=3 common_len={len(KEY)}"]
+	assert "xxx" not in text
+	for i, j in ((0, 1), (0, 2), (1, 2)):
+		hits = drag_cribs(hm.xor_bytes(CIPHERTEXTS[i], CIPHERTEXTS[j]), ["the "], min_printable_ratio=0.9, max_hits=2)[0]
+		if not hits:
+			continue
+		start = lines.index(f"Pair Plaintext {i + 1} ^ Plaintext {j + 1}")
+		assert lines[start + 1] == f"  crib='the ' (assuming it is in Plaintext {i + 1})"
+		assert lines[start + 2:start + 2 + len(hits)] == [f"    offset={h['offset']:>4}: {h['fragment_ascii']}" for h in hits]
+
+
+def keyed(cribs, *, known=40, allowed=None, **kwargs):
+	key = np.where(np.arange(len(KEY)) < known, KEY.astype(np.int16), -1)
+	if allowed is None:
+		allowed = np.full((len(CIPHERTEXTS), len(KEY)), CLASS_BITS, dtype=np.uint8)
+	return key, drag_cribs_keyed(CIPHERTEXTS, cribs, key=key, allowed=allowed, byte_scores=np.zeros(256), max_hits=0, **kwargs)
+
+
+def test_keyed_drag_finds_the_true_crib_and_respects_the_key():
+	crib = PLAINTEXTS[1][50:60]
+	key, (hits,) = keyed([crib])
+	assert {"text": 1, "offset": 50, "key_bytes": KEY[50:60].tobytes()} in [
+		{name: hit[name] for name in ("text", "offset", "key_bytes")} for hit in hits
+	]
+	true_hit = next(hit for hit in hits if (hit["text"], hit["offset"]) == (1, 50))
+	assert true_hit["fragments"] == [p[50:60] for p in PLAINTEXTS]
+	assert true_hit["new_key_bytes"] == 10
+	for hit in hits:
+		window = key[hit["offset"]:hit["offset"] + len(crib)]
+		implied = np.frombuffer(hit["key_bytes"], dtype=np.uint8)
+		assert ((window < 0) | (window == implied)).all()
+		assert hit["new_key_bytes"] == int((window < 0).sum()) >= 1
+
+
+def test_keyed_drag_drops_hits_the_masks_forbid():
+	crib = PLAINTEXTS[1][50:60]
+	allowed = np.full((len(CIPHERTEXTS), len(KEY)), CLASS_BITS, dtype=np.uint8)
+	# Text 3 has a lower case letter at 52; a mask that says upper case rules the hit out.
+	assert PLAINTEXTS[2][52:53].islower()
+	allowed[2, 52] = 0x04
+	_key, (hits,) = keyed([crib], allowed=allowed)
+	assert (1, 50) not in [(hit["text"], hit["offset"]) for hit in hits]
+
+
+def test_keyed_report_shows_every_fragment(tmp_path):
+	crib = PLAINTEXTS[1][50:60].decode()
+	key, hits = keyed([crib], texts=[1])
+	path = hm.write_keyed_crib_drag_report(
+		ciphertexts=CIPHERTEXTS,
+		key=[int(k) if k >= 0 else None for k in key],
+		cribs=[crib],
+		hits=hits,
+		out_path=tmp_path / "report.txt",
+	)
+	lines = path.read_text(encoding="utf-8").splitlines()
+	assert lines[1] == f"ciphertexts=3 common_len={len(KEY)} known_key=40"
+	start = lines.index(f"crib={crib!r}")
+	block = lines[start + 1:]
+	row = next(i for i, line in enumerate(block) if line.startswith("  text=2 offset=   50 "))
+	assert block[row + 1:row + 4] == [f"    Plaintext {i + 1}: {p[50:60].decode()!r}" for i, p in enumerate(PLAINTEXTS)]
@@ -0,0 +1,74 @@
+import base64
+import shutil
+
+import numpy as np
+
+import main
+from help_methods import load_state
+
+
+PLAINTEXTS = [
+	b"It was the best of times, it was the worst of times; it was the age of WISDOM.",
+	b"Mr. Pickwick said that the gentleman in the green coat had gone to Dingley Dell",
+	b"Call me Ishmael. Some years ago - never mind how long precisely - having little",
+]
+TASK_NAME = "2026_02_24_10_27_04_Анна_Казакевич_task.txt"
+EDITED_NAME = "plaintexts_guess copy.txt"
+OUTPUTS = ("plaintexts_guess.txt", EDITED_NAME, "manual_mismatch_report.txt")
+
+
+def make_workdir(path):
+	key = np.random.default_rng(5).integers(0, 256, 100, dtype=np.uint8)
+	blocks = []
+	for number, plain in enumerate(PLAINTEXTS, start=1):
+		cipher = bytes(np.frombuffer(plain, dtype=np.uint8) ^ key[:len(plain)])
+		blocks.append(f"Шифр {number} (base64):\n{base64.b64encode(cipher)!r}\n")
+	path.mkdir()
+	(path / TASK_NAME).write_text("\n".join(blocks), encoding="utf-8")
+	return path
+
+
+def run(path, monkeypatch, **kwargs):
+	monkeypatch.chdir(path)
+	main.go_main(**kwargs)
+
+
+def edit(path, text, start, chars, *, line=0):
+	"""Overwrite characters of one line (0 = plaintext, 1 = mask3, 2 = mask4) of a text block."""
+	lines = (path / EDITED_NAME).read_text(encoding="cp1251").split("\n")
+	row = lines.index(f"Plaintext {text + 1}:") + 1 + line
+	lines[row] = lines[row][:start] + chars + lines[row][start + len(chars):]
+	(path / EDITED_NAME).write_text("\n".join(lines), encoding="cp1251")
+
+
+def snapshot(path):
+	state = load_state(path / "state.json")
+	files = {name: (path / name).read_bytes() for name in OUTPUTS if (path / name).exists()}
+	return files, state["key"], state["plaintexts"], state["manual_plaintexts"]
+
+
+def test_incremental_run_matches_a_full_run(tmp_path, monkeypatch, capsys):
+	work = make_workdir(tmp_path / "incremental")
+	run(work, monkeypatch)
+	run(work, monkeypatch)
+
+	edits = [
+		# Known words fill key bytes; a class symbol goes into a mask4 line.
+		[(0, 7, PLAINTEXTS[0][7:26].decode(), 0), (1, 40, ">", 2)],
+		# Correct one text over known bytes, clear others with '_'.
+		[(1, 7, PLAINTEXTS[1][7:12].decode(), 0), (2, 20, "____", 0), (0, 30, "#", 1)],
+	]
+	for round_edits in edits:
+		for text, start, chars, line in round_edits:
+			edit(work, text, start, chars, line=line)
+		full = tmp_path / f"full{len(capsys.readouterr().out)}"
+		shutil.copytree(work, full)
+
+		run(work, monkeypatch, incremental=True)
+		assert "Инкрементально" in capsys.readouterr().out
+		run(full, monkeypatch)
+		assert snapshot(work) == snapshot(full)
+
+	files, key, _plaintexts, _manual = snapshot(work)
+	assert sum(k is not None for k in key) == 19 - 4
+	assert PLAINTEXTS[2][7:20] + b"____" + PLAINTEXTS[2][24:26] in files["plaintexts_guess.txt"]
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from key_journal import KeyJournal
+
+
+LENGTH = 8
+
+
+def fill(journal, key, changes, when, source="manual"):
+	"""Apply {pos: byte} to key (int16, in place) and journal it."""
+	old = key.copy()
+	for pos, value in changes.items():
+		key[pos] = -1 if value is None else value
+	return journal.record(old, key, source=source, when=when)
+
+
+def make(path, **kwargs):
+	journal = KeyJournal(path, length=LENGTH, **kwargs)
+	key = np.full(LENGTH, -1, dtype=np.int16)
+	states = [key.copy()]
+	for when, changes in enumerate(({0: 10, 1: 11}, {1: 21, 2: 22}, {0: None, 7: 77}), start=1):
+		fill(journal, key, changes, float(when))
+		states.append(key.copy())
+	return journal, key, states
+
+
+def test_undo_and_redo_walk_the_edits(tmp_path):
+	journal, key, states = make(tmp_path / "journal.bin")
+	assert journal.undo(key, when=10.0).ref == 3
+	assert key.tolist() == states[2].tolist()
+	journal.undo(key, when=11.0)
+	assert key.tolist() == states[1].tolist()
+	journal.redo(key, when=12.0)
+	assert key.tolist() == states[2].tolist()
+	assert journal.can_undo and journal.can_redo
+
+	# A new edit drops what could still be redone.
+	fill(journal, key, {5: 55}, 13.0)
+	assert not journal.can_redo
+	assert journal.redo(key) is None
+
+
+def test_reopened_journal_continues_where_it_stopped(tmp_path):
+	path = tmp_path / "journal.bin"
+	journal, key, states = make(path)
+	journal.undo(key, when=10.0)
+	journal.undo(key, when=11.0)
+	journal.redo(key, when=12.0)
+
+	reopened = KeyJournal(path, length=LENGTH)
+	assert [e.kind for e in reopened.entries] == [e.kind for e in journal.entries]
+	assert (reopened.can_undo, reopened.can_redo) == (True, True)
+	reopened.redo(key, when=13.0)
+	assert key.tolist() == states[3].tolist()
+	assert not reopened.can_redo
+
+	with pytest.raises(ValueError, match="8 bytes"):
+		KeyJournal(path, length=LENGTH + 1)
+
+
+def test_undo_of_a_position_changed_twice_restores_the_first_value(tmp_path):
+	journal = KeyJournal(tmp_path / "journal.bin", length=LENGTH)
+	key = np.full(LENGTH, -1, dtype=np.int16)
+	key[3] = 9
+	journal.append_edit([3, 3], [None, 5], [5, 9], source="crib", key=key, when=1.0)
+	journal.undo(key)
+	assert key[3] == -1
+
+
+def test_key_at_replays_from_the_nearest_snapshot(tmp_path):
+	for snapshot_every in (4096, 1):
+		journal, key, states = make(tmp_path / f"journal{snapshot_every}.bin", snapshot_every=snapshot_every)
+		journal.undo(key, when=4.0)
+		for when, expected in ((0.5, states[0]), (1.0, states[1]), (2.5, states[2]), (3.0, states[3]), (4.0, states[2])):
+			assert journal.key_at(when).tolist() == expected.tolist()
+
+
+def test_cut_record_is_dropped_on_open(tmp_path):
+	path = tmp_path / "journal.bin"
+	journal, _key, _states = make(path)
+	size = path.stat().st_size
+	with path.open("ab") as file:
+		file.write(b"\x01" + b"\x00" * 10)
+	reopened = KeyJournal(path, length=LENGTH)
+	assert len(reopened.entries) == len(journal.entries)
+	assert path.stat().st_size == size
+
+
+def test_touches_lists_the_last_changes_of_a_position(tmp_path):
+	journal, key, _states = make(tmp_path / "journal.bin")
+	journal.undo(key, when=4.0)
+	touched = [(entry.kind_name, old, new) for entry, old, new in journal.touches(0)]
+	assert touched == [("undo", None, 10), ("edit", 10, None), ("edit", None, 10)]
@@ -0,0 +1,104 @@
+import help_methods as hm
+from key_map import KeyMap
+
+
+KEY = bytes(range(101, 109))
+PLAINTEXTS = ["abcdefgh", "ABCDEFGH", "hgfe dcb"]
+CIPHERTEXTS = [bytes(ord(ch) ^ k for ch, k in zip(text, KEY)) for text in PLAINTEXTS]
+
+
+def apply(manual, key, prev, **kwargs):
+	return hm.apply_manual_plaintexts_to_key(
+		ciphertexts=CIPHERTEXTS,
+		manual_plaintexts=manual,
+		key=key,
+		common_len=len(KEY),
+		prev_plaintexts=prev,
+		**kwargs,
+	)
+
+
+def test_typed_characters_set_the_key_and_underscores_clear_it():
+	key = [None] * len(KEY)
+	blank = ["_" * 8] * 3
+	stats = apply(["ab______", "___D____", "_____*__"], key, blank)
+	assert key[:4] == [KEY[0], KEY[1], None, KEY[3]]
+	assert key[4:] == [None] * 4
+	assert (stats["updates"], stats["clears"], stats["conflicts"]) == (3, 0, [])
+
+	stats = apply(["a_______", "___D____", "_____*__"], key, ["ab______", "___D____", "_____*__"])
+	assert key[:4] == [KEY[0], None, None, KEY[3]]
+	assert (stats["updates"], stats["clears"]) == (0, 1)
+
+
+def test_last_changed_text_wins_and_the_conflict_is_listed():
+	key = [None] * len(KEY)
+	stats = apply(["x_______", "a_______", "h_______"], key, ["_" * 8] * 3)
+	assert key[0] == KEY[0]
+	assert [c["pos"] for c in stats["conflicts"]] == [0]
+	assert [e["text"] for e in stats["conflicts"][0]["events"]] == [0, 1, 2]
+
+	# An unchanged text does not compete: only the edited one sets the byte.
+	stats = apply(["x_______", "a_______", "h_______"], key, ["_" * 8, "a_______", "h_______"])
+	assert key[0] == ord("x") ^ CIPHERTEXTS[0][0]
+	assert stats["conflicts"] == []
+
+
+def test_positions_limit_the_update():
+	key = [None] * len(KEY)
+	apply(PLAINTEXTS, key, ["_" * 8] * 3, positions=[2, 5])
+	assert [i for i, k in enumerate(key) if k is not None] == [2, 5]
+
+
+def test_mismatch_report_lists_wrong_manual_characters(tmp_path):
+	key = list(KEY[:6]) + [None, None]
+	key_map = KeyMap.from_key(key, source="crib")
+	manual = ["abcXef_h", "ABCDEF*_", "hgfe dcb"]
+	path, count = hm.write_manual_mismatch_report(
+		ciphertexts=CIPHERTEXTS,
+		manual_plaintexts=manual,
+		key=key,
+		common_len=len(KEY),
+		out_path=tmp_path / "report.txt",
+		key_map=key_map,
+	)
+	lines = path.read_text(encoding="utf-8").splitlines()
+	rows = [line for line in lines if line.startswith("text=")]
+	# 'X' contradicts the key; text 1's 'h' and text 3's 'c' 'b' have no key byte; '_' and '*' never count.
+	assert count == len(rows) == 4
+	assert rows[0].startswith("text=1 pos=   3 manual='X'/58 key=")
+	assert "dec='d'/64" in rows[0] and "src=crib conf=0.80" in rows[0]
+	assert "key=None dec=_" in rows[1]
+	assert "Key sources: crib=6 (conf 0.80)" in lines
+
+
+def test_propose_keeps_more_confident_bytes():
+	key_map = KeyMap.from_key([1, 2, None, None], source="manual")
+	key_map.propose([None, None, 3, None], source="space", when=5.0)
+	taken, kept = key_map.propose([9, 9, 9, 4], source="crib", when=6.0)
+	assert taken.tolist() == [2, 3]
+	assert kept.tolist() == [0, 1]
+	assert key_map.to_list() == [1, 2, 9, 4]
+	assert key_map.summary() == {
+		"manual": {"known": 2, "mean_confidence": 1.0},
+		"crib": {"known": 2, "mean_confidence": 0.8},
+	}
+
+
+def test_provenance_survives_save_and_load(tmp_path):
+	key_map = KeyMap.from_key(list(KEY[:4]) + [None] * 4, source="manual", when=1.0)
+	key_map.propose(KEY, source="reference", when=2.0)
+	state_path = tmp_path / "state.json"
+	hm.save_state(
+		state_path,
+		ciphertexts=CIPHERTEXTS,
+		key=key_map.to_list(),
+		plaintexts=[text.encode() for text in PLAINTEXTS],
+		manual_plaintexts=PLAINTEXTS,
+		meta={},
+		key_map=key_map,
+	)
+	loaded = KeyMap.from_state(hm.load_state(state_path), length=len(KEY))
+	assert loaded.to_list() == list(KEY)
+	assert [loaded.describe(p).split()[0] for p in (0, 7)] == ["src=manual", "src=reference"]
+	assert loaded.summary() == key_map.summary()
@@ -0,0 +1,41 @@
+import numpy as np
+
+from mask_bits import (
+	CLASS_BITS,
+	FREE,
+	LOWER,
+	PUNCT,
+	UPPER,
+	allowed_classes,
+	encode_mask,
+	merge_constraints,
+	override_classes,
+	render_mask,
+)
+
+
+def test_mask_symbols_round_trip():
+	line = "_#<>&|?0123456789ABCDEF"
+	assert render_mask(encode_mask(line)) == line
+	assert render_mask(encode_mask("abcdef")) == "ABCDEF"
+
+
+def test_stray_characters_are_free_cells():
+	codes = encode_mask("#xé€<\t>")
+	assert codes.tolist() == [PUNCT, FREE, FREE, FREE, LOWER, FREE, UPPER]
+
+
+def test_merge_prefers_mask4_classes():
+	merged = merge_constraints(encode_mask("#<_|#"), encode_mask(">_&_<__"))
+	assert render_mask(merged) == "><__<__"
+
+
+def test_override_lays_only_classes_over_the_base():
+	base = encode_mask("0123A")
+	assert render_mask(override_classes(base, encode_mask("#|&<>>>"))) == "#12<>"
+
+
+def test_allowed_classes_per_position():
+	allowed = allowed_classes(encode_mask("#<>_"), encode_mask("_>_<"), 6)
+	assert allowed.tolist() == [PUNCT, UPPER, LOWER | UPPER, LOWER, CLASS_BITS, CLASS_BITS]
+	assert allowed.dtype == np.uint8
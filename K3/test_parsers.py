@@ -0,0 +1,55 @@
+import pytest
+
+import help_methods as hm
+
+
+PLAINTEXTS = [
+	"It was the best of times, __ was the worst",
+	"DEADBEEFDEADBEEFDEADBEEF",  # a text made of mask symbols is still the text
+	"_" * 30,
+]
+MASK3 = ["#<<<" * 10, "<" * 24, "_" * 29 + "&"]
+MASK4 = ["#>A?" * 10, "0123456789ABCDEF<<<<<<<<", "|" + "_" * 29]
+REFERENCES = ["first reference line\nsecond one", "", "ref"]
+
+
+def write(path, **kwargs):
+	hm.write_plaintexts_file(path, PLAINTEXTS, masks=MASK3, masks2=MASK4, reference_texts=REFERENCES, **kwargs)
+
+
+def test_written_file_parses_back(tmp_path):
+	path = tmp_path / "plaintexts_guess.txt"
+	write(path)
+	plaintexts, mask3, mask4 = hm.parse_plaintexts_and_masks(path, expected_count=3)
+	assert plaintexts == PLAINTEXTS
+	assert mask3 == MASK3
+	assert mask4 == MASK4
+
+
+def test_single_pass_matches_the_separate_parsers(tmp_path):
+	path = tmp_path / "plaintexts_guess.txt"
+	write(path)
+	combined = hm.parse_plaintexts_and_masks(path, expected_count=3)
+	assert combined == (hm.parse_plaintexts(path, expected_count=3), *hm.parse_masks_two(path, expected_count=3))
+
+
+def test_single_legacy_mask_line_goes_by_its_symbols(tmp_path):
+	path = tmp_path / "plaintexts_guess.txt"
+	texts = [PLAINTEXTS[0], PLAINTEXTS[2]]
+	hm.write_plaintexts_file(path, texts, masks=[MASK3[0], MASK4[1]])
+	plaintexts, mask3, mask4 = hm.parse_plaintexts_and_masks(path)
+	assert plaintexts == texts
+	assert (mask3, mask4) == ([MASK3[0], ""], ["", MASK4[1]])
+
+
+def test_missing_blocks_are_an_error(tmp_path):
+	path = tmp_path / "plaintexts_guess.txt"
+	write(path)
+	with pytest.raises(ValueError, match="at least 4"):
+		hm.parse_plaintexts_and_masks(path, expected_count=4)
+
+
+def test_mask_line_check_matches_the_regex():
+	samples = [*MASK3, *MASK4, *PLAINTEXTS, "_" * 25, "#" * 19, "abcdef" * 4, "#<>|&?" * 4, "#<>" * 7 + "x", "é" + "#" * 20]
+	for line in samples:
+		assert hm._is_mask_line(line) == bool(hm._MASK_LINE_RE_ANY.fullmatch(line)), line
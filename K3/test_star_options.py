@@ -0,0 +1,61 @@
+import json
+import string
+
+import help_methods as hm
+
+
+CIPHERTEXTS = [bytes(range(40, 80)), bytes(range(100, 140)), bytes(range(7, 87, 2))]
+CLASS_CHARS = {"#": " " + string.punctuation, "<": string.ascii_lowercase, ">": string.ascii_uppercase}
+ALL_CHARS = "".join(CLASS_CHARS.values())
+
+
+def brute_force(pos, allowed):
+	"""Columns for one position, ordered like the writer: by rank of the text-1 character."""
+	columns = []
+	for key in range(256):
+		column = [chr(c[pos] ^ key) for c in CIPHERTEXTS]
+		if all(ch in chars for ch, chars in zip(column, allowed)):
+			columns.append(column)
+	return sorted(columns, key=lambda column: ALL_CHARS.index(column[0]))
+
+
+def write(out_dir, manual, mask4=("", "", "")):
+	return hm.write_star_triplet_options(
+		ciphertexts=CIPHERTEXTS,
+		manual_plaintexts=manual,
+		mask3_lines=["", "", ""],
+		mask4_lines=list(mask4),
+		common_len=40,
+		out_dir=out_dir,
+	)
+
+
+def test_every_star_column_matches_brute_force(tmp_path):
+	manual = ["*" + "_" * 9 + "*", "_" * 20 + "*", ""]
+	# Text 1 is lower case at position 10.
+	mask4 = ("_" * 10 + "<", "", "")
+	summary = write(tmp_path, manual, mask4)
+	assert summary["positions"] == summary["written_positions"] == 3
+
+	for pos in (0, 20):
+		assert hm.read_star_triplet_options(tmp_path, pos) == brute_force(pos, [ALL_CHARS] * 3)
+	assert hm.read_star_triplet_options(tmp_path, 10) == brute_force(10, [CLASS_CHARS["<"], ALL_CHARS, ALL_CHARS])
+	assert hm.read_star_triplet_options(tmp_path, 5) == []
+
+
+def test_rewrite_drops_stale_files(tmp_path):
+	(tmp_path / "pos3.jsonl").write_text('["a", "b", "c"]\n', encoding="utf-8")
+	write(tmp_path, ["__*", "", ""])
+	assert not list(tmp_path.glob("pos*.jsonl"))
+	assert list(json.loads((tmp_path / "index.json").read_text(encoding="utf-8"))) == ["2"]
+
+	assert write(tmp_path, ["___", "", ""])["files"] == 0
+	assert not (tmp_path / "index.json").exists()
+	assert not (tmp_path / hm.STAR_OPTIONS_FILE).exists()
+	assert hm.read_star_triplet_options(tmp_path, 2) == []
+
+
+def test_legacy_index_entries_read_as_empty(tmp_path):
+	index = {"4": {"pos": 4, "file": "pos4.jsonl", "count": 2}}
+	(tmp_path / "index.json").write_text(json.dumps(index), encoding="utf-8")
+	assert hm.read_star_triplet_options(tmp_path, 4) == []
@@ -0,0 +1,73 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from mask_bits import CLASS_BITS
+from word_complete import WordIndex, complete_word, word_counts, word_span
+
+
+PLAINTEXTS = [
+	b"It was the best of times, it was the worst of times; it was the age of wisdom.",
+	b"Mr. Pickwick said that the gentleman in the green coat had gone to Dingley Dell",
+	b"Call me Ishmael. Some years ago - never mind how long precisely - having little",
+]
+KEY = np.random.default_rng(3).integers(0, 256, min(len(p) for p in PLAINTEXTS), dtype=np.uint8)
+CIPHERTEXTS = [bytes(np.frombuffer(p[:len(KEY)], dtype=np.uint8) ^ KEY) for p in PLAINTEXTS]
+WORDS = WordIndex(word_counts([p.decode() for p in PLAINTEXTS]) + Counter({"gentlemen": 1, "greens": 2}))
+ALLOWED = np.full((len(CIPHERTEXTS), len(KEY)), CLASS_BITS, dtype=np.uint8)
+# "gentleman" in text 2, with its key bytes unknown.
+START, STOP = PLAINTEXTS[1].index(b"gentleman"), PLAINTEXTS[1].index(b"gentleman") + 9
+
+
+def gap_key():
+	key = KEY.astype(np.int16)
+	key[START:STOP] = -1
+	return key
+
+
+def complete(**kwargs):
+	args = {"key": gap_key(), "allowed": ALLOWED, "text": 1, "start": START, "stop": STOP, "top": 0, **kwargs}
+	return complete_word(CIPHERTEXTS, WORDS, **args)
+
+
+def test_lookup_matches_a_filter_over_the_words():
+	rng = np.random.default_rng(0)
+	words = sorted(map(bytes, WORDS.groups[5][0]))
+	for _ in range(20):
+		domains = rng.random((5, 256)) < 0.8
+		matrix, _log_freq = WORDS.lookup(domains)
+		expected = [w for w in words if all(domains[i, b] for i, b in enumerate(w))]
+		assert sorted(map(bytes, matrix)) == expected
+
+
+def test_the_true_word_fills_the_gap():
+	found = complete()
+	match = next(item for item in found if item["word"] == "gentleman")
+	assert match["key_bytes"] == KEY[START:STOP].tobytes()
+	assert match["fragments"] == [p[START:STOP] for p in PLAINTEXTS]
+	assert match["new_key_bytes"] == STOP - START
+
+
+def test_pattern_and_byte_sets_narrow_the_words():
+	assert [item["word"] for item in complete(pattern="gentle?a?")] == ["gentleman"]
+	# Ruling out text 1's actual byte at the first position removes the true word.
+	plain_bytes = np.ones((3, 256), dtype=bool)
+	plain_bytes[0, PLAINTEXTS[0][START]] = False
+	assert "gentleman" not in [item["word"] for item in complete(plain_bytes=plain_bytes)]
+	# Without masks the byte sets alone decide.
+	assert "gentleman" in [item["word"] for item in complete(allowed=None, plain_bytes=np.ones((3, 256), dtype=bool))]
+
+
+def test_bad_pattern_or_span_is_an_error():
+	with pytest.raises(ValueError, match="cp1251"):
+		complete(pattern="gentlemaé")
+	with pytest.raises(ValueError, match="span"):
+		complete(pattern="?")
+	with pytest.raises(ValueError, match="common length"):
+		complete(start=70, stop=90)
+
+
+def test_word_span_stops_at_known_non_letters():
+	key = gap_key()
+	assert word_span(np.stack([np.frombuffer(c, dtype=np.uint8) for c in CIPHERTEXTS]), key, text=1, pos=START + 3) == (START, STOP)
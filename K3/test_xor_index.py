@@ -0,0 +1,43 @@
+from xor_index import CLASS_CHARS, load_xor_maps3, load_xor_maps4
+
+
+# Ids of the xor_maps3.json / xor_maps4.json files the index replaced.
+MAPS3_IDS = {"00|00|00": "0", "00|01|01": "1", "01|00|01": "2", "01|01|00": "3"}
+MAPS4_IDS = {
+	"000|000|000": "0", "000|001|001": "4", "000|010|010": "1", "000|011|011": "5",
+	"001|000|001": "6", "001|001|000": "7", "001|010|011": "8", "001|011|010": "9",
+	"010|000|010": "2", "010|001|011": "A", "010|010|000": "3", "010|011|001": "B",
+	"011|000|011": "C", "011|001|010": "D", "011|010|001": "E", "011|011|000": "F",
+}
+
+
+def test_ids_match_the_old_json_maps():
+	for index, ids in ((load_xor_maps3(), MAPS3_IDS), (load_xor_maps4(), MAPS4_IDS)):
+		assert index.keys == sorted(ids)
+		assert {key: index.id_char(key) for key in index.keys} == ids
+	assert load_xor_maps4().id_char("111|111|111") == "?"
+
+
+def test_class_triples_match_the_old_json_maps():
+	index = load_xor_maps4()
+	assert index.class_triples("000|000|000") == ["   ", "AAA", "aaa"]
+	assert index.class_triples("000|001|001") == ["AAa", "aaA"]
+
+
+def test_iter_triples_is_the_old_combos_file():
+	# xor_triplet_combos4/4.jsonl: 35152 lines starting A A a, A A b, A A c.
+	index = load_xor_maps4()
+	triples = list(index.iter_triples("000|001|001"))
+	assert len(triples) == index.count("000|001|001") == 35152
+	assert triples[:3] == [("A", "A", "a"), ("A", "A", "b"), ("A", "A", "c")]
+	assert triples == sorted(set(triples))
+
+
+def test_iter_triples_follow_the_class_triples():
+	index = load_xor_maps4()
+	class_of = {ch: symbol for symbol in index.symbols for ch in CLASS_CHARS[symbol]}
+	for key in ("000|000|000", "001|010|011", "011|011|000"):
+		classes = set(index.class_triples(key))
+		triples = list(index.iter_triples(key))
+		assert len(triples) == index.count(key)
+		assert {"".join(class_of[ch] for ch in triple) for triple in triples} == classes
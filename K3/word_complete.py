@@ -0,0 +1,321 @@
+"""Dictionary word completion for gaps in the K3 plaintexts.
+
+A span [start, stop) of one text is filled with a whole word. Every constraint
+on a candidate byte is local to its position: the implied key byte c_t ^ b must
+agree with a known key byte and decrypt every text to a plausible byte of a
+class its masks allow (xor_index.PLAIN_CLASSES, mask_bits). So the span is
+first reduced to a (length, 256) domain of allowed bytes, in one array
+operation, and brute force over letters is never needed (the number of letter
+strings that fit is just the product of the domain sizes).
+
+Words come from a WordIndex: per word length, a bitset over the words for each
+(position, byte). The candidates for a span are the AND over positions of the
+OR of the bitsets of the allowed bytes, so a lookup touches (length x alphabet)
+bitsets, not the word list. Survivors are ranked by word frequency plus the byte
+log-frequencies of what they imply in the other texts.
+
+	python word_complete.py --text 3 --start 3031 --stop 3038 --pattern "????I?E"
+	python word_complete.py --text 1 --pos 1234             # the word around position 1234
+	python word_complete.py --text 1 --pos 1234 --apply 1   # write the best completion into the key
+"""
+from __future__ import annotations
+
+import argparse
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+from help_methods import (
+	commit_key,
+	load_ciphertexts,
+	load_state,
+	parse_masks_two,
+)
+from auto_solver import DEFAULT_TASK_PATH, mask_class_bits
+from crib_engine import byte_log_frequencies
+from key_map import KeyMap
+from mask_bits import LOWER, UPPER
+from pad_engine import stack_ciphertexts
+from state_store import resolve_state_path
+from xor_index import PLAIN_CLASSES
+
+
+_WORD_RE = re.compile(r"[A-Za-z]+")
+# Count given to case forms of a word that the corpus does not contain.
+_UNSEEN_FORM_COUNT = 0.1
+
+
+def word_counts(texts: Sequence[str]) -> Counter:
+	"""Word forms as they occur in the texts (case kept)."""
+	counts: Counter = Counter()
+	for text in texts:
+		counts.update(_WORD_RE.findall(text))
+	return counts
+
+
+def load_wordlist(path: str | Path) -> Counter:
+	"""Wordlist file: one word per line, optionally followed by a count."""
+	counts: Counter = Counter()
+	for line in Path(path).read_text(encoding="utf-8", errors="replace").splitlines():
+		parts = line.split()
+		if not parts or not _WORD_RE.fullmatch(parts[0]):
+			continue
+		counts[parts[0]] += int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 1
+	return counts
+
+
+class WordIndex:
+	"""Words grouped by length with a (position, byte) bitset index over each group."""
+
+	def __init__(self, counts: Counter) -> None:
+		# Every word also as lower case, Capitalized and UPPER, for the start of sentences and headings.
+		forms: Counter = Counter()
+		for word, count in counts.items():
+			forms[word] += count
+			for variant in (word.lower(), word.capitalize(), word.upper()):
+				if variant not in counts:
+					forms[variant] += _UNSEEN_FORM_COUNT
+		total = sum(forms.values())
+		by_length: dict[int, list[str]] = {}
+		for word in forms:
+			by_length.setdefault(len(word), []).append(word)
+
+		self.groups: dict[int, tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = {}
+		for length, words in by_length.items():
+			words.sort()
+			matrix = np.frombuffer("".join(words).encode("ascii"), dtype=np.uint8).reshape(len(words), length)
+			log_freq = np.log(np.array([forms[w] for w in words]) / total)
+			alphabet = np.unique(matrix)
+			# bits[i, a] = packed bitset of the words with byte alphabet[a] at position i.
+			column = np.searchsorted(alphabet, matrix)  # (W, length)
+			onehot = column.T[:, None, :] == np.arange(len(alphabet))[None, :, None]
+			self.groups[length] = (matrix, log_freq, alphabet, np.packbits(onehot, axis=2))
+
+	def __len__(self) -> int:
+		return sum(len(group[0]) for group in self.groups.values())
+
+	def lookup(self, domains: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+		"""Words (W, n) uint8 and their log frequencies whose byte at each position is allowed by domains (n, 256)."""
+		length = len(domains)
+		if length not in self.groups:
+			return np.zeros((0, length), dtype=np.uint8), np.zeros(0)
+		matrix, log_freq, alphabet, bits = self.groups[length]
+		allowed = domains[:, alphabet]  # (n, A)
+		acc = np.full(bits.shape[2], 0xFF, dtype=np.uint8)
+		for i in range(length):
+			if not allowed[i].any():
+				return matrix[:0], log_freq[:0]
+			acc &= np.bitwise_or.reduce(bits[i, allowed[i]], axis=0)
+		found = np.flatnonzero(np.unpackbits(acc)[:len(matrix)])
+		return matrix[found], log_freq[found]
+
+
+def span_domains(
+	rows: np.ndarray,
+	key: np.ndarray,
+	allowed: Optional[np.ndarray],
+	*,
+	text: int,
+	start: int,
+	stop: int,
+	plain_bytes: Optional[np.ndarray] = None,
+) -> np.ndarray:
+	"""(stop - start, 256) bytes text `text` may have at each position of the span.
+
+	rows (N, L) are the ciphertexts, key (L,) int with -1 for unknown bytes and
+	allowed (N, L) the mask class bits. plain_bytes (N, 256) bool limits each
+	text to an explicit byte set; allowed=None drops the class check, so then
+	plain_bytes alone decides what is plausible.
+	"""
+	candidates = np.arange(256, dtype=np.uint8)
+	implied = rows[text, start:stop, None] ^ candidates[None, :]  # (n, 256) key bytes
+	known = key[start:stop, None]
+	ok = (known < 0) | (implied == known)
+	for other in range(len(rows)):
+		plain = rows[other, start:stop, None] ^ implied
+		if allowed is not None:
+			ok &= (PLAIN_CLASSES[plain] & allowed[other, start:stop, None]) != 0
+		if plain_bytes is not None:
+			ok &= plain_bytes[other][plain]
+	return ok
+
+
+def word_span(rows: np.ndarray, key: np.ndarray, *, text: int, pos: int) -> tuple[int, int]:
+	"""The run around pos of letters or unknown bytes in one text (a word with gaps)."""
+	plain = rows[text] ^ np.where(key >= 0, key, 0).astype(np.uint8)
+	fits = (key < 0) | ((PLAIN_CLASSES[plain] & (LOWER | UPPER)) != 0)
+	breaks = np.flatnonzero(~fits)
+	after = np.searchsorted(breaks, pos)
+	start = int(breaks[after - 1]) + 1 if after > 0 else 0
+	stop = int(breaks[after]) if after < len(breaks) else len(key)
+	return start, stop
+
+
+def pattern_bytes(pattern: str, size: int) -> list[int]:
+	"""cp1251 byte of each pattern character, -1 for a free position ('?' or '_')."""
+	if len(pattern) != size:
+		raise ValueError(f"pattern has {len(pattern)} characters, the span {size}")
+	fixed = []
+	for ch in pattern:
+		if ch in "?_":
+			fixed.append(-1)
+			continue
+		try:
+			fixed.append(ch.encode("cp1251")[0])
+		except UnicodeEncodeError:
+			raise ValueError(f"pattern character {ch!r} is not in cp1251") from None
+	return fixed
+
+
+def complete_word(
+	ciphertexts: Sequence[bytes],
+	words: WordIndex,
+	*,
+	key: np.ndarray,
+	allowed: Optional[np.ndarray],
+	text: int,
+	start: int,
+	stop: int,
+	pattern: Optional[str] = None,
+	plain_bytes: Optional[np.ndarray] = None,
+	byte_scores: Optional[np.ndarray] = None,
+	top: int = 20,
+) -> list[dict]:
+	"""Ranked whole-word completions of text[start:stop].
+
+	pattern (same length as the span) fixes characters; '?' and '_' leave a
+	position free. plain_bytes is passed on to span_domains. A completion has word, score, key_bytes, new_key_bytes and
+	fragments (bytes per text); top <= 0 returns all of them.
+	"""
+	length = len(key)
+	if not 0 <= start < stop <= length:
+		raise ValueError(f"span [{start}:{stop}] is outside the common length {length}")
+	fixed = pattern_bytes(pattern, stop - start) if pattern is not None else None
+	rows, _present = stack_ciphertexts(ciphertexts)
+	rows = np.ascontiguousarray(rows[:, :length])
+	domains = span_domains(rows, key, allowed, text=text, start=start, stop=stop, plain_bytes=plain_bytes)
+	if fixed is not None:
+		for i, byte in enumerate(fixed):
+			if byte >= 0:
+				only = np.zeros(256, dtype=bool)
+				only[byte] = True
+				domains[i] &= only
+
+	matrix, log_freq = words.lookup(domains)
+	implied = rows[text, start:stop] ^ matrix  # (W, n) key bytes
+	score = log_freq.copy()
+	if byte_scores is not None:
+		for other in range(len(rows)):
+			if other != text:
+				score += byte_scores[rows[other, start:stop] ^ implied].sum(axis=1)
+	order = np.argsort(-score, kind="stable")
+	if top > 0:
+		order = order[:top]
+	unknown = key[start:stop] < 0
+	return [
+		{
+			"word": matrix[i].tobytes().decode("ascii"),
+			"score": float(score[i]),
+			"key_bytes": implied[i].tobytes(),
+			"new_key_bytes": int(unknown.sum()),
+			"fragments": [(rows[t, start:stop] ^ implied[i]).tobytes() for t in range(len(rows))],
+		}
+		for i in order.tolist()
+	]
+
+
+def _default_corpus() -> list[str]:
+	return [p for p in ("../K2/K2_answer.txt", "text1.txt", "text2.txt") if Path(p).exists()]
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Complete a gap in one K3 plaintext with dictionary words.")
+	parser.add_argument("--task", default=DEFAULT_TASK_PATH)
+	parser.add_argument("--state", default="state.json")
+	parser.add_argument("--masks-from", default="plaintexts_guess.txt", help="file with mask3/mask4 lines (written by main.py)")
+	parser.add_argument("--text", type=int, required=True, help="text number (1-based)")
+	parser.add_argument("--start", type=int)
+	parser.add_argument("--stop", type=int, help="end of the span (exclusive); default start + len(pattern)")
+	parser.add_argument("--pos", type=int, help="complete the word around this position instead of --start/--stop")
+	parser.add_argument("--pattern", help="fixed characters of the span, '?' for free ones")
+	parser.add_argument("--words", help="wordlist (one word per line, optional count)")
+	parser.add_argument("--corpus", nargs="*", default=None, help="text files (utf-8) for word and byte frequencies")
+	parser.add_argument("--top", type=int, default=20)
+	parser.add_argument("--apply", type=int, metavar="N", help="write the key bytes of completion N (1-based) into the state")
+	parser.add_argument("--journal", default="key_journal.bin", help="key journal to record --apply in (see key_journal.py)")
+	args = parser.parse_args()
+
+	ciphertexts = load_ciphertexts(args.task)
+	length = min(len(c) for c in ciphertexts)
+	state = load_state(args.state) if resolve_state_path(args.state).exists() else None
+	key_map = KeyMap.from_state(state, length=length) if state is not None else KeyMap(length)
+	mask3_lines: list[str] = []
+	mask4_lines: list[str] = []
+	if Path(args.masks_from).exists():
+		mask3_lines, mask4_lines = parse_masks_two(args.masks_from, expected_count=len(ciphertexts))
+	allowed = np.ascontiguousarray(mask_class_bits(mask3_lines, mask4_lines, len(ciphertexts), length).T)
+
+	corpus = [Path(p).read_text(encoding="utf-8", errors="replace") for p in (args.corpus if args.corpus is not None else _default_corpus())]
+	counts = load_wordlist(args.words) if args.words else word_counts(corpus)
+	words = WordIndex(counts)
+	byte_scores = byte_log_frequencies([t.encode("cp1251", errors="replace") for t in corpus]) if corpus else None
+
+	text = args.text - 1
+	if not 0 <= text < len(ciphertexts):
+		parser.error(f"--text {args.text}: the task has {len(ciphertexts)} texts")
+	if args.pos is not None:
+		if not 0 <= args.pos < length:
+			parser.error(f"--pos {args.pos} is outside the common length {length}")
+		rows, _present = stack_ciphertexts(ciphertexts)
+		start, stop = word_span(rows[:, :length], key_map.key, text=text, pos=args.pos)
+	else:
+		if args.start is None:
+			parser.error("--start or --pos is required")
+		start = args.start
+		stop = args.stop if args.stop is not None else start + len(args.pattern or "")
+	if not 0 <= start < stop <= length:
+		parser.error(f"span [{start}:{stop}] is outside the common length {length}")
+	if args.pattern is not None:
+		try:
+			pattern_bytes(args.pattern, stop - start)
+		except ValueError as exc:
+			parser.error(f"--pattern: {exc}")
+	print(f"Слов в словаре: {len(words)}; пробел: text {args.text} [{start}:{stop}]")
+
+	completions = complete_word(
+		ciphertexts,
+		words,
+		key=key_map.key,
+		allowed=allowed,
+		text=text,
+		start=start,
+		stop=stop,
+		pattern=args.pattern,
+		byte_scores=byte_scores,
+		top=args.top,
+	)
+	if not completions:
+		print("Подходящих слов нет")
+	for rank, item in enumerate(completions, start=1):
+		fragments = "  ".join(f"P{t + 1}={f.decode('cp1251', errors='replace')!r}" for t, f in enumerate(item["fragments"]))
+		print(f"{rank:>3}. {item['word']:<20} score={item['score']:.1f}  {fragments}")
+
+	if args.apply is not None:
+		if state is None:
+			raise SystemExit(f"{args.state}: no state to update, run main.py first")
+		if not 1 <= args.apply <= len(completions):
+			raise SystemExit(f"--apply {args.apply}: there are {len(completions)} completions")
+		chosen = completions[args.apply - 1]
+		old_key = key_map.to_list()
+		proposal = np.full(length, -1, dtype=np.int16)
+		proposal[start:stop] = np.frombuffer(chosen["key_bytes"], dtype=np.uint8)
+		taken, _kept = key_map.propose(proposal, source="crib")
+		saved = commit_key(args.state, state, ciphertexts, key_map, old_key, source="crib", journal_path=args.journal)
+		print(f"'{chosen['word']}': записано байт ключа {len(taken)} в {saved}; запустите main.py, чтобы обновить plaintexts_guess*.txt")
+
+
+if __name__ == "__main__":
+	main()
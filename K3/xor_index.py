@@ -0,0 +1,167 @@
+"""Lazy xor-triplet index: what used to be xor_maps3/4.json and xor_triplet_combos4/.
+
+A xor-triplet key is "ab|ac|bc": the binary prefixes (prefix_len bits) of the
+pairwise XORs of three symbol classes. Everything about a key follows from the
+symbol set and the prefix length, so nothing is stored on disk:
+
+- CLASS_BITMAP: 256 entries, cp1251 byte -> bit of its symbol class (" ", "a", "A");
+  PLAIN_CLASSES adds digits to the punctuation class for plausibility checks;
+- XorTripletIndex.key_bits: per key, a bitset over class triples (27 bits for " aA");
+- iter_triples(key) yields the concrete character triples on demand, in the same
+  (code point) order as the old JSONL dumps.
+
+Key ids (the hex digits shown in mask3/mask4) are numbered as stats.py used to
+number the JSON maps: xor_maps3 in sorted key order, xor_maps4 keeps the ids of
+xor_maps3 keys it refines and numbers the rest after them.
+"""
+from __future__ import annotations
+
+import argparse
+import string
+from functools import lru_cache
+from itertools import combinations
+from typing import Iterator, Optional
+
+import numpy as np
+
+
+HEX_ID_ALPHABET = "0123456789ABCDEF"
+
+# Concrete characters behind each symbol class.
+CLASS_CHARS = {
+	" ": " " + string.punctuation + "«»–—‘’“”„…№",
+	"a": string.ascii_lowercase,
+	"A": string.ascii_uppercase,
+}
+
+CLASS_BITMAP = np.zeros(256, dtype=np.uint8)
+for _bit, _symbol in enumerate(CLASS_CHARS):
+	for _byte in CLASS_CHARS[_symbol].encode("cp1251"):
+		CLASS_BITMAP[_byte] |= 1 << _bit
+
+# Plausible plaintext bytes: CLASS_BITMAP plus digits, which share the punctuation class (top bits 001).
+PLAIN_CLASSES = CLASS_BITMAP.copy()
+PLAIN_CLASSES[ord("0"):ord("9") + 1] |= 1
+
+
+def _bin_prefix(value: int, prefix_len: int) -> str:
+	return format(value, "08b")[:prefix_len]
+
+
+def xor_triplet_key(triple: str, prefix_len: int) -> str:
+	return "|".join(_bin_prefix(ord(x) ^ ord(y), prefix_len) for x, y in combinations(triple, 2))
+
+
+class XorTripletIndex:
+	"""Xor-triplet keys for a symbol set, with class-triple bitsets and lazy triples."""
+
+	def __init__(self, symbols: str, prefix_len: int, base: Optional["XorTripletIndex"] = None) -> None:
+		self.symbols = symbols
+		self.prefix_len = prefix_len
+		size = len(symbols)
+
+		self.key_bits: dict[str, int] = {}
+		for a in range(size):
+			for b in range(size):
+				for c in range(size):
+					key = xor_triplet_key(symbols[a] + symbols[b] + symbols[c], prefix_len)
+					self.key_bits[key] = self.key_bits.get(key, 0) | 1 << (a * size * size + b * size + c)
+		self.keys = sorted(self.key_bits)
+		self.key_to_id = self._number_keys(base)
+
+		# Code point ordered characters for every subset of classes.
+		self._chars_by_mask = []
+		for mask in range(1 << size):
+			chars = "".join(CLASS_CHARS[s] for i, s in enumerate(symbols) if mask >> i & 1)
+			self._chars_by_mask.append("".join(sorted(chars)))
+		self._class_of = {ch: i for i, s in enumerate(symbols) for ch in CLASS_CHARS[s]}
+
+	def _number_keys(self, base: Optional["XorTripletIndex"]) -> dict[str, int]:
+		"""Keep ids of base keys whose triples all land on one key here; number the rest after them."""
+		key_to_id: dict[str, int] = {}
+		if base is not None:
+			for base_key in base.keys:
+				new_keys = {xor_triplet_key(t, self.prefix_len) for t in base.class_triples(base_key)}
+				if len(new_keys) == 1:
+					key_to_id.setdefault(new_keys.pop(), base.key_to_id[base_key])
+		next_id = max(key_to_id.values(), default=-1) + 1
+		for key in self.keys:
+			if key not in key_to_id:
+				key_to_id[key] = next_id
+				next_id += 1
+		return key_to_id
+
+	def id_char(self, key: str) -> str:
+		"""Hex digit of the key id, '?' for unknown keys or ids past F."""
+		xor_id = self.key_to_id.get(key)
+		if xor_id is None or xor_id >= len(HEX_ID_ALPHABET):
+			return "?"
+		return HEX_ID_ALPHABET[xor_id]
+
+	def class_triples(self, key: str) -> list[str]:
+		"""Symbol-class triples behind a key, e.g. ['  a', 'aa ']."""
+		bits = self.key_bits.get(key, 0)
+		size = len(self.symbols)
+		out = []
+		for index in range(size ** 3):
+			if bits >> index & 1:
+				a, rest = divmod(index, size * size)
+				b, c = divmod(rest, size)
+				out.append(self.symbols[a] + self.symbols[b] + self.symbols[c])
+		return sorted(out)
+
+	def count(self, key: str) -> int:
+		return sum(
+			len(CLASS_CHARS[a]) * len(CLASS_CHARS[b]) * len(CLASS_CHARS[c])
+			for a, b, c in self.class_triples(key)
+		)
+
+	def iter_triples(self, key: str) -> Iterator[tuple[str, str, str]]:
+		"""Concrete (c1, c2, c3) character triples for a key, generated lazily in sorted order."""
+		bits = self.key_bits.get(key, 0)
+		size = len(self.symbols)
+		all_classes = (1 << size) - 1
+		# third[a][b]: classes c such that (a, b, c) belongs to the key.
+		third = [[(bits >> ((a * size + b) * size)) & all_classes for b in range(size)] for a in range(size)]
+		first_mask = sum(1 << a for a in range(size) if any(third[a]))
+		for x in self._chars_by_mask[first_mask]:
+			a = self._class_of[x]
+			second_mask = sum(1 << b for b in range(size) if third[a][b])
+			for y in self._chars_by_mask[second_mask]:
+				for z in self._chars_by_mask[third[a][self._class_of[y]]]:
+					yield x, y, z
+
+
+@lru_cache(maxsize=None)
+def load_xor_maps3() -> XorTripletIndex:
+	"""2-class model (punctuation/space vs letter), 2-bit prefixes."""
+	return XorTripletIndex(" a", 2)
+
+
+@lru_cache(maxsize=None)
+def load_xor_maps4() -> XorTripletIndex:
+	"""3-class model (punctuation/space, lower, upper), 3-bit prefixes."""
+	return XorTripletIndex(" aA", 3, base=load_xor_maps3())
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Show xor-triplet keys or the character triples behind one key.")
+	parser.add_argument("--maps", choices=("3", "4"), default="4")
+	parser.add_argument("--key", help="print the triples for this key (e.g. 000|010|010) instead of the summary")
+	parser.add_argument("--limit", type=int, default=0, help="stop after this many triples (0 = all)")
+	args = parser.parse_args()
+
+	index = load_xor_maps3() if args.maps == "3" else load_xor_maps4()
+	if args.key is None:
+		for key in index.keys:
+			print(f"{key}  id={index.id_char(key)}  count={index.count(key):>6}  {index.class_triples(key)}")
+		return
+
+	for n, triple in enumerate(index.iter_triples(args.key), start=1):
+		print("".join(triple))
+		if n == args.limit:
+			break
+
+
+if __name__ == "__main__":
+	main()
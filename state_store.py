@@ -0,0 +1,279 @@
+"""Shared binary state store for the Vernam labs (K2, K3).
+
+Layout of a ``state.bin`` file::
+
+	magic (8 bytes) | schema version (u32) | header length (u32) | header JSON | arrays
+
+The header is a small JSON document with the metadata and a table of arrays
+(dtype, offset, length). Every array starts on a 64-byte boundary, so the
+whole file can be memory-mapped and each array is a zero-copy view:
+
+	ciphertext.N  uint8   ciphertext N
+	key           int16   key bytes, -1 where the key byte is unknown
+	plaintext.N   uint8   guessed plaintext N
+	manual.N      uint8   manual plaintext N (utf-8)
+
+Further named arrays passed to save_store() (e.g. the K3 key provenance of
+K3/key_map.py) are stored the same way and returned under ``arrays``.
+
+Loading only parses the header, so it does not grow with the state size.
+JSON (``state.json``) is kept as an export/import format; the legacy K2
+(``ciphertexts``) and K3 (``ciphertexts_b64``) layouts are both readable.
+
+``state.bin`` is a local working file and is not committed. The tracked
+``state.json`` next to it is a snapshot that the solvers no longer write;
+refresh it with ``python state_store.py export K3/state.bin`` when the state
+should be shared. Readers given ``state.json`` pick up ``state.bin`` first
+(resolve_state_path()), so they see the current state either way.
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import os
+import struct
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+SCHEMA_VERSION = 1
+MAGIC = b"VSTATE\x00\x01"
+ALIGNMENT = 64
+UNKNOWN_KEY = -1
+
+_PREFIX = struct.Struct("<8sII")
+
+
+def key_to_array(key: Sequence[Optional[int]] | np.ndarray) -> np.ndarray:
+	"""Convert a key with ``None`` for unknown bytes into an int16 array (-1 = unknown)."""
+	if isinstance(key, np.ndarray):
+		return key.astype(np.int16, copy=False)
+	return np.array([UNKNOWN_KEY if b is None else b for b in key], dtype=np.int16)
+
+
+def key_to_list(key: np.ndarray) -> list[Optional[int]]:
+	"""Inverse of key_to_array()."""
+	return [None if b < 0 else b for b in key.tolist()]
+
+
+def binary_path_for(state_path: str | Path) -> Path:
+	"""``state.json`` -> ``state.bin``; other paths are returned as is."""
+	path = Path(state_path)
+	return path.with_suffix(".bin") if path.suffix == ".json" else path
+
+
+def resolve_state_path(state_path: str | Path) -> Path:
+	"""Prefer the binary store next to a requested ``state.json`` when it exists."""
+	path = Path(str(state_path).replace("\\", os.sep))
+	binary = binary_path_for(path)
+	return binary if binary.exists() else path
+
+
+def _align(offset: int) -> int:
+	return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def save_store(
+	state_path: str | Path,
+	*,
+	ciphertexts: Sequence[bytes | np.ndarray],
+	key: Sequence[Optional[int]] | np.ndarray,
+	plaintexts: Optional[Sequence[bytes | bytearray | np.ndarray]] = None,
+	manual_plaintexts: Optional[Sequence[str]] = None,
+	meta: Optional[dict] = None,
+	extra_arrays: Optional[dict[str, np.ndarray]] = None,
+) -> Path:
+	"""Write the state into the binary store; a ``.json`` path is redirected to ``.bin``."""
+	path = binary_path_for(state_path)
+	arrays: list[tuple[str, np.ndarray]] = []
+	for idx, ct in enumerate(ciphertexts):
+		arrays.append((f"ciphertext.{idx}", np.frombuffer(bytes(ct), dtype=np.uint8)))
+	arrays.append(("key", key_to_array(key)))
+	for idx, pt in enumerate(plaintexts or []):
+		arrays.append((f"plaintext.{idx}", np.frombuffer(bytes(pt), dtype=np.uint8)))
+	for idx, text in enumerate(manual_plaintexts or []):
+		arrays.append((f"manual.{idx}", np.frombuffer(text.encode("utf-8"), dtype=np.uint8)))
+	for name, array in (extra_arrays or {}).items():
+		arrays.append((name, np.ascontiguousarray(array)))
+
+	# Offsets are relative to the end of the header, so they do not depend on its length.
+	table = {}
+	offset = 0
+	for name, array in arrays:
+		table[name] = {"dtype": array.dtype.str, "offset": offset, "length": int(array.size)}
+		offset = _align(offset + array.nbytes)
+	header = {
+		"schema": SCHEMA_VERSION,
+		"saved_at": datetime.now().isoformat(timespec="seconds"),
+		"counts": {
+			"ciphertexts": len(ciphertexts),
+			"plaintexts": len(plaintexts or []),
+			"manual_plaintexts": len(manual_plaintexts or []),
+		},
+		"meta": meta or {},
+		"arrays": table,
+	}
+	header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+	data_start = _align(_PREFIX.size + len(header_bytes))
+	header_bytes = header_bytes.ljust(data_start - _PREFIX.size, b" ")
+
+	tmp_path = path.with_name(path.name + ".tmp")
+	with tmp_path.open("wb") as file:
+		file.write(_PREFIX.pack(MAGIC, SCHEMA_VERSION, len(header_bytes)))
+		file.write(header_bytes)
+		for name, array in arrays:
+			file.seek(data_start + table[name]["offset"])
+			file.write(array.tobytes())
+		file.truncate(data_start + offset)
+	os.replace(tmp_path, path)
+	return path
+
+
+def _read_header(path: Path) -> tuple[dict, int]:
+	with path.open("rb") as file:
+		prefix = file.read(_PREFIX.size)
+		if len(prefix) < _PREFIX.size:
+			raise ValueError(f"{path}: truncated state file")
+		magic, version, header_len = _PREFIX.unpack(prefix)
+		if magic != MAGIC:
+			raise ValueError(f"{path}: not a binary state file")
+		if version > SCHEMA_VERSION:
+			raise ValueError(f"{path}: schema {version} is newer than supported {SCHEMA_VERSION}")
+		header = json.loads(file.read(header_len).decode("utf-8"))
+	return header, _PREFIX.size + header_len
+
+
+def is_binary_state(state_path: str | Path) -> bool:
+	path = Path(state_path)
+	if not path.is_file():
+		return False
+	with path.open("rb") as file:
+		return file.read(len(MAGIC)) == MAGIC
+
+
+def load_store(state_path: str | Path, *, mmap: bool = True) -> dict:
+	"""Load a binary state; arrays are read-only memmap views when ``mmap`` is set.
+
+	Returns a dict with ``ciphertexts``/``plaintexts`` (lists of uint8 arrays),
+	``key`` (int16 array, -1 = unknown), ``manual_plaintexts`` (list of str),
+	``arrays`` (the extra arrays by name), ``meta``, ``saved_at`` and ``schema``.
+	"""
+	path = Path(state_path)
+	header, data_start = _read_header(path)
+	if mmap:
+		raw = np.memmap(path, dtype=np.uint8, mode="r")
+	else:
+		raw = np.frombuffer(path.read_bytes(), dtype=np.uint8)
+
+	table = header["arrays"]
+
+	def array(name: str) -> np.ndarray:
+		entry = table[name]
+		dtype = np.dtype(entry["dtype"])
+		start = data_start + entry["offset"]
+		return raw[start:start + entry["length"] * dtype.itemsize].view(dtype)
+
+	counts = header.get("counts", {})
+	standard = {"key"}
+	for prefix, count in (("ciphertext", "ciphertexts"), ("plaintext", "plaintexts"), ("manual", "manual_plaintexts")):
+		standard.update(f"{prefix}.{i}" for i in range(counts.get(count, 0)))
+	return {
+		"schema": header.get("schema", SCHEMA_VERSION),
+		"saved_at": header.get("saved_at"),
+		"ciphertexts": [array(f"ciphertext.{i}") for i in range(counts.get("ciphertexts", 0))],
+		"key": array("key") if "key" in table else np.zeros(0, dtype=np.int16),
+		"plaintexts": [array(f"plaintext.{i}") for i in range(counts.get("plaintexts", 0))],
+		"manual_plaintexts": [
+			array(f"manual.{i}").tobytes().decode("utf-8") for i in range(counts.get("manual_plaintexts", 0))
+		],
+		"arrays": {name: array(name) for name in table if name not in standard},
+		"meta": header.get("meta", {}),
+	}
+
+
+def import_json(json_path: str | Path) -> dict:
+	"""Read a JSON state (K2 or K3 layout) into the same shape as load_store()."""
+	path = Path(json_path)
+	payload = json.loads(path.read_text(encoding="utf-8"))
+	encoded_ct = payload.get("ciphertexts_b64", payload.get("ciphertexts", []))
+	return {
+		"schema": payload.get("schema", 0),
+		"saved_at": payload.get("saved_at"),
+		"ciphertexts": [np.frombuffer(base64.b64decode(s), dtype=np.uint8) for s in encoded_ct],
+		"key": key_to_array(payload.get("key", [])),
+		"plaintexts": [np.frombuffer(base64.b64decode(s), dtype=np.uint8) for s in payload.get("plaintexts_b64", [])],
+		"manual_plaintexts": list(payload.get("manual_plaintexts", [])),
+		"arrays": {
+			name: np.frombuffer(base64.b64decode(entry["b64"]), dtype=np.dtype(entry["dtype"]))
+			for name, entry in payload.get("arrays", {}).items()
+		},
+		"meta": payload.get("meta", {}),
+	}
+
+
+def export_json(state: dict, json_path: str | Path) -> Path:
+	"""Write a loaded state as JSON (K3 layout) for inspection or exchange.
+
+	Extra arrays are kept, so import_json() restores the key provenance too.
+	"""
+	path = Path(json_path)
+	payload = {
+		"schema": SCHEMA_VERSION,
+		"saved_at": state.get("saved_at"),
+		"ciphertexts_b64": [base64.b64encode(bytes(c)).decode("ascii") for c in state["ciphertexts"]],
+		"key": key_to_list(np.asarray(state["key"])),
+		"plaintexts_b64": [base64.b64encode(bytes(p)).decode("ascii") for p in state.get("plaintexts", [])],
+		"manual_plaintexts": list(state.get("manual_plaintexts", [])),
+		# Extra arrays (e.g. the K3 key provenance) as dtype + base64 of the raw bytes.
+		"arrays": {
+			name: {"dtype": array.dtype.str, "b64": base64.b64encode(np.ascontiguousarray(array).tobytes()).decode("ascii")}
+			for name, array in state.get("arrays", {}).items()
+		},
+		"meta": state.get("meta", {}),
+	}
+	path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+	return path
+
+
+def load_any(state_path: str | Path, *, mmap: bool = True) -> dict:
+	"""Load ``state.bin`` if present next to the given path, otherwise the JSON export."""
+	path = resolve_state_path(state_path)
+	if is_binary_state(path):
+		return load_store(path, mmap=mmap)
+	return import_json(path)
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Convert between state.json exports and the binary state store.")
+	sub = parser.add_subparsers(dest="command", required=True)
+	to_bin = sub.add_parser("import", help="state.json -> state.bin")
+	to_bin.add_argument("json_path")
+	to_bin.add_argument("bin_path", nargs="?")
+	to_json = sub.add_parser("export", help="state.bin -> state.json")
+	to_json.add_argument("bin_path")
+	to_json.add_argument("json_path", nargs="?")
+	args = parser.parse_args()
+
+	if args.command == "import":
+		state = import_json(args.json_path)
+		out = save_store(
+			args.bin_path or binary_path_for(args.json_path),
+			ciphertexts=state["ciphertexts"],
+			key=state["key"],
+			plaintexts=state["plaintexts"],
+			manual_plaintexts=state["manual_plaintexts"],
+			meta=state["meta"],
+			extra_arrays=state["arrays"],
+		)
+	else:
+		state = load_store(args.bin_path, mmap=False)
+		out = export_json(state, args.json_path or Path(args.bin_path).with_suffix(".json"))
+	print(f"written: {out}")
+
+
+if __name__ == "__main__":
+	main()
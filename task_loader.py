@@ -0,0 +1,141 @@
+"""Shared ciphertext loader for the Vernam labs (K2, K3).
+
+A task file lists the ciphertexts as base64 blocks::
+
+	Шифр 1 (base64):
+	b'...'
+	Шифр 2: b'...'
+	Шифр 3: ...
+
+parse_task() reads the file once, line by line in binary mode, and decodes
+each payload as soon as its line is seen. Nothing is evaluated as a literal,
+and the text is never held as a whole.
+
+The decoded ciphertexts are cached in the binary state store format (see
+state_store.py) under ``.task_cache/<sha256 prefix>.bin`` next to the task
+file. The digest covers the file contents, so an edited task file misses the
+cache and a renamed or copied one still hits it. Later loads hash the file and
+map the cached arrays instead of decoding base64 again. If the cache cannot
+be written (read-only directory), the parsed ciphertexts are returned as is.
+"""
+from __future__ import annotations
+
+import binascii
+import hashlib
+import re
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+import numpy as np
+
+from state_store import load_store, save_store
+
+
+CACHE_DIR = ".task_cache"
+
+_HEADER_RE = re.compile(r"^\s*Шифр\s+(\d+)\s*(\(base64\))?\s*:\s*(.*?)\s*$".encode("utf-8"))
+_BYTES_LITERAL_RE = re.compile(rb"^b([\"'])(.*)\1$")
+
+# (resolved path, size, mtime_ns) -> sha256, so repeated loads in one process do not rehash.
+_digests: dict[tuple[str, int, int], str] = {}
+
+
+def _payload(text: bytes) -> bytes:
+	"""Base64 text of a block: the contents of b'...' or the bare text."""
+	literal = _BYTES_LITERAL_RE.match(text)
+	return literal.group(2) if literal else text
+
+
+def parse_task(file: BinaryIO) -> list[bytes]:
+	"""Decode the ciphertext blocks of an open task file, ordered by their number.
+
+	A header with a payload on the same line is complete. A bare
+	``Шифр N (base64):`` header takes the next non-empty line.
+	"""
+	found: list[tuple[int, bytes]] = []
+	pending: Optional[int] = None
+	for raw in file:
+		line = raw.strip()
+		if not line:
+			continue
+		if pending is not None:
+			found.append((pending, binascii.a2b_base64(_payload(line))))
+			pending = None
+			continue
+		match = _HEADER_RE.match(line)
+		if not match:
+			continue
+		number, tagged, rest = int(match.group(1)), match.group(2), match.group(3)
+		if rest:
+			found.append((number, binascii.a2b_base64(_payload(rest))))
+		elif tagged:
+			pending = number
+	# Numbering orders the blocks; sort() is stable for repeated numbers.
+	found.sort(key=lambda item: item[0])
+	return [cipher for _number, cipher in found]
+
+
+def task_digest(task_path: str | Path) -> str:
+	"""sha256 of the task file contents (hex), memoized per size and mtime."""
+	path = Path(task_path).resolve()
+	st = path.stat()
+	stamp = (str(path), st.st_size, st.st_mtime_ns)
+	digest = _digests.get(stamp)
+	if digest is None:
+		with path.open("rb") as file:
+			digest = hashlib.file_digest(file, "sha256").hexdigest()
+		_digests[stamp] = digest
+	return digest
+
+
+def cache_path_for(task_path: str | Path, digest: str) -> Path:
+	return Path(task_path).resolve().parent / CACHE_DIR / f"{digest[:32]}.bin"
+
+
+def load_ciphertext_arrays(task_path: str | Path, *, cache: bool = True) -> list[np.ndarray]:
+	"""Ciphertexts of a task file as uint8 arrays, read-only memmap views on a cache hit."""
+	path = Path(task_path)
+	if not path.exists():
+		raise FileNotFoundError(f"Task file not found: {path}")
+	digest = task_digest(path) if cache else ""
+	cached = cache_path_for(path, digest) if cache else None
+	if cached is not None and cached.exists():
+		try:
+			store = load_store(cached)
+		except (OSError, ValueError):
+			pass
+		else:
+			if store["meta"].get("sha256") == digest:
+				return store["ciphertexts"]
+
+	with path.open("rb") as file:
+		ciphertexts = parse_task(file)
+	if not ciphertexts:
+		raise ValueError(f"No ciphertext blocks found in the task file {path}")
+	if cached is not None:
+		try:
+			cached.parent.mkdir(exist_ok=True)
+			save_store(cached, ciphertexts=ciphertexts, key=[], meta={"task": path.name, "sha256": digest})
+		except OSError:
+			pass
+	return [np.frombuffer(c, dtype=np.uint8) for c in ciphertexts]
+
+
+def load_ciphertexts(
+	task_path: str | Path,
+	*,
+	expected_count: Optional[int] = None,
+	cache: bool = True,
+) -> list[bytes]:
+	"""Ciphertexts of a task file as bytes, in block-number order.
+
+	With `expected_count` fewer blocks are an error and extra ones are dropped.
+	"""
+	arrays = load_ciphertext_arrays(task_path, cache=cache)
+	if expected_count is not None:
+		if len(arrays) < expected_count:
+			raise ValueError(
+				f"{task_path}: found {len(arrays)} ciphertext blocks, expected at least {expected_count}"
+			)
+		arrays = arrays[:expected_count]
+	return [a.tobytes() for a in arrays]